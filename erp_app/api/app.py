@@ -0,0 +1,196 @@
+"""Headless JSON API over the ERP models.
+
+Run from the erp_app directory:  uvicorn api.app:app --port 8000
+
+POST /api/token with {"email", "password"} returns a bearer token; every
+other endpoint needs `Authorization: Bearer <token>` and is scoped to the
+token's company/branch exactly like the Streamlit pages.
+"""
+import hashlib
+import os
+from datetime import date
+import pandas as pd
+from sqlalchemy import select, insert, func
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from api.auth import login, require_user
+from api.db import AsyncSessionLocal
+from api.resources import RESOURCES, coerce_param, dumps
+from database.models import DocumentAsset
+from utils.alerts import evaluate_rule
+from utils.doc_store import parse_range, iter_range, blob_path
+from utils.importer import IMPORT_SPECS, coerce_chunk, resolve_lookups, fill_tenant
+from utils.tenancy import TENANT_MODELS, current_tenant
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+BULK_LIMIT = 5000
+
+def json_response(request, payload, status=200):
+    """JSON with a weak ETag; answers 304 when the client already has this body."""
+    body = dumps(payload)
+    if status != 200:
+        return Response(body, status_code=status, media_type="application/json")
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def get_resource(request):
+    resource = RESOURCES.get(request.path_params["resource"])
+    if resource is None:
+        raise HTTPException(404, f"Unknown resource '{request.path_params['resource']}'")
+    return resource
+
+def _int_param(request, name, default, low, high):
+    try:
+        return max(low, min(int(request.query_params.get(name, default)), high))
+    except ValueError:
+        raise HTTPException(400, f"{name} must be an integer")
+
+async def token(request):
+    try:
+        body = await request.json()
+        email, password = body["email"], body["password"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(400, "Expected JSON with email and password")
+    issued, msg = await login(email, password)
+    if not issued:
+        raise HTTPException(401, msg)
+    value, expires = issued
+    return Response(dumps({"access_token": value, "token_type": "bearer", "expires_at": expires}),
+                    media_type="application/json")
+
+async def list_items(request):
+    """Keyset pagination on id: ?limit=&after=<last id>, plus equality and date filters."""
+    resource = get_resource(request)
+    require_user(request, resource.roles)
+    model = resource.model
+    limit = _int_param(request, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT)
+    after = _int_param(request, "after", 0, 0, 2 ** 62)
+
+    stmt = select(*resource.columns).where(model.id > after).order_by(model.id).limit(limit)
+    for name in resource.filters:
+        if name in request.query_params:
+            column = getattr(model, name)
+            try:
+                stmt = stmt.where(column == coerce_param(column, request.query_params[name]))
+            except ValueError as e:
+                raise HTTPException(400, f"{name}: {e}")
+    if resource.date_column:
+        column = getattr(model, resource.date_column)
+        try:
+            if "from" in request.query_params:
+                stmt = stmt.where(column >= date.fromisoformat(request.query_params["from"]))
+            if "to" in request.query_params:
+                stmt = stmt.where(column <= date.fromisoformat(request.query_params["to"]))
+        except ValueError:
+            raise HTTPException(400, "from/to must be YYYY-MM-DD")
+
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(stmt)).all()
+    items = [dict(r._mapping) for r in rows]
+    return json_response(request, {
+        "items": items, "count": len(items),
+        "next": items[-1]["id"] if len(items) == limit else None
+    })
+
+async def get_item(request):
+    resource = get_resource(request)
+    require_user(request, resource.roles)
+    stmt = select(*resource.columns).where(resource.model.id == request.path_params["id"])
+    async with AsyncSessionLocal() as session:
+        row = (await session.execute(stmt)).first()
+    if row is None:
+        raise HTTPException(404, "Not found")
+    return json_response(request, dict(row._mapping))
+
+async def bulk_create(request):
+    """Validate a JSON array with the bulk-import rules and insert it in one statement.
+
+    All-or-nothing: any invalid row rejects the request with 422 and the
+    row/column errors (row = position in the array), so devices can fix
+    and resend the batch without creating duplicates.
+    """
+    resource = get_resource(request)
+    if not resource.bulk_spec:
+        raise HTTPException(405, "Bulk create is not available for this resource")
+    require_user(request, resource.roles)
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "Body must be JSON")
+    rows = body.get("rows") if isinstance(body, dict) else body
+    if not isinstance(rows, list) or not rows or not all(isinstance(r, dict) for r in rows):
+        raise HTTPException(400, "Expected a non-empty array of objects (or {\"rows\": [...]})")
+    if len(rows) > BULK_LIMIT:
+        raise HTTPException(413, f"At most {BULK_LIMIT} rows per request")
+
+    spec = IMPORT_SPECS[resource.bulk_spec]
+    raw = pd.DataFrame(rows).astype(object)
+    typed, errors = coerce_chunk(raw, spec)
+    async with AsyncSessionLocal() as session:
+        typed, lookup_errors = await session.run_sync(lambda s: resolve_lookups(s, typed, spec))
+        errors = pd.concat([errors] + lookup_errors, ignore_index=True)
+        if not errors.empty:
+            return Response(dumps({"inserted": 0, "errors": errors.sort_values(["row", "column"]).to_dict("records")}),
+                            status_code=422, media_type="application/json")
+        typed = fill_tenant(typed, current_tenant() if spec.model in TENANT_MODELS else None)
+        start_id = (await session.execute(select(func.max(spec.model.id)))).scalar() or 0
+        await session.execute(insert(spec.model), typed.to_dict("records"))
+        await session.commit()
+        if resource.after_bulk:
+            await session.run_sync(resource.after_bulk)
+        for rule in spec.alert_rules:
+            await session.run_sync(lambda s: evaluate_rule(s, rule, after_id=start_id))
+    return Response(dumps({"inserted": len(typed)}), status_code=201, media_type="application/json")
+
+async def document_content(request):
+    """Stream a stored document; honours single Range requests and If-None-Match."""
+    require_user(request, RESOURCES["documents"].roles)
+    async with AsyncSessionLocal() as session:
+        doc = await session.get(DocumentAsset, request.path_params["id"])
+    if doc is None or not doc.content_hash:
+        raise HTTPException(404, "No stored file for this document")
+
+    size = doc.size_bytes or 0
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{doc.content_hash}"', "Cache-Control": "private, max-age=86400",
+               "Content-Disposition": f'attachment; filename="{(doc.original_filename or "document").replace(chr(34), "")}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    try:
+        span = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if not os.path.exists(blob_path(doc.content_hash)):
+        raise HTTPException(410, "File missing from the document store")
+
+    if span is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = span, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+    body = iter_range(doc.content_hash, start, end) if size else iter(())
+    return StreamingResponse(body, status_code=status, media_type=doc.mime_type or "application/octet-stream", headers=headers)
+
+async def health(request):
+    return Response(dumps({"status": "ok"}), media_type="application/json")
+
+async def http_error(request, exc):
+    return Response(dumps({"detail": exc.detail}), status_code=exc.status_code,
+                    media_type="application/json", headers=getattr(exc, "headers", None))
+
+routes = [
+    Route("/api/health", health),
+    Route("/api/token", token, methods=["POST"]),
+    Route("/api/documents/{id:int}/content", document_content),
+    Route("/api/{resource}/bulk", bulk_create, methods=["POST"]),
+    Route("/api/{resource}/{id:int}", get_item),
+    Route("/api/{resource}", list_items),
+]
+
+app = Starlette(routes=routes, exception_handlers={HTTPException: http_error})
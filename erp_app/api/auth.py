@@ -0,0 +1,69 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from database.db_manager import SessionLocal
+from database.models import UserRole
+from utils.tenancy import set_tenant
+
+TOKEN_TTL = int(os.getenv("API_TOKEN_TTL_SECONDS", str(12 * 3600)))
+_secret = os.getenv("API_SECRET")
+if not _secret:
+    _secret = secrets.token_hex(32)
+    print("⚠️ API_SECRET not set: using a per-process key, tokens will not survive a restart.")
+SECRET = _secret.encode()
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def issue_token(user):
+    """Signed, self-contained bearer token carrying the user's role and tenant."""
+    claims = {"uid": user.id, "role": user.role.value, "company": user.company_id,
+              "branch": user.branch_id, "exp": int(time.time()) + TOKEN_TTL}
+    body = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    sig = _b64(hmac.new(SECRET, body.encode(), hashlib.sha256).digest())
+    return f"{body}.{sig}", claims["exp"]
+
+def verify_token(token):
+    try:
+        body, sig = token.split(".")
+    except ValueError:
+        return None
+    expected = _b64(hmac.new(SECRET, body.encode(), hashlib.sha256).digest())
+    if not hmac.compare_digest(sig, expected):
+        return None
+    claims = json.loads(_unb64(body))
+    return claims if claims.get("exp", 0) > time.time() else None
+
+async def login(email, password):
+    """Check credentials through AuthHandler (bcrypt runs off the event loop)."""
+    def check():
+        from auth.auth_handler import AuthHandler
+        try:
+            user, msg = AuthHandler().authenticate(email, password)
+            return (issue_token(user) if user else None), msg
+        finally:
+            SessionLocal.remove()
+    return await run_in_threadpool(check)
+
+def require_user(request, roles=None):
+    """Claims for the request's bearer token; also scopes queries to its tenant.
+
+    Owners may use every resource; other roles only those listing them.
+    """
+    header = request.headers.get("authorization", "")
+    claims = verify_token(header[7:]) if header.lower().startswith("bearer ") else None
+    if claims is None:
+        raise HTTPException(401, "Missing or expired token", headers={"WWW-Authenticate": "Bearer"})
+    if roles and claims["role"] != UserRole.OWNER.value and claims["role"] not in roles:
+        raise HTTPException(403, "Role not permitted for this resource")
+    set_tenant(claims.get("company"), claims.get("branch"))
+    return claims
@@ -0,0 +1,38 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database.db_manager import DATABASE_URL, SQLITE_PRAGMAS
+from utils.metrics import install_metrics_hooks, register_pool
+
+def async_url(url):
+    """Map the app's sync DATABASE_URL onto the matching async driver."""
+    u = make_url(url.replace("postgres://", "postgresql://", 1))
+    if u.get_backend_name() == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite")
+    if u.get_backend_name() == "postgresql":
+        # asyncpg takes ssl via connect_args and rejects libpq's sslmode
+        return u.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode"])
+    return u
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def make_async_engine(url=DATABASE_URL):
+    url = async_url(url)
+    if url.get_backend_name() == "sqlite":
+        eng = create_async_engine(url, pool_size=5, max_overflow=10)
+        event.listen(eng.sync_engine, "connect", _sqlite_pragmas)
+    else:
+        eng = create_async_engine(
+            url, connect_args={"ssl": "require", "timeout": 10},
+            pool_pre_ping=True, pool_recycle=300, pool_size=10, max_overflow=20
+        )
+    install_metrics_hooks(eng.sync_engine)
+    register_pool("api", eng.sync_engine)
+    return eng
+
+async_engine = make_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
@@ -0,0 +1,156 @@
+"""Load test the API against a fresh local SQLite database.
+
+Run from the erp_app directory:  python -m api.loadtest [seconds] [clients]
+
+Seeds a temp database, starts `uvicorn api.app:app` in a subprocess and
+drives it with keep-alive client threads, one scenario at a time: paged
+lists, conditional GETs answered with 304, single-row reads and bulk
+attendance posts. Reports requests/sec and latency percentiles.
+"""
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+workdir = tempfile.mkdtemp(prefix="erp_api_load_")
+DB_URL = f"sqlite:///{os.path.join(workdir, 'api.db')}"
+os.environ["DATABASE_URL"] = DB_URL
+os.environ.setdefault("API_SECRET", "loadtest-" + "x" * 24)
+os.environ.setdefault("METRICS_PORT", "0")
+
+EMAIL, PASSWORD = "loadtest@example.com", "loadtest"
+
+def seed(finance=50000, employees=200):
+    from sqlalchemy import insert
+    from database.db_manager import init_db, SessionLocal
+    from database.models import FinanceRecord, Employee, TransactionType, UserRole
+    from auth.auth_handler import AuthHandler
+    init_db()
+    db = SessionLocal()
+    db.execute(insert(Employee), [{"name": f"Worker {i}", "department": "Site", "is_active": True} for i in range(employees)])
+    start = date(2024, 1, 1)
+    db.execute(insert(FinanceRecord), [{
+        "date": start + timedelta(days=i % 365), "type": TransactionType.INCOME if i % 3 else TransactionType.EXPENSE,
+        "category": "Sales" if i % 3 else "Materials", "amount": round(random.uniform(100, 50000), 2)
+    } for i in range(finance)])
+    db.commit()
+    db.close()
+    AuthHandler().create_user("Load Test", EMAIL, PASSWORD, UserRole.OWNER)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=os.environ.copy()
+    )
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("API server did not start")
+
+def call(conn, method, path, token, body=None, headers=None):
+    hdrs = {"Authorization": f"Bearer {token}", **(headers or {})}
+    if body is not None:
+        hdrs["Content-Type"] = "application/json"
+        body = json.dumps(body)
+    conn.request(method, path, body=body, headers=hdrs)
+    resp = conn.getresponse()
+    return resp.status, resp.getheader("ETag"), resp.read()
+
+def scenario_list(conn, token, rng):
+    return call(conn, "GET", f"/api/finance?limit=100&after={rng.randint(0, 49000)}", token)
+
+def make_conditional(etags):
+    def scenario(conn, token, rng):
+        path, etag = rng.choice(etags)
+        return call(conn, "GET", path, token, headers={"If-None-Match": etag})
+    return scenario
+
+def scenario_get(conn, token, rng):
+    return call(conn, "GET", f"/api/finance/{rng.randint(1, 50000)}", token)
+
+def scenario_bulk(conn, token, rng):
+    day = (date(2025, 1, 1) + timedelta(days=rng.randint(0, 365))).isoformat()
+    rows = [{"employee_id": rng.randint(1, 200), "date": day, "status": "Present", "hours_worked": 8} for _ in range(200)]
+    return call(conn, "POST", "/api/attendance/bulk", token, body=rows)
+
+def run_scenario(port, token, scenario, clients, seconds, expect):
+    latencies, failures, lock, stop = [], [0], threading.Lock(), threading.Event()
+
+    def client(seed):
+        rng, conn, local, bad = random.Random(seed), http.client.HTTPConnection("127.0.0.1", port), [], 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            status, _, _ = scenario(conn, token, rng)
+            local.append(time.perf_counter() - started)
+            bad += status != expect
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            failures[0] += bad
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    pct = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else 0.0
+    return {"requests": len(latencies), "rps": len(latencies) / elapsed, "p50": pct(0.5), "p95": pct(0.95),
+            "p99": pct(0.99), "errors": failures[0]}
+
+def main(seconds=5, clients=8):
+    print(f"Seeding {DB_URL} ...")
+    seed()
+    port = free_port()
+    proc = start_server(port)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("POST", "/api/token", body=json.dumps({"email": EMAIL, "password": PASSWORD}),
+                     headers={"Content-Type": "application/json"})
+        token = json.loads(conn.getresponse().read())["access_token"]
+        etags = []
+        for after in range(0, 10000, 1000):
+            path = f"/api/finance?limit=100&after={after}"
+            etags.append((path, call(conn, "GET", path, token)[1]))
+        conn.close()
+
+        scenarios = [
+            ("list 100 rows", scenario_list, 200),
+            ("conditional GET (304)", make_conditional(etags), 304),
+            ("get by id", scenario_get, 200),
+            ("bulk 200 attendance", scenario_bulk, 201),
+        ]
+        print(f"{clients} clients x {seconds}s per scenario, uvicorn single worker on :{port}\n")
+        print(f"{'scenario':<24}{'requests':>10}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for label, scenario, expect in scenarios:
+            r = run_scenario(port, token, scenario, clients, seconds, expect)
+            print(f"{label:<24}{r['requests']:>10}{r['rps']:>10.0f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}{r['errors']:>8}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,78 @@
+import enum
+import json
+from datetime import date, datetime
+from sqlalchemy import Boolean, Integer, Float, Date, DateTime, Enum, inspect
+from database.models import (
+    UserRole, Project, Employee, Vendor, InventoryItem, Attendance, FinanceRecord,
+    ProductionLog, PurchaseOrder, Invoice, DocumentAsset
+)
+from utils.production_metrics import refresh_rollups
+
+EVERYONE = [r.value for r in UserRole]
+ACCOUNTS = [UserRole.ACCOUNTANT.value]
+PLANT = [UserRole.DIRECTOR.value]
+OWNER_ONLY = [UserRole.OWNER.value]
+
+class Resource:
+    """One model exposed over the API.
+
+    `roles` mirrors who can open the matching Streamlit module (Owners can
+    use everything), `filters` are the columns accepted as equality query
+    parameters, `date_column` enables ?from=&to=, and `bulk_spec` names the
+    utils.importer spec used to validate bulk creates.
+    """
+
+    def __init__(self, model, roles, filters=(), date_column=None, bulk_spec=None, after_bulk=None):
+        self.model = model
+        self.roles = roles
+        self.filters = filters
+        self.date_column = date_column
+        self.bulk_spec = bulk_spec
+        self.after_bulk = after_bulk
+        self.columns = [getattr(model, a.key) for a in inspect(model).column_attrs]
+
+RESOURCES = {
+    "projects": Resource(Project, EVERYONE, ["status", "client", "company_id", "branch_id"], "start_date"),
+    "employees": Resource(Employee, ACCOUNTS, ["department", "contract_type", "is_active"], "joining_date"),
+    "vendors": Resource(Vendor, OWNER_ONLY, ["rating"]),
+    "inventory": Resource(InventoryItem, OWNER_ONLY, ["category", "location"]),
+    "attendance": Resource(Attendance, ACCOUNTS, ["employee_id", "status"], "date", bulk_spec="Attendance"),
+    "finance": Resource(FinanceRecord, ACCOUNTS, ["type", "category", "payment_method"], "date", bulk_spec="Finance Records"),
+    "production": Resource(ProductionLog, PLANT, ["project_id"], "date", bulk_spec="Production Logs",
+                           after_bulk=refresh_rollups),
+    "purchase-orders": Resource(PurchaseOrder, OWNER_ONLY, ["vendor_id", "status"], "order_date"),
+    "invoices": Resource(Invoice, ACCOUNTS, ["project_id", "status"], "date_issued"),
+    "documents": Resource(DocumentAsset, OWNER_ONLY, ["project_id", "category", "content_hash"]),
+}
+
+def coerce_param(column, raw):
+    """Convert a query-string value to the column's Python type (ValueError if it can't)."""
+    kind = column.type
+    if isinstance(kind, Enum) and kind.enum_class is not None:
+        for member in kind.enum_class:
+            if raw.lower() in (member.value.lower(), member.name.lower()):
+                return member
+        raise ValueError(f"must be one of: {', '.join(m.value for m in kind.enum_class)}")
+    if isinstance(kind, Boolean):
+        if raw.lower() in ("1", "true", "yes"):
+            return True
+        if raw.lower() in ("0", "false", "no"):
+            return False
+        raise ValueError("must be true or false")
+    if isinstance(kind, Integer):
+        return int(raw)
+    if isinstance(kind, Float):
+        return float(raw)
+    if isinstance(kind, (Date, DateTime)):
+        return date.fromisoformat(raw)
+    return raw
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"not serialisable: {type(value).__name__}")
+
+def dumps(payload):
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
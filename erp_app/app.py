@@ -9,11 +9,21 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+import os
+import time
 import pandas as pd
-from database.db_manager import init_db
+import plotly.express as px
+from database.db_manager import init_db, start_replica_heartbeat
 from database.models import UserRole
 from auth.auth_handler import AuthHandler
 from ui.styles import load_css
+from utils.alerts import install_alert_hooks
+from utils.jobs import start_workers
+from utils.tenancy import set_tenant
+from utils.config import get_bool
+from utils.perf import page_run
+from utils.profiler import profiled_call
+from utils.metrics import start_metrics_server, observe_rerun
 from modules.projects import run_projects_module
 from modules.finance import run_finance_module
 from modules.inventory import run_inventory_module
@@ -31,6 +41,12 @@ from modules.site_ops import run_site_ops_module
 from modules.crm import run_crm_module
 from modules.compliance import run_compliance_module
 from modules.settings import run_settings_module
+from modules.performance import run_performance_module
+
+# Owner-only SQL cost panel; set PERF_MONITORING=true under System Configuration
+PERF_FLAG = "PERF_MONITORING"
+# Stack-sampled rerun profiles written to logs/rerun_profiles.jsonl
+PROFILE_FLAG = "PERF_PROFILING"
 
 def log_event(action, details=""):
     """Helper to log global system activities"""
@@ -52,6 +68,10 @@ st.markdown(load_css(), unsafe_allow_html=True)
 
 # --- Initialize DB ---
 init_db()
+install_alert_hooks()
+start_workers()
+start_replica_heartbeat()
+start_metrics_server()
 
 # --- Authentication ---
 auth = AuthHandler()
@@ -59,6 +79,8 @@ auth = AuthHandler()
 def main():
     if 'logged_in' not in st.session_state:
         st.session_state['logged_in'] = False
+    # Script threads are reused across sessions, so always reset the tenant
+    set_tenant(None)
         
     if not st.session_state['logged_in']:
         login_page()
@@ -138,6 +160,9 @@ def dashboard():
         st.title("QITPES ERP")
         st.write(f"Logged in: **{username}**")
         st.caption(f"Role: {role}")
+        if role == UserRole.OWNER.value:
+            render_tenant_switcher()
+        set_tenant(*st.session_state.get('tenant') or (None, None))
         st.markdown("---")
         
         selection = st.selectbox(
@@ -151,9 +176,11 @@ def dashboard():
         st.query_params["page"] = selection
         
         st.markdown("---")
+
+        render_alert_badge()
         
         # Database Status Indicator
-        from database.db_manager import DATABASE_URL, test_connection
+        from database.db_manager import DATABASE_URL, test_connection, replica_engine, replica_monitor
         with st.expander("💾 System Connectivity", expanded=False):
             is_alive = test_connection()
             if is_alive:
@@ -168,6 +195,11 @@ def dashboard():
             else:
                 st.error("🚨 DATABASE OFFLINE")
                 st.warning("Systems may be restricted.")
+            if replica_engine is not None:
+                if replica_monitor.healthy():
+                    st.success(f"📖 Read Replica Active (lag {replica_monitor.lag:.0f}s)")
+                else:
+                    st.warning("📖 Replica stale/unreachable — reads on primary")
 
         if st.button("Logout"):
             log_event("Logout", "User logged out")
@@ -179,7 +211,72 @@ def dashboard():
         if st.session_state.get('last_page') != selection:
             log_event("Navigation", f"Accessed module: {selection}")
             st.session_state['last_page'] = selection
-        menu_options[selection]()
+        render = menu_options[selection]
+        if get_bool(PROFILE_FLAG):
+            render = lambda page=render: profiled_call(selection, page)
+        started = time.perf_counter()
+        try:
+            if get_bool(PERF_FLAG):
+                with page_run(selection):
+                    render()
+            else:
+                render()
+        finally:
+            observe_rerun(selection, time.perf_counter() - started)
+
+def render_tenant_switcher():
+    """Owner-only selector for the company/branch every query is scoped to."""
+    from database.db_manager import SessionLocal
+    from database.models import Company, Branch
+    db = SessionLocal()
+    try:
+        companies = {c.id: c.name for c in db.query(Company).all()}
+        branches = db.query(Branch).order_by(Branch.company_id, Branch.name).all()
+        options = [(None, None)]
+        for cid in companies:
+            options.append((cid, None))
+            options.extend((cid, b.id) for b in branches if b.company_id == cid)
+        labels = {b.id: b.name for b in branches}
+    finally:
+        db.close()
+
+    current = tuple(st.session_state.get('tenant') or (None, None))
+    picked = st.selectbox(
+        "Tenant Scope", options,
+        index=options.index(current) if current in options else 0,
+        format_func=lambda t: "All Companies" if t[0] is None else
+            companies.get(t[0], "?") + (f" / {labels.get(t[1], '?')}" if t[1] else " (All Branches)")
+    )
+    st.session_state['tenant'] = picked
+
+def render_alert_badge():
+    """Global active-alert badge; also triggers the daily due-date sweep."""
+    from database.db_manager import SessionLocal
+    from utils.alerts import sweep_if_stale, active_alert_summary
+    db = SessionLocal()
+    try:
+        sweep_if_stale(db)
+        counts, top = active_alert_summary(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Alert check failed: {e}")
+        return
+    finally:
+        db.close()
+
+    total = sum(counts.values())
+    label = f"🔔 Alerts ({total})" if total else "🔔 Alerts"
+    with st.expander(label, expanded=False):
+        if not total:
+            st.caption("No active alerts.")
+        else:
+            st.caption(" · ".join(f"{sev}: {counts[sev]}" for sev in ["Critical", "Warning", "Info"] if sev in counts))
+            for a in top:
+                icon = "🔴" if a.severity == "Critical" else "🟠" if a.severity == "Warning" else "🔵"
+                st.write(f"{icon} {a.message}")
+            if total > len(top):
+                st.caption(f"+ {total - len(top)} more")
+    st.markdown("---")
 
 def get_menu_options(role):
     # Base options for everyone
@@ -208,6 +305,8 @@ def get_menu_options(role):
             "System Configuration": run_settings_module,
             "Management Console (Admin)": run_admin_module
         })
+        if get_bool(PERF_FLAG) or get_bool(PROFILE_FLAG):
+            options["Performance"] = run_performance_module
     elif role == UserRole.DIRECTOR.value:
         options.update({
             "Planning & Estimation": run_planning_module,
@@ -224,25 +323,34 @@ def get_menu_options(role):
     return options
 
 def custom_dashboard():
-    from database.db_manager import get_db
-    from database.models import Project, FinanceRecord, InventoryItem, Employee, PurchaseOrder, TransactionType, Client
+    from database.db_manager import get_read_db
+    from database.models import Project, FinanceRecord, Employee, PurchaseOrder, TransactionType, Client
     import plotly.graph_objects as go
+    from sqlalchemy import case, func
+    from utils.chart_data import daily_series, date_bounds
+    from utils.dashboard_loader import load_parallel
+    from utils.figure_cache import cached_figure
+    from ui.components import zoom_window
     
     st.header("Executive Strategic Command 🏛️")
-    db = next(get_db())
+    db = next(get_read_db())
     
-    # --- Fetch Data ---
-    projects = db.query(Project).all()
-    finance = db.query(FinanceRecord).all()
-    inventory = db.query(InventoryItem).all()
-    staff = db.query(Employee).filter(Employee.is_active == True).all()
-    orders = db.query(PurchaseOrder).all()
-    clients = db.query(Client).all()
+    # --- Fetch Data (independent reads run concurrently, one connection each) ---
+    data, _ = load_parallel({
+        "projects": lambda s: s.query(Project.name, Project.total_budget, Project.progress, Project.status).all(),
+        "finance": lambda s: dict(s.query(FinanceRecord.type, func.sum(FinanceRecord.amount)).group_by(FinanceRecord.type).all()),
+        "staff": lambda s: s.query(func.count(Employee.id)).filter(Employee.is_active == True).scalar(),
+        "orders": lambda s: s.query(func.sum(PurchaseOrder.total_amount)).scalar(),
+        "clients": lambda s: s.query(func.count(Client.id), func.sum(case((Client.status == "Lead", 1), else_=0))).one(),
+        "cash_bounds": lambda s: date_bounds(s, FinanceRecord.date),
+    })
+    projects = data["projects"]
+    client_count, lead_count = data["clients"]
     
     # --- TOP ROW: FINANCIAL GAUGES ---
     st.markdown("### 💰 Financial Velocity")
-    income = sum(f.amount for f in finance if f.type == TransactionType.INCOME)
-    expense = sum(f.amount for f in finance if f.type == TransactionType.EXPENSE)
+    income = data["finance"].get(TransactionType.INCOME) or 0
+    expense = data["finance"].get(TransactionType.EXPENSE) or 0
     cash_flow = income - expense
     
     col_g1, col_g2, col_g3 = st.columns(3)
@@ -274,15 +382,28 @@ def custom_dashboard():
         fig_cash.update_layout(height=180, margin=dict(l=10, r=10, t=30, b=10))
         st.plotly_chart(fig_cash, use_container_width=True)
 
+    # --- Cash flow trend, aggregated and downsampled server-side ---
+    signed = case((FinanceRecord.type == TransactionType.INCOME, FinanceRecord.amount), else_=-FinanceRecord.amount)
+    lo, hi = data["cash_bounds"]
+    start, end = zoom_window("Cash Flow Period", lo, hi, key="cash_zoom")
+    df_cash, points = daily_series(db, FinanceRecord.date, signed, start, end, cumulative=True)
+    if not df_cash.empty:
+        fig_flow = cached_figure(df_cash, {"chart": "cash_flow"}, lambda d: px.area(
+            d, x="Date", y="Value", title="Cumulative Cash Flow (₹)", labels={"Value": "Net Position (₹)"}
+        ).update_layout(height=300, margin=dict(l=10, r=10, t=40, b=10)))
+        st.plotly_chart(fig_flow, use_container_width=True)
+        if len(df_cash) < points:
+            st.caption(f"Showing {len(df_cash)} of {points} days. Narrow the period for full detail.")
+
     st.divider()
 
     # --- MIDDLE ROW: OPERATIONS & WORKFORCE ---
     st.markdown("### 🏭 Operational Excellence")
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Project Portfolio", len(projects), f"{len([p for p in projects if p.status.value == 'Active'])} Active")
-    c2.metric("Procurement Depth", f"₹{sum(o.total_amount for o in orders):,.0f}")
-    c3.metric("Force Multiplier", f"{len(staff)} Personnel")
-    c4.metric("Client Ecosystem", f"{len(clients)} Partners", delta=f"{len([c for c in clients if c.status == 'Lead'])} Leads")
+    c2.metric("Procurement Depth", f"₹{data['orders'] or 0:,.0f}")
+    c3.metric("Force Multiplier", f"{data['staff']} Personnel")
+    c4.metric("Client Ecosystem", f"{client_count} Partners", delta=f"{lead_count or 0} Leads")
 
     st.divider()
 
@@ -293,8 +414,9 @@ def custom_dashboard():
         st.subheader("📊 Capital Distribution by Project")
         if projects:
             df_p = pd.DataFrame([{ "Name": p.name, "Budget": p.total_budget, "Progress": p.progress } for p in projects])
-            fig_p = px.scatter(df_p, x="Name", y="Budget", size="Progress", color="Name",
-                              title="Strategic Asset Allocation Matrix", hover_name="Name")
+            fig_p = cached_figure(df_p, {"chart": "capital_distribution"}, lambda d: px.scatter(
+                d, x="Name", y="Budget", size="Progress", color="Name",
+                title="Strategic Asset Allocation Matrix", hover_name="Name"))
             st.plotly_chart(fig_p, use_container_width=True)
         else:
             st.info("No projects found.")
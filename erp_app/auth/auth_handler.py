@@ -2,6 +2,7 @@ import streamlit as st
 import bcrypt
 from database.models import User, UserRole
 from database.db_manager import SessionLocal
+from utils.metrics import record_login
 from datetime import datetime
 
 class AuthHandler:
@@ -14,22 +15,33 @@ class AuthHandler:
     def verify_password(self, stored_hash, password):
         return bcrypt.checkpw(password.encode(), stored_hash.encode())
 
-    def login(self, email, password):
-        """Authenticates user and sets session state"""
+    def authenticate(self, email, password):
+        """Verify credentials without touching session state; returns (user, message)"""
         user = self.db.query(User).filter(User.email == email).first()
         
         if user and self.verify_password(user.password_hash, password):
             if not user.is_active:
-                return False, "Account is disabled."
+                record_login("disabled")
+                return None, "Account is disabled."
+            record_login("success")
+            return user, "Login successful"
             
-            # Set Session State
-            st.session_state['logged_in'] = True
-            st.session_state['user_id'] = user.id
-            st.session_state['username'] = user.username
-            st.session_state['role'] = user.role.value
-            return True, "Login successful"
+        record_login("failure")
+        return None, "Invalid email or password"
+
+    def login(self, email, password):
+        """Authenticates user and sets session state"""
+        user, msg = self.authenticate(email, password)
+        if not user:
+            return False, msg
             
-        return False, "Invalid email or password"
+        # Set Session State
+        st.session_state['logged_in'] = True
+        st.session_state['user_id'] = user.id
+        st.session_state['username'] = user.username
+        st.session_state['role'] = user.role.value
+        st.session_state['tenant'] = (user.company_id, user.branch_id)
+        return True, msg
 
     def logout(self):
         """Clear session state"""
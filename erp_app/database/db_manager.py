@@ -1,8 +1,14 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
-from .models import Base
+import threading
+import time
+from sqlalchemy import create_engine, event, select, update, insert, Insert, Update, Delete
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
+from .models import Base, SyncWatermark
 from dotenv import load_dotenv
+from utils.time_utils import get_ist
+from utils.perf import install_sql_hooks
+from utils.metrics import install_metrics_hooks, register_pool
+from utils.outbox import install_outbox_hooks
 
 load_dotenv()
 
@@ -37,21 +43,176 @@ DB_PATH = DATABASE_URL.split("///")[-1] if "sqlite" in DATABASE_URL else "Remote
 if "sqlite" in DATABASE_URL and (os.getenv("STREAMLIT_SERVER_GATHER_USAGE_STATS") or os.getenv("SHIBBOLETH_ENABLED")):
     print("⚠️ WARNING: Running with SQLite on an ephemeral cloud filesystem.")
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {
-        "sslmode": "require",
-        "connect_timeout": 10
-    },
-    pool_pre_ping=True,  # Automatically reconnect if connection is lost
-    pool_recycle=300,    # Recycle connections every 5 minutes
-    pool_size=5,         # Maintain a small pool for Streamlit
-    max_overflow=10
-)
+# --- SQLite Concurrency Profile ---
+# WAL lets readers run alongside a writer; busy_timeout makes writers wait
+# for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",   # Durable at checkpoints; safe with WAL
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000")),
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # Negative = KiB, i.e. 64 MB page cache
+    "temp_store": "MEMORY",
+}
+SQLITE_MAINTENANCE_INTERVAL = 600 # seconds between PRAGMA optimize / checkpoint
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+_last_maintenance = {"at": time.monotonic()}
+
+def _sqlite_maintenance(dbapi_connection, connection_record):
+    """On pool checkin, at most every interval: refresh stats and trim the WAL."""
+    now = time.monotonic()
+    if now - _last_maintenance["at"] < SQLITE_MAINTENANCE_INTERVAL:
+        return
+    _last_maintenance["at"] = now
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA optimize")
+        cursor.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        cursor.close()
+    except Exception as e:
+        print(f"SQLite maintenance skipped: {e}")
+
+def make_engine(url, tuned=True):
+    eng = create_engine(
+        url, 
+        connect_args={"check_same_thread": False} if "sqlite" in url else {
+            "sslmode": "require",
+            "connect_timeout": 10
+        },
+        pool_pre_ping=True,  # Automatically reconnect if connection is lost
+        pool_recycle=300,    # Recycle connections every 5 minutes
+        pool_size=5,         # Maintain a small pool for Streamlit
+        max_overflow=10
+    )
+    if tuned and url.startswith("sqlite") and ":memory:" not in url:
+        event.listen(eng, "connect", _apply_sqlite_pragmas)
+        event.listen(eng, "checkin", _sqlite_maintenance)
+    return eng
+
+engine = make_engine(DATABASE_URL)
+install_sql_hooks(engine, Base)
+install_metrics_hooks(engine, Base.metadata)
+register_pool("primary", engine)
+install_outbox_hooks()
 
 # Thread-safe session factory
 SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 
+# --- Read Replica Routing ---
+# Optional: reports and dashboards read from REPLICA_DATABASE_URL while its
+# replication lag stays under MAX_REPLICA_LAG_SECONDS; otherwise the primary.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+MAX_REPLICA_LAG = float(os.getenv("MAX_REPLICA_LAG_SECONDS", "30"))
+# Stamp well inside the lag budget so the measured lag is not quantised
+HEARTBEAT_INTERVAL = float(os.getenv("REPLICA_HEARTBEAT_SECONDS", "5"))
+HEARTBEAT = "replica:heartbeat"
+
+replica_engine = make_engine(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None
+if replica_engine is not None:
+    install_sql_hooks(replica_engine)
+    install_metrics_hooks(replica_engine)
+    register_pool("replica", replica_engine)
+
+def _heartbeat_now():
+    # Stored naive (IST) so SQLite and Postgres hand back comparable values
+    return get_ist().replace(tzinfo=None)
+
+def write_replica_heartbeat():
+    """Stamp the heartbeat row on the primary; replicas copy it along."""
+    with engine.begin() as conn:
+        now = _heartbeat_now()
+        done = conn.execute(update(SyncWatermark).where(SyncWatermark.name == HEARTBEAT).values(last_run=now))
+        if done.rowcount == 0:
+            conn.execute(insert(SyncWatermark).values(name=HEARTBEAT, last_id=0, rows_processed=0, last_run=now))
+
+_heartbeat_thread = None
+
+def _heartbeat_loop():
+    while True:
+        try:
+            write_replica_heartbeat()
+        except Exception as e:
+            print(f"Replica heartbeat skipped: {e}")
+        time.sleep(HEARTBEAT_INTERVAL)
+
+def start_replica_heartbeat():
+    """Start the process-wide heartbeat writer once (only with a replica)."""
+    global _heartbeat_thread
+    if replica_engine is not None and _heartbeat_thread is None:
+        _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="erp-replica-heartbeat", daemon=True)
+        _heartbeat_thread.start()
+    return _heartbeat_thread
+
+class ReplicaMonitor:
+    """Cached replication-lag check against wall-clock time.
+
+    Lag is the age of the replica's copy of the heartbeat. The primary's own
+    heartbeat must also be fresh: if the writer has stopped, a replica that
+    caught up to the last stamp would otherwise look healthy forever.
+    """
+
+    def __init__(self, primary, replica, max_lag, check_interval=5.0):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self.error = None
+        self._checked_at = 0.0
+        self._healthy = False
+        self._lock = threading.Lock()
+
+    def _heartbeat(self, bind):
+        with bind.connect() as conn:
+            return conn.execute(select(SyncWatermark.last_run).where(SyncWatermark.name == HEARTBEAT)).scalar()
+
+    def check(self):
+        try:
+            now = _heartbeat_now()
+            primary_hb, replica_hb = self._heartbeat(self.primary), self._heartbeat(self.replica)
+            self.error = None
+            if primary_hb is None or (now - primary_hb).total_seconds() > self.max_lag:
+                self.error = "Primary heartbeat is stale; is the heartbeat writer running?"
+                self.lag = None
+            elif replica_hb is None:
+                self.lag = float("inf")
+            else:
+                self.lag = max((now - replica_hb).total_seconds(), 0.0)
+            self._healthy = self.lag is not None and self.lag <= self.max_lag
+        except Exception as e:
+            self.error, self.lag, self._healthy = str(e), None, False
+            print(f"Replica check failed, reading from primary: {e}")
+        self._checked_at = time.monotonic()
+        return self._healthy
+
+    def healthy(self):
+        if self.replica is None:
+            return False
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self.check()
+        return self._healthy
+
+replica_monitor = ReplicaMonitor(engine, replica_engine, MAX_REPLICA_LAG)
+
+class RoutingSession(Session):
+    """Writes and flushes go to the primary; reads to a healthy replica."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return engine
+        return replica_engine if replica_monitor.healthy() else engine
+
+# Read-mostly sessions for reports, dashboards and analytics
+ReadSessionLocal = scoped_session(sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False))
+
 def test_connection():
     """Verify if the database is reachable"""
     try:
@@ -81,3 +242,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Session for read-only screens; routed to the replica when it is fresh."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
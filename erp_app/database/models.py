@@ -1,6 +1,7 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, Boolean, Float, Date, DateTime, ForeignKey, Enum, create_engine
+    Column, Integer, String, Text, Boolean, Float, Date, DateTime, ForeignKey, Enum, UniqueConstraint, Index, LargeBinary, create_engine
 )
+from sqlalchemy import func
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import enum
@@ -48,6 +49,7 @@ class Branch(Base):
 # --- Core User Management ---
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (Index('ix_users_tenant', 'company_id', 'branch_id'),)
     id = Column(Integer, primary_key=True)
     username = Column(String(50), nullable=False)  # Display Name
     email = Column(String(120), unique=True, nullable=False)
@@ -73,6 +75,7 @@ class ActivityLog(Base):
 # --- 1. Project Management ---
 class Project(Base):
     __tablename__ = 'projects'
+    __table_args__ = (Index('ix_projects_tenant', 'company_id', 'branch_id', 'status'),)
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     client = Column(String(100))
@@ -86,6 +89,9 @@ class Project(Base):
     description = Column(Text)
     progress = Column(Integer, default=0) # 0-100%
 
+# Expression indexes behind the typeahead pickers' case-insensitive prefix search
+Index('ix_projects_name_lower', func.lower(Project.name))
+
 # --- 3. Purchase & vendor Management ---
 class Vendor(Base):
     __tablename__ = 'vendors'
@@ -96,6 +102,8 @@ class Vendor(Base):
     email = Column(String(100))
     rating = Column(Integer, default=3) # 1-5
 
+Index('ix_vendors_name_lower', func.lower(Vendor.name))
+
 class PurchaseOrder(Base):
     __tablename__ = 'purchase_orders'
     id = Column(Integer, primary_key=True)
@@ -129,13 +137,14 @@ class Asset(Base):
     purchase_date = Column(Date)
     last_service_date = Column(Date)
     next_service_due = Column(Date)
+    service_interval_hours = Column(Float, default=250.0) # Run hours between services
     status = Column(String(20), default="Active") # Active, Maintenance, Retired
 
 class AssetLog(Base):
     __tablename__ = 'asset_logs'
     id = Column(Integer, primary_key=True)
-    asset_id = Column(Integer, ForeignKey('assets.id'))
-    date = Column(Date, default=get_ist_date)
+    asset_id = Column(Integer, ForeignKey('assets.id'), index=True)
+    date = Column(Date, default=get_ist_date, index=True)
     hours_used = Column(Float, default=0.0)
     fuel_consumed = Column(Float, default=0.0)
     notes = Column(Text)
@@ -143,6 +152,7 @@ class AssetLog(Base):
 # --- 7. Finance ---
 class FinanceRecord(Base):
     __tablename__ = 'finance_records'
+    __table_args__ = (Index('ix_finance_records_tenant', 'company_id', 'branch_id', 'date'),)
     id = Column(Integer, primary_key=True)
     date = Column(Date, default=get_ist_date)
     type = Column(Enum(TransactionType))
@@ -167,6 +177,8 @@ class Employee(Base):
     contract_type = Column(String(20)) # Permanent, Contract
     is_active = Column(Boolean, default=True)
 
+Index('ix_employees_name_lower', func.lower(Employee.name))
+
 class Payroll(Base):
     __tablename__ = 'payroll'
     id = Column(Integer, primary_key=True)
@@ -196,6 +208,8 @@ class ProductionLog(Base):
     waste_generated = Column(Float, default=0.0)
     notes = Column(Text)
 
+    project = relationship("Project")
+
 # --- 10. Software & Digital Assets ---
 class SoftwareAsset(Base):
     __tablename__ = 'software_assets'
@@ -203,7 +217,7 @@ class SoftwareAsset(Base):
     name = Column(String(100), nullable=False)
     version = Column(String(20))
     license_key = Column(String(100))
-    expiry_date = Column(Date)
+    expiry_date = Column(Date, index=True)
     status = Column(String(20), default="Active") # Active, Expired, Pending Update
     assigned_to = Column(String(100)) # e.g., 'IT Dept', 'Design Team'
 
@@ -213,7 +227,7 @@ class MaintenanceSchedule(Base):
     id = Column(Integer, primary_key=True)
     asset_id = Column(Integer, ForeignKey('assets.id'))
     task_name = Column(String(100), nullable=False)
-    scheduled_date = Column(Date)
+    scheduled_date = Column(Date, index=True)
     performed_date = Column(Date)
     status = Column(String(20), default="Scheduled") # Scheduled, Completed, Overdue
     cost = Column(Float, default=0.0)
@@ -228,7 +242,7 @@ class Invoice(Base): # Accounts Receivable
     project_id = Column(Integer, ForeignKey('projects.id'))
     invoice_number = Column(String(50), unique=True)
     date_issued = Column(Date, default=get_ist_date)
-    due_date = Column(Date)
+    due_date = Column(Date, index=True)
     amount = Column(Float, nullable=False)
     status = Column(String(20), default="Unpaid") # Unpaid, Paid, Partially Paid
     
@@ -276,9 +290,20 @@ class DocumentAsset(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String(100), nullable=False)
     category = Column(String(50)) # Contract, Drawing, License
-    file_path = Column(String(255))
+    file_path = Column(String(255)) # blob path relative to the document store root
     upload_date = Column(DateTime, default=get_ist)
     project_id = Column(Integer, ForeignKey('projects.id'), nullable=True)
+    content_hash = Column(String(64), index=True) # SHA-256, shared by duplicate uploads
+    size_bytes = Column(Integer, default=0)
+    mime_type = Column(String(100))
+    original_filename = Column(String(255))
+
+    project = relationship("Project")
+
+    __table_args__ = (
+        # Covers the per-project storage rollup without touching the table
+        Index('ix_document_assets_project_size', 'project_id', 'content_hash', 'size_bytes'),
+    )
 
 # --- 16. Training & Skills ---
 class TrainingRecord(Base):
@@ -334,3 +359,185 @@ class SystemSetting(Base):
     value = Column(Text)
     description = Column(Text)
 
+
+# --- 20. Planning: Task Network (Critical Path) ---
+class ProjectTask(Base):
+    __tablename__ = 'project_tasks'
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey('projects.id'), index=True)
+    name = Column(String(100), nullable=False)
+    duration = Column(Integer, default=1) # Working days
+    # CPM results, stored as day offsets from the project start date
+    early_start = Column(Integer, default=0)
+    early_finish = Column(Integer, default=0)
+    late_start = Column(Integer, default=0)
+    late_finish = Column(Integer, default=0)
+    total_float = Column(Integer, default=0)
+    is_critical = Column(Boolean, default=False)
+    # Daily resource demand while the task runs
+    labour_units = Column(Integer, default=0)
+    machinery_units = Column(Integer, default=0)
+    leveled_start = Column(Integer, nullable=True) # Offset chosen by resource leveling
+
+    project = relationship("Project")
+
+class TaskDependency(Base):
+    __tablename__ = 'task_dependencies'
+    id = Column(Integer, primary_key=True)
+    predecessor_id = Column(Integer, ForeignKey('project_tasks.id'), index=True)
+    successor_id = Column(Integer, ForeignKey('project_tasks.id'), index=True)
+    lag = Column(Integer, default=0) # Finish-to-start lag in days
+
+# --- 21. Batch Processing Watermarks ---
+class SyncWatermark(Base):
+    __tablename__ = 'sync_watermarks'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, unique=True) # Batch job / consumer name
+    last_id = Column(Integer, default=0) # Highest source row id already processed
+    last_run = Column(DateTime)
+    rows_processed = Column(Integer, default=0)
+
+# --- 22. Fuel Consumption Anomalies ---
+class FuelAnomaly(Base):
+    __tablename__ = 'fuel_anomalies'
+    id = Column(Integer, primary_key=True)
+    log_id = Column(Integer, ForeignKey('asset_logs.id'), unique=True)
+    asset_id = Column(Integer, ForeignKey('assets.id'), index=True)
+    date = Column(Date, index=True)
+    litres_per_hour = Column(Float)
+    baseline = Column(Float) # Rolling median L/h before this log
+    zscore = Column(Float) # Robust (median/MAD) z-score
+    status = Column(String(20), default="Open") # Open, Reviewed
+
+    asset = relationship("Asset")
+
+# --- 23. Production Rollups (Pre-aggregated Plant Metrics) ---
+class ProductionRollup(Base):
+    __tablename__ = 'production_rollups'
+    __table_args__ = (UniqueConstraint('project_id', 'grain', 'period_start'),)
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey('projects.id'), index=True)
+    grain = Column(String(1), nullable=False) # D = Daily, W = Weekly (Monday start)
+    period_start = Column(Date, nullable=False, index=True)
+    output = Column(Float, default=0.0)
+    waste = Column(Float, default=0.0)
+    efficiency_sum = Column(Float, default=0.0) # Averaged over log_count on read
+    log_count = Column(Integer, default=0)
+    qc_total = Column(Integer, default=0)
+    qc_pass = Column(Integer, default=0)
+
+# --- 24. Operational Alerts ---
+class Alert(Base):
+    __tablename__ = 'alerts'
+    __table_args__ = (
+        UniqueConstraint('rule', 'entity_id'),
+        Index('ix_alerts_active_severity', 'is_active', 'severity'),
+    )
+    id = Column(Integer, primary_key=True)
+    rule = Column(String(50), nullable=False) # low_stock, license_expired, maintenance_overdue, invoice_overdue
+    entity_id = Column(Integer, nullable=False) # Row id in the rule's source table
+    severity = Column(String(10), default="Warning") # Info, Warning, Critical
+    message = Column(String(255))
+    due_date = Column(Date)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=get_ist)
+    resolved_at = Column(DateTime)
+
+# --- 25. Background Jobs ---
+class JobSchedule(Base):
+    __tablename__ = 'job_schedules'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+    job_name = Column(String(100), nullable=False) # Registered job in utils.jobs
+    payload = Column(Text) # JSON keyword arguments
+    cron = Column(String(100), nullable=False) # minute hour day month weekday
+    is_active = Column(Boolean, default=True)
+    last_run = Column(DateTime)
+    next_run = Column(DateTime, index=True)
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    __table_args__ = (Index('ix_jobs_status_run_at', 'status', 'run_at'),)
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(Text) # JSON keyword arguments
+    status = Column(String(20), default="Queued") # Queued, Running, Succeeded, Failed
+    priority = Column(Integer, default=0) # Lower runs first
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_at = Column(DateTime, default=get_ist)
+    locked_by = Column(String(100))
+    locked_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Float)
+    progress = Column(Float, default=0.0) # 0..1
+    progress_note = Column(String(255))
+    result = Column(Text)
+    error = Column(Text)
+    schedule_id = Column(Integer, ForeignKey('job_schedules.id'))
+    created_at = Column(DateTime, default=get_ist)
+
+    schedule = relationship("JobSchedule")
+
+# --- 26. Bank Reconciliation ---
+class BankStatement(Base):
+    __tablename__ = 'bank_statements'
+    id = Column(Integer, primary_key=True)
+    account_name = Column(String(100))
+    filename = Column(String(255))
+    period_start = Column(Date)
+    period_end = Column(Date)
+    line_count = Column(Integer, default=0)
+    company_id = Column(Integer, ForeignKey('companies.id'), nullable=True)
+    branch_id = Column(Integer, ForeignKey('branches.id'), nullable=True)
+    imported_at = Column(DateTime, default=get_ist)
+
+    lines = relationship("BankStatementLine", back_populates="statement", cascade="all, delete-orphan")
+
+class BankStatementLine(Base):
+    __tablename__ = 'bank_statement_lines'
+    __table_args__ = (
+        Index('ix_bank_lines_statement_status', 'statement_id', 'status'),
+        Index('ix_bank_lines_match', 'match_type', 'match_id'),
+    )
+    id = Column(Integer, primary_key=True)
+    statement_id = Column(Integer, ForeignKey('bank_statements.id'), nullable=False)
+    date = Column(Date, nullable=False)
+    description = Column(String(255))
+    reference = Column(String(100))
+    amount = Column(Float, nullable=False) # Signed: credit +, debit -
+    balance = Column(Float)
+    status = Column(String(20), default="Unmatched") # Unmatched, Suggested, Matched, Ignored
+    match_type = Column(String(20)) # finance, invoice, bill
+    match_id = Column(Integer)
+    confidence = Column(Float)
+    matched_at = Column(DateTime)
+
+    statement = relationship("BankStatement", back_populates="lines")
+
+# --- 27. Transactional Outbox (Change Feed) ---
+class ChangeEvent(Base):
+    __tablename__ = 'change_events'
+    __table_args__ = {'sqlite_autoincrement': True} # Ids must never be reused after compaction
+    id = Column(Integer, primary_key=True) # Consumers read strictly in id order
+    table_name = Column(String(64), nullable=False)
+    row_id = Column(Integer) # Null for bulk statements touching an unknown set of rows
+    op = Column(String(10), nullable=False) # insert, update, delete
+    changes = Column(Text) # JSON: new values (insert/update), last known values (delete)
+    changed_at = Column(DateTime, default=get_ist)
+
+# --- 28. Attendance Bitmaps (Packed Employee-Months) ---
+class AttendanceMonth(Base):
+    __tablename__ = 'attendance_months'
+    __table_args__ = (UniqueConstraint('employee_id', 'month'), Index('ix_attendance_months_month', 'month'))
+    id = Column(Integer, primary_key=True)
+    employee_id = Column(Integer, ForeignKey('employees.id'), nullable=False)
+    month = Column(String(7), nullable=False) # Format: YYYY-MM, as in payroll
+    # Bit d-1 is day d of the month
+    present_bits = Column(Integer, default=0) # Present or Half Day
+    half_day_bits = Column(Integer, default=0)
+    leave_bits = Column(Integer, default=0)
+    absent_bits = Column(Integer, default=0)
+    hours = Column(LargeBinary) # 31 bytes: hours worked per day in tenths, for present days
+    updated_at = Column(DateTime, default=get_ist)
@@ -19,7 +19,32 @@ def run_migrations():
         ("finance_records", "currency", "VARCHAR(10)", "'INR'"),
         ("finance_records", "exchange_rate", "FLOAT", "1.0"),
         ("finance_records", "company_id", "INTEGER", "NULL"),
-        ("finance_records", "branch_id", "INTEGER", "NULL")
+        ("finance_records", "branch_id", "INTEGER", "NULL"),
+        ("project_tasks", "labour_units", "INTEGER", "0"),
+        ("project_tasks", "machinery_units", "INTEGER", "0"),
+        ("project_tasks", "leveled_start", "INTEGER", "NULL"),
+        ("assets", "service_interval_hours", "FLOAT", "250.0"),
+        ("document_assets", "content_hash", "VARCHAR(64)", "NULL"),
+        ("document_assets", "size_bytes", "INTEGER", "0"),
+        ("document_assets", "mime_type", "VARCHAR(100)", "NULL"),
+        ("document_assets", "original_filename", "VARCHAR(255)", "NULL")
+    ]
+    
+    # Indexes declared on existing tables (create_all only indexes new tables)
+    indexes = [
+        ("ix_asset_logs_asset_id", "asset_logs", "asset_id"),
+        ("ix_asset_logs_date", "asset_logs", "date"),
+        ("ix_software_assets_expiry_date", "software_assets", "expiry_date"),
+        ("ix_maintenance_schedules_scheduled_date", "maintenance_schedules", "scheduled_date"),
+        ("ix_invoices_due_date", "invoices", "due_date"),
+        ("ix_users_tenant", "users", "company_id, branch_id"),
+        ("ix_projects_tenant", "projects", "company_id, branch_id, status"),
+        ("ix_finance_records_tenant", "finance_records", "company_id, branch_id, date"),
+        ("ix_document_assets_content_hash", "document_assets", "content_hash"),
+        ("ix_document_assets_project_size", "document_assets", "project_id, content_hash, size_bytes"),
+        ("ix_projects_name_lower", "projects", "lower(name)"),
+        ("ix_vendors_name_lower", "vendors", "lower(name)"),
+        ("ix_employees_name_lower", "employees", "lower(name)")
     ]
     
     with engine.connect() as conn:
@@ -36,6 +61,14 @@ def run_migrations():
                     print(f"Column {column} already exists in {table}.")
                 else:
                     print(f"Error migrating {table}.{column}: {e}")
+
+        for name, table, columns in indexes:
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Error creating index {name}: {e}")
         
     print("Migration check completed.")
 
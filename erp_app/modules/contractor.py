@@ -4,6 +4,7 @@ from database.models import Employee, Attendance
 from database.db_manager import get_db
 from datetime import datetime
 from utils.time_utils import get_ist_date
+from ui.components import entity_picker
 
 def run_contractor_module():
     st.header("Contractor & Labour Management 🤝")
@@ -99,31 +100,31 @@ def run_contractor_module():
 
         with tab_list:
             st.subheader("Workforce Master Maintenance")
-            workers = db.query(Employee).all()
-            if workers:
-                w_sel = st.selectbox("Select Worker to Modify", workers, format_func=lambda x: f"{x.name} ({x.role or 'General'})")
-                
-                with st.form("edit_worker_form"):
-                    col1, col2 = st.columns(2)
-                    e_name = col1.text_input("Update Name", value=w_sel.name)
-                    e_role = col2.text_input("Update Trade", value=w_sel.role or "")
-                    e_wage = col1.number_input("Update Rate (₹)", value=float(w_sel.salary or 0))
-                    e_status = col2.checkbox("Active Member", value=w_sel.is_active)
+            if db.query(Employee.id).first():
+                w_sel = entity_picker("Select Worker to Modify", db, Employee, "contractor_worker", Employee.name,
+                                      lambda r: f"{r.name} ({r.role or 'General'})", columns=(Employee.name, Employee.role))
+                if w_sel:
+                    with st.form("edit_worker_form"):
+                        col1, col2 = st.columns(2)
+                        e_name = col1.text_input("Update Name", value=w_sel.name)
+                        e_role = col2.text_input("Update Trade", value=w_sel.role or "")
+                        e_wage = col1.number_input("Update Rate (₹)", value=float(w_sel.salary or 0))
+                        e_status = col2.checkbox("Active Member", value=w_sel.is_active)
                     
-                    if st.form_submit_button("💾 Save Profile Changes"):
-                        w_sel.name = e_name
-                        w_sel.role = e_role
-                        w_sel.salary = e_wage
-                        w_sel.is_active = e_status
+                        if st.form_submit_button("💾 Save Profile Changes"):
+                            w_sel.name = e_name
+                            w_sel.role = e_role
+                            w_sel.salary = e_wage
+                            w_sel.is_active = e_status
+                            db.commit()
+                            st.success("Profile updated.")
+                            st.rerun()
+                
+                    st.divider()
+                    if st.button("🔴 DELETE WORKER PERMANENTLY"):
+                        db.delete(w_sel)
                         db.commit()
-                        st.success("Profile updated.")
+                        st.success("Worker removed from database.")
                         st.rerun()
-                
-                st.divider()
-                if st.button("🔴 DELETE WORKER PERMANENTLY"):
-                    db.delete(w_sel)
-                    db.commit()
-                    st.success("Worker removed from database.")
-                    st.rerun()
             else:
                 st.info("No workers registered yet.")
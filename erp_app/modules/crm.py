@@ -2,7 +2,10 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from database.models import Client, Contract, Project
-from database.db_manager import get_db
+from database.db_manager import get_db, get_read_db
+from utils.figure_cache import cached_figure
+from utils.mis_data import crm_summary
+from ui.components import analytics_source_caption
 from datetime import datetime
 
 def run_crm_module():
@@ -107,15 +110,15 @@ def run_crm_module():
 
     elif option == "CRM Analytics":
         st.subheader("Client & Contract Insights 📊")
-        clients = db.query(Client).all()
-        contracts = db.query(Contract).all()
+        db = next(get_read_db())
+        clients, contracts = crm_summary(db)
         
-        if clients:
+        if not clients.empty:
             c1, c2, c3 = st.columns(3)
-            c1.metric("Total Clients", len(clients))
-            c2.metric("Active Leads", len([c for c in clients if c.status == "Lead"]))
+            c1.metric("Total Clients", int(clients["Count"].sum()))
+            c2.metric("Active Leads", int(clients.loc[clients["Status"] == "Lead", "Count"].sum()))
             
-            total_cv = sum(c.contract_value for c in contracts)
+            total_cv = contracts["Value"].sum()
             c3.metric("Pipeline Value", f"₹{total_cv:,.0f}")
             
             st.divider()
@@ -123,15 +126,16 @@ def run_crm_module():
             
             with col_l:
                 # Client Status
-                df_c = pd.DataFrame([{ "Status": c.status } for c in clients])
-                fig_c = px.pie(df_c, names="Status", title="Client Conversion Status", hole=0.4)
+                fig_c = cached_figure(clients, {"chart": "client_conversion"}, lambda d: px.pie(
+                    d, names="Status", values="Count", title="Client Conversion Status", hole=0.4))
                 st.plotly_chart(fig_c, use_container_width=True)
                 
             with col_r:
                 # Contract Value by Status
-                if contracts:
-                    df_v = pd.DataFrame([{ "Status": c.status, "Value": c.contract_value } for c in contracts])
-                    fig_v = px.bar(df_v, x="Status", y="Value", color="Status", title="Contract Value by Status")
+                if not contracts.empty:
+                    fig_v = cached_figure(contracts, {"chart": "contract_value"}, lambda d: px.bar(
+                        d, x="Status", y="Value", color="Status", title="Contract Value by Status"))
                     st.plotly_chart(fig_v, use_container_width=True)
+            analytics_source_caption()
         else:
             st.info("Insufficient data for CRM analytics.")
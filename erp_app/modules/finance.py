@@ -2,9 +2,13 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from sqlalchemy import func
-from database.models import FinanceRecord, TransactionType, Invoice, Bill, Project, Vendor
+from database.models import FinanceRecord, TransactionType, Invoice, Bill, Project, Vendor, BankStatement, BankStatementLine
 from database.db_manager import get_db
 from datetime import datetime
+from utils.reconciliation import (
+    AUTO_MATCH, ingest_statement, reconcile_statement, set_line_status, manual_match, target_labels
+)
+from ui.components import entity_picker
 
 def run_finance_module():
     st.header("Financial Strategy & Tax Command 🏢")
@@ -16,6 +20,7 @@ def run_finance_module():
             "Profitability & Costing", 
             "GST & Taxation",
             "Accounts Payable/Receivable",
+            "Bank Reconciliation",
             "Budgeting & Forecasting"
         ])
         
@@ -53,9 +58,8 @@ def run_finance_module():
 
     elif option == "Profitability & Costing":
         st.subheader("Project Costing & Margin Analysis")
-        projects = db.query(Project).all()
-        if projects:
-            p_sel = st.selectbox("Analysis Target", projects, format_func=lambda x: x.name)
+        p_sel = entity_picker("Analysis Target", db, Project, "costing_project", Project.name, lambda r: r.name, columns=(Project.name,))
+        if p_sel:
             
             # Simplified Costing Calculation
             budget = p_sel.total_budget
@@ -117,6 +121,103 @@ def run_finance_module():
             else:
                 st.info("No payables found.")
 
+    elif option == "Bank Reconciliation":
+        st.subheader("Bank Statement Reconciliation 🏦")
+        tab1, tab2 = st.tabs(["Reconcile", "Import Statement"])
+
+        with tab2:
+            with st.form("bank_stmt_form"):
+                account = st.text_input("Bank Account*", placeholder="e.g. HDFC Current A/c 1234")
+                upload = st.file_uploader("Statement File (CSV / XLSX)", type=["csv", "xlsx"])
+                st.caption("Needs a date column and either an amount column or credit/debit columns; narration, reference and balance are optional.")
+                if st.form_submit_button("📥 Import Statement"):
+                    if account and upload:
+                        try:
+                            stmt, skipped = ingest_statement(db, upload.getvalue(), upload.name, account)
+                            result = reconcile_statement(db, stmt.id)
+                            st.success(f"Imported {stmt.line_count:,} lines ({skipped} skipped). Auto-matched {result['matched']:,}, "
+                                       f"suggested {result['suggested']:,} in {result['seconds']:.2f}s.")
+                        except ValueError as e:
+                            st.error(f"Could not read statement: {e}")
+                    else:
+                        st.error("Account and file are required.")
+
+        with tab1:
+            statements = db.query(BankStatement).order_by(BankStatement.imported_at.desc()).all()
+            if not statements:
+                st.info("No statements imported yet.")
+            else:
+                stmt = st.selectbox("Statement", statements, format_func=lambda x: f"{x.account_name} · {x.period_start} → {x.period_end} ({x.line_count} lines)")
+                lines = pd.read_sql(db.query(BankStatementLine).filter(BankStatementLine.statement_id == stmt.id)
+                                    .order_by(BankStatementLine.date, BankStatementLine.id).statement, db.connection())
+                counts = lines["status"].value_counts()
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("Matched", f"{counts.get('Matched', 0):,}")
+                c2.metric("Suggested", f"{counts.get('Suggested', 0):,}")
+                c3.metric("Unmatched", f"{counts.get('Unmatched', 0):,}")
+                c4.metric("Unreconciled Amount", f"₹{lines.loc[lines['status'] == 'Unmatched', 'amount'].sum():,.2f}")
+
+                col_a, col_b, col_c = st.columns(3)
+                window = col_a.number_input("Ledger Date Window (days)", min_value=0, value=3)
+                doc_window = col_b.number_input("Invoice/Bill Window (days)", min_value=0, value=45)
+                if col_c.button("⚡ Run Auto-Match"):
+                    result = reconcile_statement(db, stmt.id, window_days=int(window), doc_window_days=int(doc_window), rematch=True)
+                    st.success(f"Matched {result['matched']:,}, suggested {result['suggested']:,} of {result['lines']:,} open lines in {result['seconds']:.2f}s.")
+                    st.rerun()
+
+                view = st.radio("Show", ["Suggested", "Unmatched", "Matched", "Ignored", "All"], horizontal=True)
+                shown = lines if view == "All" else lines[lines["status"] == view]
+                shown = shown.head(1000)
+                if not shown.empty:
+                    shown = shown.assign(matched_to=target_labels(db, shown))
+                    st.dataframe(shown[["id", "date", "description", "reference", "amount", "status", "confidence", "matched_to"]].rename(columns={
+                        "id": "Line", "date": "Date", "description": "Narration", "reference": "Ref", "amount": "Amount",
+                        "status": "Status", "confidence": "Confidence", "matched_to": "Matched To"
+                    }), use_container_width=True)
+                else:
+                    st.info(f"No {view.lower()} lines.")
+
+                suggested = lines[lines["status"] == "Suggested"]
+                if not suggested.empty:
+                    st.markdown("#### Review Suggestions")
+                    floor = st.slider("Accept suggestions with confidence ≥", 0.5, AUTO_MATCH, 0.75, 0.05)
+                    picked = suggested[suggested["confidence"] >= floor]
+                    col_x, col_y = st.columns(2)
+                    if col_x.button(f"✅ Accept {len(picked)} Suggestions") and not picked.empty:
+                        set_line_status(db, picked["id"].tolist(), "Matched")
+                        st.rerun()
+                    if col_y.button("↩️ Reject All Suggestions"):
+                        set_line_status(db, suggested["id"].tolist(), "Unmatched")
+                        st.rerun()
+
+                open_lines = lines[lines["status"] == "Unmatched"]
+                if not open_lines.empty:
+                    st.markdown("#### Manual Match")
+                    l_id = st.selectbox("Statement Line", open_lines["id"].tolist(), format_func=lambda i: (
+                        lambda r: f"#{i} · {r['date']} · ₹{r['amount']:,.2f} · {r['description'][:40]}")(open_lines.set_index("id").loc[i]))
+                    line = open_lines.set_index("id").loc[l_id]
+                    if line["amount"] > 0:
+                        options = [("finance", r.id, f"Ledger #{r.id} · {r.date} · ₹{r.amount:,.2f} · {r.category}") for r in db.query(FinanceRecord)
+                                   .filter(FinanceRecord.type == TransactionType.INCOME, func.abs(FinanceRecord.amount - line["amount"]) < 0.01).limit(50)]
+                        options += [("invoice", i.id, f"Invoice {i.invoice_number} · ₹{i.amount:,.2f}") for i in db.query(Invoice)
+                                    .filter(func.abs(Invoice.amount - line["amount"]) < 0.01).limit(50)]
+                    else:
+                        options = [("finance", r.id, f"Ledger #{r.id} · {r.date} · ₹{r.amount:,.2f} · {r.category}") for r in db.query(FinanceRecord)
+                                   .filter(FinanceRecord.type == TransactionType.EXPENSE, func.abs(FinanceRecord.amount + line["amount"]) < 0.01).limit(50)]
+                        options += [("bill", b.id, f"Bill {b.bill_number} · ₹{b.amount:,.2f}") for b in db.query(Bill)
+                                    .filter(func.abs(Bill.amount + line["amount"]) < 0.01).limit(50)]
+                    col_m, col_i = st.columns(2)
+                    if options:
+                        target = col_m.selectbox("Same-amount Entries", options, format_func=lambda o: o[2])
+                        if col_m.button("🔗 Match Line"):
+                            manual_match(db, int(l_id), target[0], target[1])
+                            st.rerun()
+                    else:
+                        col_m.info("No entries with the same amount.")
+                    if col_i.button("🚫 Ignore Line (bank charge, interest...)"):
+                        set_line_status(db, [int(l_id)], "Ignored")
+                        st.rerun()
+
     elif option == "Budgeting & Forecasting":
         st.subheader("Budget Variance & Financial Forecasting")
         st.info("Set monthly spending limits and monitor actual vs budget forecast.")
@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
+import plotly.express as px
 from database.models import Employee, Payroll, Attendance, TrainingRecord
 from database.db_manager import get_db
 from datetime import datetime
 from utils.time_utils import get_ist_date
+from utils.attendance_bitmap import refresh_attendance_store, load_month, last_refreshed, prorated_salary
+from utils.jobs import enqueue
+from ui.components import entity_picker
 
 def run_hr_module():
     st.header("Human Resource & Workforce Management 👥")
@@ -15,7 +19,8 @@ def run_hr_module():
             "Workforce Directory", 
             "Payroll & Benefits", 
             "Training & Skill Matrix",
-            "Shift & Attendance Management"
+            "Shift & Attendance Management",
+            "Monthly Attendance Matrix"
         ])
         
     if option == "Staff Onboarding":
@@ -59,37 +64,48 @@ def run_hr_module():
             
             st.divider()
             st.subheader("Modify Employee Profile")
-            emp_sel = st.selectbox("Select Profile", emps, format_func=lambda x: f"{x.name} ({x.role})")
-            with st.expander("Edit Personal Details"):
-                with st.form("edit_emp"):
-                    e_name = st.text_input("Internal Name", value=emp_sel.name)
-                    e_active = st.checkbox("Current Active Staff", value=emp_sel.is_active)
-                    if st.form_submit_button("Update Profile"):
-                        emp_sel.name = e_name
-                        emp_sel.is_active = e_active
-                        db.commit()
-                        st.success("Synchronized successfully.")
-                        st.rerun()
+            emp_sel = entity_picker("Select Profile", db, Employee, "hr_profile", Employee.name,
+                                    lambda r: f"{r.name} ({r.role})", columns=(Employee.name, Employee.role))
+            if emp_sel:
+                with st.expander("Edit Personal Details"):
+                    with st.form("edit_emp"):
+                        e_name = st.text_input("Internal Name", value=emp_sel.name)
+                        e_active = st.checkbox("Current Active Staff", value=emp_sel.is_active)
+                        if st.form_submit_button("Update Profile"):
+                            emp_sel.name = e_name
+                            emp_sel.is_active = e_active
+                            db.commit()
+                            st.success("Synchronized successfully.")
+                            st.rerun()
 
     elif option == "Payroll & Benefits":
         st.subheader("Advanced Payroll Processor")
         month = st.date_input("Select Month for Processing").strftime("%Y-%m")
         active_emps = db.query(Employee).filter(Employee.is_active == True).all()
         
+        st.caption("Monthly salaries are prorated by the share of logged days attended; daily-wage workers are paid per day present.")
+        
         if st.button(f"🚀 Execute Payroll for {month}"):
+            refresh_attendance_store(db)
+            att = load_month(db, month)
+            pos = {eid: i for i, eid in enumerate(att.employees["employee_id"])}
+            payable, recorded = att.payable_days(), att.recorded_days()
             payroll_data = []
             for emp in active_emps:
-                # Basic calculation logic
-                deductions = emp.salary * 0.05 # Mock PT/Contribution
-                net = emp.salary - deductions
+                i = pos.get(emp.id)
+                days = payable[i] if i is not None else 0
+                gross = prorated_salary(emp.salary, emp.contract_type, days, recorded[i] if i is not None else 0)
+                deductions = gross * 0.05 # Mock PT/Contribution
+                net = gross - deductions
                 payroll_data.append({
                     "Employee": emp.name, 
-                    "Gross Pay": f"₹{emp.salary:,.2f}", 
+                    "Days Paid": f"{days:g}" if i is not None and recorded[i] else "Not tracked",
+                    "Gross Pay": f"₹{gross:,.2f}", 
                     "Tax/Ded.": f"-₹{deductions:,.2f}", 
                     "Net Payable": f"₹{net:,.2f}"
                 })
                 # Commit to DB
-                new_p = Payroll(employee_id=emp.id, month=month, basic_salary=emp.salary, deductions=deductions, net_salary=net, status="Paid")
+                new_p = Payroll(employee_id=emp.id, month=month, basic_salary=gross, deductions=deductions, net_salary=net, status="Paid")
                 db.add(new_p)
             
             db.commit()
@@ -113,18 +129,20 @@ def run_hr_module():
                 st.info("No training records found. Build your skill matrix now.")
                 
         with tab2:
-            emps = db.query(Employee).all()
+            e_sel = entity_picker("Personnel", db, Employee, "training_emp", Employee.name, lambda r: r.name, columns=(Employee.name,))
             with st.form("training_form"):
-                e_sel = st.selectbox("Personnel", emps, format_func=lambda x: x.name)
                 t_name = st.text_input("Training Name (e.g., HSE Safety, Advanced Crane Op)")
                 date = st.date_input("Completion Date")
                 score = st.selectbox("Performance", ["Excellent", "Proficient", "Average", "Needs Improvement"])
                 
                 if st.form_submit_button("Add to Matrix"):
-                    new_tr = TrainingRecord(employee_id=e_sel.id, training_name=t_name, date_completed=date, score=score)
-                    db.add(new_tr)
-                    db.commit()
-                    st.success("Skill Matrix updated.")
+                    if e_sel:
+                        new_tr = TrainingRecord(employee_id=e_sel.id, training_name=t_name, date_completed=date, score=score)
+                        db.add(new_tr)
+                        db.commit()
+                        st.success("Skill Matrix updated.")
+                    else:
+                        st.error("Select the employee who completed the training.")
 
     elif option == "Shift & Attendance Management":
         st.subheader("Site Shifts & Time Tracking")
@@ -145,7 +163,45 @@ def run_hr_module():
                 
             if st.form_submit_button("Commit Site Attendance"):
                 for eid, stat in att_updates:
-                    new_att = Attendance(employee_id=eid, date=date_sel, status=stat)
-                    db.add(new_att)
+                    entry = db.query(Attendance).filter(Attendance.employee_id == eid, Attendance.date == date_sel).first()
+                    if entry:
+                        entry.status = stat
+                    else:
+                        db.add(Attendance(employee_id=eid, date=date_sel, status=stat))
                 db.commit()
                 st.success("Site attendance synchronization complete.")
+
+    elif option == "Monthly Attendance Matrix":
+        st.subheader("Monthly Attendance Matrix 🗓️")
+        month = st.date_input("Month", value=get_ist_date()).strftime("%Y-%m")
+        att = load_month(db, month)
+        packed_at = last_refreshed(db)
+        c1, c2 = st.columns([3, 1])
+        c1.caption(f"Packed attendance as of {packed_at.strftime('%d %b %H:%M') if packed_at else 'never'}; refreshed every 10 minutes in the background.")
+        if c2.button("🔄 Refresh Now"):
+            queued = enqueue(db, "attendance_bitmap_refresh")
+            st.success(f"Job #{queued.id} queued.")
+        
+        if len(att) == 0:
+            st.info("No employees registered yet.")
+        else:
+            headcount = att.daily_headcount()
+            streaks = att.longest_absence()
+            worked = headcount[headcount > 0]
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Workforce", len(att))
+            m2.metric("Avg. Daily Headcount", f"{worked.mean():.0f}" if len(worked) else "0")
+            m3.metric("Peak Headcount", int(headcount.max()))
+            m4.metric("3+ Day Absences", int((streaks >= 3).sum()))
+            
+            fig = px.bar(pd.DataFrame({"Day": range(1, att.days + 1), "Present": headcount}), x="Day", y="Present",
+                         title=f"Daily Headcount - {month}")
+            st.plotly_chart(fig, use_container_width=True)
+            
+            grid = att.matrix()
+            only_streaks = st.checkbox("Only workers with 3+ consecutive absences")
+            if only_streaks:
+                grid = grid[grid["Longest Absence"] >= 3]
+            st.dataframe(grid, use_container_width=True, hide_index=True)
+            st.caption("P = Present, ½ = Half Day, L = Leave, A = Absent. Blank days were not logged.")
+            st.download_button("📥 Export Matrix", grid.to_csv(index=False), f"attendance_{month}.csv", "text/csv")
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from database.models import InventoryItem
 from database.db_manager import get_db
+from utils.alerts import active_alert_summary
 
 def run_inventory_module():
     st.header("Inventory & Store 📦")
@@ -62,15 +63,18 @@ def run_inventory_module():
     elif option == "Stock Overview":
         items = db.query(InventoryItem).all()
         if items:
+            # Low stock is tracked by the low_stock alert rule
+            counts, alerts = active_alert_summary(db, limit=None, rule="low_stock")
+            low = {a.entity_id for a in alerts}
             df = pd.DataFrame([{
                 "ID": i.id, "Name": i.name, "Cat": i.category,
                 "Qty": i.current_stock, "Alert": i.min_stock_alert,
-                "Status": "⚠️ LOW" if i.current_stock <= i.min_stock_alert else "OK"
+                "Status": "⚠️ LOW" if i.id in low else "OK"
             } for i in items])
             st.dataframe(df, use_container_width=True)
             
-            low_stock_count = len(df[df['Status'] == "⚠️ LOW"])
+            low_stock_count = sum(counts.values())
             if low_stock_count > 0:
-                st.warning(f"{low_stock_count} items are low on stock!")
+                st.warning(f"{low_stock_count} items are low on stock ({counts.get('Critical', 0)} out of stock)!")
         else:
             st.info("Inventory list is currently empty.")
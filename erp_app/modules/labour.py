@@ -4,6 +4,7 @@ from database.models import Employee, Attendance
 from database.db_manager import get_db
 from datetime import datetime
 from utils.time_utils import get_ist_date
+from ui.components import entity_picker
 
 def run_labour_module():
     st.header("Labour Management 👷")
@@ -85,28 +86,29 @@ def run_labour_module():
 
         with tab2:
             st.subheader("Manage Workforce Data")
-            workers = db.query(Employee).all()
-            if workers:
-                w_sel = st.selectbox("Select Worker", workers, format_func=lambda x: f"{x.name} ({x.role})")
-                with st.form("edit_labour"):
-                    e_name = st.text_input("Name", value=w_sel.name)
-                    e_role = st.text_input("Role", value=w_sel.role or "")
-                    e_wage = st.number_input("Daily Wage (₹)", value=float(w_sel.salary or 0))
-                    e_active = st.checkbox("Active Status", value=w_sel.is_active)
+            if db.query(Employee.id).first():
+                w_sel = entity_picker("Select Worker", db, Employee, "labour_worker", Employee.name,
+                                      lambda r: f"{r.name} ({r.role})", columns=(Employee.name, Employee.role))
+                if w_sel:
+                    with st.form("edit_labour"):
+                        e_name = st.text_input("Name", value=w_sel.name)
+                        e_role = st.text_input("Role", value=w_sel.role or "")
+                        e_wage = st.number_input("Daily Wage (₹)", value=float(w_sel.salary or 0))
+                        e_active = st.checkbox("Active Status", value=w_sel.is_active)
                     
-                    if st.form_submit_button("Update Worker"):
-                        w_sel.name = e_name
-                        w_sel.role = e_role
-                        w_sel.salary = e_wage
-                        w_sel.is_active = e_active
+                        if st.form_submit_button("Update Worker"):
+                            w_sel.name = e_name
+                            w_sel.role = e_role
+                            w_sel.salary = e_wage
+                            w_sel.is_active = e_active
+                            db.commit()
+                            st.success("Record updated.")
+                            st.rerun()
+                
+                    if st.button("🔴 PERMANENT DELETE"):
+                        db.delete(w_sel)
                         db.commit()
-                        st.success("Record updated.")
+                        st.success("Worker deleted.")
                         st.rerun()
-                
-                if st.button("🔴 PERMANENT DELETE"):
-                    db.delete(w_sel)
-                    db.commit()
-                    st.success("Worker deleted.")
-                    st.rerun()
             else:
                 st.info("No workers to manage.")
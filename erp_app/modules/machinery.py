@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from database.models import Asset, AssetLog, MaintenanceSchedule
+from database.models import Asset, AssetLog, MaintenanceSchedule, FuelAnomaly, Job
 from database.db_manager import get_db
 from datetime import datetime, timedelta
 from utils.time_utils import get_ist, get_ist_date
+from utils.predictive_maintenance import forecast_service
+from utils.jobs import enqueue
+from utils.config import get_int, get_float
+from utils.fuel_anomaly import detect_fuel_anomalies, WATERMARK as FUEL_WATERMARK
+from utils.watermarks import get_watermark
 
 def run_machinery_module():
     st.header("Machinery & Asset Management 🚜")
@@ -15,6 +20,7 @@ def run_machinery_module():
             "Fleet & Asset List", 
             "Register Asset", 
             "Usage Logs", 
+            "Fuel Anomalies",
             "Preventive Maintenance",
             "Maintenance History"
         ])
@@ -27,10 +33,11 @@ def run_machinery_module():
             a_type = col2.selectbox("Asset Category", ["Machinery", "Vehicle", "Fleet", "Tools", "Office Asset"])
             purchase = col1.date_input("Purchase Date")
             status = col2.selectbox("Initial Status", ["Active", "Maintenance", "Standby"])
+            interval = col1.number_input("Service Interval (Run Hours)", min_value=1.0, value=250.0)
             
             if st.form_submit_button("Onboard Asset"):
                 if name:
-                    new_a = Asset(name=name, type=a_type, purchase_date=purchase, status=status)
+                    new_a = Asset(name=name, type=a_type, purchase_date=purchase, status=status, service_interval_hours=interval)
                     db.add(new_a)
                     db.commit()
                     st.success(f"Asset '{name}' added to {a_type} category.")
@@ -42,7 +49,8 @@ def run_machinery_module():
         if assets:
             data = [{
                 "ID": a.id, "Asset": a.name, "Type": a.type, 
-                "Status": a.status, "Age (Days)": (get_ist_date() - a.purchase_date).days if a.purchase_date else 0
+                "Status": a.status, "Age (Days)": (get_ist_date() - a.purchase_date).days if a.purchase_date else 0,
+                "Next Service": a.next_service_due
             } for a in assets]
             df = pd.DataFrame(data)
             st.dataframe(df, use_container_width=True)
@@ -77,9 +85,43 @@ def run_machinery_module():
                     db.commit()
                     st.success("Usage log recorded.")
 
+    elif option == "Fuel Anomalies":
+        st.subheader("Fuel Consumption Anomalies ⛽")
+        mark = get_watermark(db, FUEL_WATERMARK)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Last Scan", mark.last_run.strftime("%d-%b %H:%M") if mark.last_run else "Never")
+        c2.metric("Logs Scanned", f"{mark.rows_processed or 0:,}")
+        if c3.button("🔍 Scan New Logs"):
+            result = detect_fuel_anomalies(db, threshold=get_float("FUEL_ANOMALY_THRESHOLD", 3.5))
+            st.success(f"Scanned {result['scanned']} new logs, flagged {result['flagged']}.")
+            st.rerun()
+
+        flagged = db.query(FuelAnomaly).filter(FuelAnomaly.status == "Open").order_by(FuelAnomaly.date.desc()).limit(500).all()
+        if flagged:
+            st.dataframe(pd.DataFrame([{
+                "ID": f.id, "Asset": f.asset.name if f.asset else f.asset_id, "Date": f.date,
+                "L/hr": round(f.litres_per_hour, 2), "Typical L/hr": round(f.baseline, 2),
+                "Z-Score": round(f.zscore, 1), "Direction": "High" if f.zscore > 0 else "Low"
+            } for f in flagged]), use_container_width=True)
+
+            f_sel = st.selectbox("Review Anomaly", flagged, format_func=lambda x: f"{x.asset.name if x.asset else x.asset_id} on {x.date} ({x.litres_per_hour:.1f} L/hr)")
+            trend = db.query(AssetLog).filter(AssetLog.asset_id == f_sel.asset_id, AssetLog.hours_used > 0)\
+                .order_by(AssetLog.date.desc()).limit(90).all()
+            df_t = pd.DataFrame([{"Date": l.date, "L/hr": l.fuel_consumed / l.hours_used} for l in trend])
+            fig = px.line(df_t.sort_values("Date"), x="Date", y="L/hr", markers=True, title="Fuel Efficiency (Last 90 Logs)")
+            fig.add_hline(y=f_sel.baseline, line_dash="dash", annotation_text="Typical")
+            st.plotly_chart(fig, use_container_width=True)
+
+            if st.button("✅ Mark as Reviewed"):
+                f_sel.status = "Reviewed"
+                db.commit()
+                st.rerun()
+        else:
+            st.info("No open fuel anomalies.")
+
     elif option == "Preventive Maintenance":
         st.subheader("Preventive Maintenance Scheduler 🛠️")
-        tab1, tab2 = st.tabs(["Upcoming Schedule", "Create Schedule"])
+        tab1, tab2, tab3 = st.tabs(["Upcoming Schedule", "Create Schedule", "Predictive Forecast"])
         
         with tab1:
             schedules = db.query(MaintenanceSchedule).filter(MaintenanceSchedule.status != "Completed").all()
@@ -98,8 +140,9 @@ def run_machinery_module():
                     s_sel.status = "Completed"
                     s_sel.performed_date = get_ist_date()
                     s_sel.cost = cost
-                    # Also update Asset status back to Active
+                    # Also update Asset status back to Active and restart its usage clock
                     s_sel.asset.status = "Active"
+                    s_sel.asset.last_service_date = s_sel.performed_date
                     db.commit()
                     st.success("Maintenance task marked as completed.")
                     st.rerun()
@@ -119,6 +162,35 @@ def run_machinery_module():
                     db.commit()
                     st.success(f"Task scheduled for {a_sel.name}.")
 
+        with tab3:
+            st.write("Service due dates projected from logged run hours since the last service.")
+            col_h, col_w = st.columns(2)
+            horizon = col_h.number_input("Auto-schedule Horizon (Days)", min_value=1, value=get_int("MAINTENANCE_HORIZON_DAYS", 14))
+            window = col_w.number_input("Usage Rate Window (Days)", min_value=1, value=get_int("USAGE_WINDOW_DAYS", 14))
+
+            last_run = db.query(Job).filter(Job.name == "predictive_maintenance").order_by(Job.id.desc()).first()
+            col_b, col_s = st.columns([1, 2])
+            if col_b.button("🔮 Queue Predictive Maintenance"):
+                if last_run and last_run.status in ("Queued", "Running"):
+                    st.warning(f"Job #{last_run.id} is already {last_run.status.lower()}.")
+                else:
+                    queued = enqueue(db, "predictive_maintenance", {"horizon_days": int(horizon), "usage_window": int(window)})
+                    st.success(f"Queued as background job #{queued.id}. Track it under Settings → Background Jobs.")
+                    last_run = queued
+            if last_run:
+                col_s.caption(f"Last run: job #{last_run.id} · {last_run.status} · "
+                              f"{last_run.progress_note or ''} {f'({last_run.duration_ms / 1000:.1f}s)' if last_run.duration_ms else ''}")
+
+            forecast = forecast_service(db, usage_window=window)
+
+            if not forecast.empty:
+                st.dataframe(forecast.rename(columns={
+                    "asset_id": "ID", "name": "Asset", "hours_since_service": "Hours Since Service",
+                    "daily_rate": "Avg. Hours/Day", "remaining_hours": "Hours Remaining", "projected_due": "Projected Due"
+                }).round(1), use_container_width=True)
+            else:
+                st.info("No active assets to forecast.")
+
     elif option == "Maintenance History":
         st.subheader("Service & Repair History")
         history = db.query(MaintenanceSchedule).filter(MaintenanceSchedule.status == "Completed").all()
@@ -0,0 +1,100 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.perf import module_summary, history, slowest_statements, reset, WINDOW
+from utils.profiler import load_profiles, flame_frame, PHASES, PROFILE_LOG
+
+def run_performance_module():
+    st.header("Performance Monitor ⏱️")
+    st.caption(f"SQL cost per module render, from this server process. Last {WINDOW} reruns per module are kept.")
+
+    with st.sidebar:
+        option = st.radio("Performance Menu", ["Module Breakdown", "Slowest Statements", "Rerun Profiles"])
+        window = st.select_slider("Window", [5, 15, 60, 240, 1440], value=60, format_func=lambda m: f"{m} min" if m < 60 else f"{m // 60} h")
+
+    if option == "Rerun Profiles":
+        render_profiles(window)
+        return
+
+    summary = module_summary(window)
+    if summary.empty:
+        st.info("No module reruns recorded in this window yet. Browse a few modules and come back.")
+        return
+
+    if option == "Module Breakdown":
+        runs = history(window)
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Reruns", f"{len(runs):,}")
+        c2.metric("Statements", f"{int(runs['statements'].sum()):,}")
+        c3.metric("SQL Time", f"{runs['sql_ms'].sum() / 1000:,.1f}s")
+        c4.metric("SQL Share of Render", f"{runs['sql_ms'].sum() / max(runs['wall_ms'].sum(), 1e-9):.0%}")
+
+        fig = px.bar(summary.sort_values("sql_p95_ms"), y="module", x=["sql_p50_ms", "sql_p95_ms"], barmode="group",
+                     orientation="h", title="SQL Time per Rerun (ms)", labels={"value": "ms", "module": "", "variable": ""})
+        fig.update_layout(height=max(250, 40 * len(summary)), margin=dict(l=10, r=10, t=40, b=10))
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(summary.rename(columns={
+            "module": "Module", "reruns": "Reruns", "sql_p50_ms": "SQL p50 (ms)", "sql_p95_ms": "SQL p95 (ms)",
+            "sql_max_ms": "SQL max (ms)", "wall_p50_ms": "Render p50 (ms)", "wall_p95_ms": "Render p95 (ms)",
+            "statements_p50": "Stmts p50", "statements_max": "Stmts max", "rows_p50": "Rows p50",
+            "rows_max": "Rows max", "sql_share": "SQL Share"
+        }).style.format({
+            "SQL p50 (ms)": "{:,.1f}", "SQL p95 (ms)": "{:,.1f}", "SQL max (ms)": "{:,.1f}", "Render p50 (ms)": "{:,.0f}",
+            "Render p95 (ms)": "{:,.0f}", "Stmts p50": "{:,.0f}", "Rows p50": "{:,.0f}", "SQL Share": "{:.0%}"
+        }), use_container_width=True, hide_index=True)
+        st.caption("Rows counts ORM objects loaded plus rows changed by writes; raw pandas reads are timed but not row-counted.")
+
+    elif option == "Slowest Statements":
+        module = st.selectbox("Module", ["All"] + summary["module"].tolist())
+        df = slowest_statements(None if module == "All" else module)
+        if df.empty:
+            st.info("No statements recorded.")
+        else:
+            for _, r in df.head(20).iterrows():
+                with st.expander(f"{r['ms']:,.1f} ms · {r['module']} · {r['at']:%H:%M:%S}"):
+                    st.code(r["statement"], language="sql")
+
+    st.divider()
+    if st.button("🧹 Reset Measurements"):
+        reset()
+        st.rerun()
+
+def render_profiles(window):
+    """Phase breakdown of profiled reruns and a flame graph of the hottest ones."""
+    cutoff = pd.Timestamp.now().timestamp() - window * 60
+    profiles = [p for p in load_profiles() if p["at"] >= cutoff and p["samples"]]
+    if not profiles:
+        st.info(f"No profiles in this window. Set PERF_PROFILING=true under System Configuration; reruns are logged to {PROFILE_LOG}.")
+        return
+
+    rows = []
+    for p in profiles:
+        total = sum(p["phases"].values()) or 1
+        rows.append({"module": p["module"], "at": pd.Timestamp(p["at"], unit="s"), "wall_ms": p["wall_ms"],
+                     **{ph: p["wall_ms"] * p["phases"].get(ph, 0) / total for ph in PHASES}})
+    df = pd.DataFrame(rows)
+
+    by_module = df.groupby("module")[PHASES].mean().reset_index()
+    fig = px.bar(by_module, y="module", x=PHASES, orientation="h", title="Mean Render Time by Phase (ms)",
+                 labels={"value": "ms", "module": "", "variable": "Phase"})
+    fig.update_layout(height=max(250, 40 * len(by_module)), margin=dict(l=10, r=10, t=40, b=10))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("#### Hottest Reruns")
+    hottest = sorted(range(len(profiles)), key=lambda i: profiles[i]["wall_ms"], reverse=True)[:25]
+    st.dataframe(df.iloc[hottest].rename(columns={"module": "Module", "at": "At", "wall_ms": "Render (ms)"})
+                 .style.format({c: "{:,.0f}" for c in ["Render (ms)"] + PHASES}), use_container_width=True, hide_index=True)
+
+    pick = st.selectbox("Flame Graph", hottest, format_func=lambda i: f"{profiles[i]['module']} · {profiles[i]['wall_ms']:,.0f} ms · "
+                        f"{pd.Timestamp(profiles[i]['at'], unit='s'):%H:%M:%S} ({profiles[i]['samples']} samples)")
+    merge = st.checkbox("Merge all profiled reruns of this module")
+    stacks = profiles[pick]["stacks"]
+    if merge:
+        stacks = [s for p in profiles if p["module"] == profiles[pick]["module"] for s in p["stacks"]]
+    flame = flame_frame(stacks)
+    fig_f = px.icicle(ids=flame["ids"], names=flame["labels"], parents=flame["parents"], values=flame["values"])
+    fig_f.update_traces(branchvalues="total", tiling=dict(orientation="v"), root_color="lightgrey")
+    fig_f.update_layout(height=600, margin=dict(l=10, r=10, t=10, b=10))
+    st.plotly_chart(fig_f, use_container_width=True)
+    st.caption("Width is the share of samples spent in a call and everything it called; read top to bottom from the module entry point.")
@@ -1,15 +1,27 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from database.models import Project
+from database.models import Project, ProjectTask, TaskDependency
 from database.db_manager import get_db
+from datetime import timedelta
+from utils.time_utils import get_ist_date
+from utils.scheduler import load_schedule, schedule_project, reschedule_task, start_offset
+from utils.resource_leveling import resource_capacity, load_portfolio, level_resources, loading_profile, apply_leveling
+from ui.components import entity_picker
+
+# Default phase chain offered for projects without a task network
+STANDARD_PHASES = [
+    ("Site Cleanup", 7),
+    ("Foundation", 30),
+    ("Structure", 90),
+    ("Finishing", 60)
+]
 
 def run_planning_module():
     st.header("Planning & Estimation 🗓️")
     db = next(get_db())
     
-    projects = db.query(Project).all()
-    if not projects:
+    if not db.query(Project.id).first():
         st.info("Start by creating a project in the Project Management module to begin planning.")
         return
         
@@ -18,68 +30,192 @@ def run_planning_module():
 
     if option == "Budget Estimation":
         st.subheader("Detailed Project Budget Estimation")
-        p_sel = st.selectbox("Select Project for Deep Estimation", projects, format_func=lambda x: f"{x.name} (Target: ₹{x.total_budget:,.0f})")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("##### 🧱 Material Breakdown")
-            mat_cement = st.number_input("Cement/Binding (Est. ₹)", min_value=0.0)
-            mat_steel = st.number_input("Steel/Structure (Est. ₹)", min_value=0.0)
-            mat_sand = st.number_input("Sand/Aggregate (Est. ₹)", min_value=0.0)
-            mat_misc = st.number_input("Misc Materials (Est. ₹)", min_value=0.0)
-            total_mat = mat_cement + mat_steel + mat_sand + mat_misc
+        p_sel = entity_picker("Select Project for Deep Estimation", db, Project, "estimate_project", Project.name,
+                              lambda r: f"{r.name} (Target: ₹{r.total_budget:,.0f})", columns=(Project.name, Project.total_budget))
+        if p_sel:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("##### 🧱 Material Breakdown")
+                mat_cement = st.number_input("Cement/Binding (Est. ₹)", min_value=0.0)
+                mat_steel = st.number_input("Steel/Structure (Est. ₹)", min_value=0.0)
+                mat_sand = st.number_input("Sand/Aggregate (Est. ₹)", min_value=0.0)
+                mat_misc = st.number_input("Misc Materials (Est. ₹)", min_value=0.0)
+                total_mat = mat_cement + mat_steel + mat_sand + mat_misc
             
-        with col2:
-            st.markdown("##### 👷 Resource & Indirects")
-            labour_daily = st.number_input("Skilled & Unskilled Labour (Est. ₹)", min_value=0.0)
-            consultancy = st.number_input("Consultancy & Architects (Est. ₹)", min_value=0.0)
-            safety = st.number_input("Safety & Security (Est. ₹)", min_value=0.0)
-            contingency = st.slider("Contingency Buffer (%)", 0, 20, 5)
+            with col2:
+                st.markdown("##### 👷 Resource & Indirects")
+                labour_daily = st.number_input("Skilled & Unskilled Labour (Est. ₹)", min_value=0.0)
+                consultancy = st.number_input("Consultancy & Architects (Est. ₹)", min_value=0.0)
+                safety = st.number_input("Safety & Security (Est. ₹)", min_value=0.0)
+                contingency = st.slider("Contingency Buffer (%)", 0, 20, 5)
             
-            total_indirect = labour_daily + consultancy + safety
-            sub_total = total_mat + total_indirect
-            buffer_amt = sub_total * (contingency / 100)
-            grand_total = sub_total + buffer_amt
-
-        st.divider()
-        st.subheader("Estimation Summary")
-        m1, m2, m3 = st.columns(3)
-        m1.metric("Grand Total Estimate", f"₹{grand_total:,.0f}")
-        m2.metric("Target Budget", f"₹{p_sel.total_budget:,.0f}")
-        variance = p_sel.total_budget - grand_total
-        m3.metric("Variance", f"₹{variance:,.0f}", delta=variance)
-
-        if st.button("💾 Lock Estimation"):
-            st.success(f"Final estimate locked for {p_sel.name}.")
+                total_indirect = labour_daily + consultancy + safety
+                sub_total = total_mat + total_indirect
+                buffer_amt = sub_total * (contingency / 100)
+                grand_total = sub_total + buffer_amt
+
+            st.divider()
+            st.subheader("Estimation Summary")
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Grand Total Estimate", f"₹{grand_total:,.0f}")
+            m2.metric("Target Budget", f"₹{p_sel.total_budget:,.0f}")
+            variance = p_sel.total_budget - grand_total
+            m3.metric("Variance", f"₹{variance:,.0f}", delta=variance)
+
+            if st.button("💾 Lock Estimation"):
+                st.success(f"Final estimate locked for {p_sel.name}.")
 
     elif option == "Resource Loading":
         st.subheader("Human & Machinery Resource Loading")
-        st.write("Visual allocation of workforce across project phases.")
-        
-        # Resource Loading Visualization
-        df_res = pd.DataFrame([
-            {"Phase": "Excavation", "Labour Units": 15, "Machinery Units": 5},
-            {"Phase": "Foundation", "Labour Units": 30, "Machinery Units": 3},
-            {"Phase": "Slab Casting", "Labour Units": 45, "Machinery Units": 8},
-            {"Phase": "Brickwork", "Labour Units": 25, "Machinery Units": 1},
-        ])
-        fig = px.bar(df_res, x="Phase", y=["Labour Units", "Machinery Units"], barmode="group", title="Resource Loading Plan")
-        st.plotly_chart(fig, use_container_width=True)
+        st.write("Daily demand derived from scheduled tasks, leveled within task float.")
+
+        # Only id and name are needed to fill the widget
+        projects = db.query(Project.id, Project.name).order_by(Project.name).all()
+        p_multi = st.multiselect("Projects in Portfolio", projects, default=projects, format_func=lambda x: x.name)
+        df_t, deps, origin = load_portfolio(db, [p.id for p in p_multi])
+
+        if df_t.empty:
+            st.info("No scheduled tasks found. Build a task network under 'Milestone Tracking' first.")
+        else:
+            capacity = resource_capacity(db)
+            if df_t["leveled"].any():
+                st.caption(f"{int(df_t['leveled'].sum())} tasks follow an applied leveled schedule; 'Planned' shows it.")
+            starts = level_resources(df_t, deps, capacity)
+            profile = loading_profile(df_t, starts, origin, capacity)
+
+            r1, r2, r3, r4 = st.columns(4)
+            r1.metric("Peak Labour (Planned)", f"{profile['Labour (Planned)'].max():,.0f}")
+            r2.metric("Peak Labour (Leveled)", f"{profile['Labour (Leveled)'].max():,.0f}",
+                      delta=f"{profile['Labour (Leveled)'].max() - profile['Labour (Planned)'].max():,.0f}", delta_color="inverse")
+            r3.metric("Workforce Capacity", capacity["labour_units"])
+            r4.metric("Days Over Capacity", int((profile["Labour (Leveled)"] > capacity["labour_units"]).sum()))
+
+            fig = px.line(profile, x="Date", y=["Labour (Planned)", "Labour (Leveled)", "Labour Capacity"], title="Daily Labour Loading")
+            st.plotly_chart(fig, use_container_width=True)
+            fig_m = px.line(profile, x="Date", y=["Machinery (Planned)", "Machinery (Leveled)", "Machinery Capacity"], title="Daily Machinery Loading")
+            st.plotly_chart(fig_m, use_container_width=True)
+
+            shifted = df_t.assign(Shift=starts - df_t["start"].to_numpy())
+            shifted = shifted[shifted["Shift"] != 0]
+            if not shifted.empty:
+                st.markdown("#### Proposed Task Shifts")
+                st.dataframe(shifted[["project", "name", "duration", "labour_units", "machinery_units", "Shift"]].rename(columns={
+                    "project": "Project", "name": "Task", "duration": "Duration",
+                    "labour_units": "Labour", "machinery_units": "Machinery", "Shift": "Shift (Days)"
+                }), use_container_width=True)
+                if st.button("📌 Apply Leveled Schedule"):
+                    apply_leveling(db, df_t, starts)
+                    st.success(f"Leveled start dates saved for {len(df_t)} tasks.")
+            else:
+                st.success("Resource loading is already level within available float.")
 
     elif option == "Milestone Tracking":
-        st.subheader("Milestone & Phase Planning")
-        p_sel = st.selectbox("Select Project for Timeline", projects, format_func=lambda x: x.name)
-        
-        milestones = [
-            {"Task": "Site Cleanup", "Start": p_sel.start_date, "Duration": 7},
-            {"Task": "Foundation", "Start": p_sel.start_date + timedelta(days=7), "Duration": 30},
-            {"Task": "Structure", "Start": p_sel.start_date + timedelta(days=37), "Duration": 90},
-            {"Task": "Finishing", "Start": p_sel.start_date + timedelta(days=127), "Duration": 60}
-        ]
-        
-        df_m = pd.DataFrame(milestones)
-        df_m['End'] = df_m.apply(lambda x: x['Start'] + timedelta(days=x['Duration']), axis=1)
-        
-        fig = px.timeline(df_m, x_start="Start", x_end="End", y="Task", color="Task", title=f"Gantt Chart: {p_sel.name}")
-        fig.update_yaxes(autorange="reversed")
-        st.plotly_chart(fig, use_container_width=True)
+        st.subheader("Milestone & Critical Path Planning")
+        p_sel = entity_picker("Select Project for Timeline", db, Project, "timeline_project", Project.name, lambda r: r.name, columns=(Project.name,))
+        if p_sel:
+            tasks = db.query(ProjectTask).filter(ProjectTask.project_id == p_sel.id).order_by(ProjectTask.early_start, ProjectTask.id).all()
+
+            if not tasks:
+                st.info("No task network defined for this project yet.")
+                if st.button("🧱 Load Standard Phases"):
+                    prev = None
+                    for name, days in STANDARD_PHASES:
+                        task = ProjectTask(project_id=p_sel.id, name=name, duration=days)
+                        db.add(task)
+                        db.flush()
+                        if prev:
+                            db.add(TaskDependency(predecessor_id=prev.id, successor_id=task.id))
+                        prev = task
+                    db.commit()
+                    schedule_project(db, p_sel.id)
+                    st.rerun()
+
+            tab1, tab2 = st.tabs(["Gantt & Critical Path", "Tasks & Dependencies"])
+
+            with tab1:
+                if tasks:
+                    base = p_sel.start_date or get_ist_date()
+                    df_m = pd.DataFrame([{
+                        "Task": t.name,
+                        "Start": base + timedelta(days=start_offset(t)),
+                        "End": base + timedelta(days=start_offset(t) + (t.duration or 0)),
+                        "Float (Days)": t.total_float,
+                        "Leveled": t.leveled_start is not None,
+                        "Path": "Critical" if t.is_critical else "Non-Critical"
+                    } for t in tasks])
+
+                    finish = max(start_offset(t) + (t.duration or 0) for t in tasks)
+                    m1, m2, m3 = st.columns(3)
+                    m1.metric("Project Duration", f"{finish} Days")
+                    m2.metric("Critical Tasks", len([t for t in tasks if t.is_critical]))
+                    m3.metric("Planned Completion", str(base + timedelta(days=finish)))
+
+                    fig = px.timeline(df_m, x_start="Start", x_end="End", y="Task", color="Path", hover_data=["Float (Days)", "Leveled"],
+                                      title=f"Gantt Chart: {p_sel.name}",
+                                      color_discrete_map={"Critical": "#ef4444", "Non-Critical": "#3b82f6"})
+                    fig.update_yaxes(autorange="reversed")
+                    st.plotly_chart(fig, use_container_width=True)
+
+            with tab2:
+                if tasks:
+                    st.dataframe(pd.DataFrame([{
+                        "ID": t.id, "Task": t.name, "Duration": t.duration,
+                        "ES": t.early_start, "EF": t.early_finish,
+                        "LS": t.late_start, "LF": t.late_finish,
+                        "Float": t.total_float, "Critical": "🔴" if t.is_critical else ""
+                    } for t in tasks]), use_container_width=True)
+
+                    st.markdown("#### Reschedule Task")
+                    col1, col2 = st.columns(2)
+                    t_sel = col1.selectbox("Task", tasks, format_func=lambda x: x.name)
+                    new_dur = col2.number_input("New Duration (Days)", min_value=0, value=int(t_sel.duration or 0))
+                    if st.button("🔁 Update Duration"):
+                        changed = reschedule_task(db, t_sel, new_dur)
+                        st.success(f"Rescheduled {len(changed)} of {len(tasks)} tasks.")
+                        st.rerun()
+
+                st.markdown("#### Add Task")
+                with st.form("task_form"):
+                    col1, col2 = st.columns(2)
+                    t_name = col1.text_input("Task Name*")
+                    t_dur = col2.number_input("Duration (Days)", min_value=0, value=5)
+                    t_lab = col1.number_input("Labour Units / Day", min_value=0, value=0)
+                    t_mac = col2.number_input("Machinery Units / Day", min_value=0, value=0)
+                    preds = st.multiselect("Depends On (Finish-to-Start)", tasks, format_func=lambda x: x.name)
+                    lag = st.number_input("Lag (Days)", min_value=0, value=0)
+
+                    if st.form_submit_button("➕ Add Task"):
+                        if t_name:
+                            task = ProjectTask(project_id=p_sel.id, name=t_name, duration=t_dur, labour_units=t_lab, machinery_units=t_mac)
+                            db.add(task)
+                            db.flush()
+                            for p in preds:
+                                db.add(TaskDependency(predecessor_id=p.id, successor_id=task.id, lag=lag))
+                            db.commit()
+                            schedule_project(db, p_sel.id)
+                            st.success(f"Task '{t_name}' added and schedule recomputed.")
+                            st.rerun()
+                        else:
+                            st.error("Task Name is required.")
+
+                if len(tasks) > 1:
+                    st.markdown("#### Link Existing Tasks")
+                    with st.form("dep_form"):
+                        col1, col2 = st.columns(2)
+                        pred = col1.selectbox("Predecessor", tasks, format_func=lambda x: x.name)
+                        succ = col2.selectbox("Successor", tasks, format_func=lambda x: x.name)
+                        d_lag = st.number_input("Lag (Days)", min_value=0, value=0, key="dep_lag")
+
+                        if st.form_submit_button("🔗 Add Dependency"):
+                            db.add(TaskDependency(predecessor_id=pred.id, successor_id=succ.id, lag=d_lag))
+                            db.flush()
+                            try:
+                                load_schedule(db, p_sel.id)
+                            except ValueError as e:
+                                db.rollback()
+                                st.error(f"Dependency rejected: {e}")
+                            else:
+                                db.commit()
+                                schedule_project(db, p_sel.id)
+                                st.success("Dependency added and schedule recomputed.")
+                                st.rerun()
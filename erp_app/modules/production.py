@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from database.models import Project, ProductionLog, QualityCheck
+from sqlalchemy import func
+from database.models import Project, ProductionLog, QualityCheck, ProductionRollup
 from database.db_manager import get_db
 from datetime import datetime, timedelta
+from utils.production_metrics import refresh_rollups, rebuild_rollups, read_rollups
+from utils.chart_data import downsample_frame
+from ui.components import zoom_window, entity_picker
 
 def run_production_module():
     st.header("Plant & Production Management 🏭")
@@ -14,13 +18,12 @@ def run_production_module():
         
     if option == "Daily Logging":
         st.subheader("New Production Log Entry")
-        projects = db.query(Project).all()
-        if not projects:
+        if not db.query(Project.id).first():
             st.error("Please create projects first to link production data.")
         else:
+            p_sel = entity_picker("Assign to Project/Site", db, Project, "prod_project", Project.name, lambda r: r.name, columns=(Project.name,))
             with st.form("prod_form"):
                 col1, col2 = st.columns(2)
-                p_sel = col1.selectbox("Assign to Project/Site", projects, format_func=lambda x: x.name)
                 item_name = col2.text_input("Product / Batch Name*", placeholder="e.g. Concrete Batch A")
                 
                 qty = col1.number_input("Output Quantity", min_value=0.0, step=1.0)
@@ -35,11 +38,14 @@ def run_production_module():
                 if st.form_submit_button("🚀 Post Production Log"):
                     if not item_name:
                         st.error("Product Name is required.")
+                    elif not p_sel:
+                        st.error("Select the project this batch belongs to.")
                     else:
                         detailed_notes = f"Item: {item_name} | Unit: {unit} | {notes}"
                         new_log = ProductionLog(project_id=p_sel.id, quantity_produced=qty, waste_generated=waste, efficiency=eff, date=log_date, notes=detailed_notes)
                         db.add(new_log)
                         db.commit()
+                        refresh_rollups(db)
                         st.success(f"Log for '{item_name}' saved.")
                         st.rerun()
 
@@ -47,30 +53,33 @@ def run_production_module():
         st.subheader("Quality Assurance & Inspection 🧪")
         tab1, tab2 = st.tabs(["QC Inspections", "Inspection Ledger"])
         
-        logs = db.query(ProductionLog).order_by(ProductionLog.date.desc()).all()
-        
         with tab1:
-            if not logs:
+            if not db.query(ProductionLog.id).first():
                 st.info("No production logs to inspect.")
             else:
                 st.markdown("#### Record New Quality Check")
-                log_sel = st.selectbox("Select Batch/Log", logs, format_func=lambda x: f"ID {x.id}: {x.notes[:30]} ({x.date})")
-                
-                with st.form("qc_form"):
-                    col1, col2 = st.columns(2)
-                    param = col1.text_input("Parameter (e.g. Compression Strength)")
-                    res = col2.selectbox("Result", ["Pass", "Fail", "Pending Re-test"])
-                    remarks = st.text_area("Inspector Remarks")
+                # Latest batches first; older ones are found by "#id"
+                log_sel = entity_picker("Select Batch/Log", db, ProductionLog, "qc_log", None,
+                                        lambda r: f"ID {r.id}: {(r.notes or '')[:30]} ({r.date})",
+                                        columns=(ProductionLog.notes, ProductionLog.date), order_by=ProductionLog.date.desc())
+                if log_sel:
+                    with st.form("qc_form"):
+                        col1, col2 = st.columns(2)
+                        param = col1.text_input("Parameter (e.g. Compression Strength)")
+                        res = col2.selectbox("Result", ["Pass", "Fail", "Pending Re-test"])
+                        remarks = st.text_area("Inspector Remarks")
                     
-                    if st.form_submit_button("💾 Save QC Result"):
-                        new_qc = QualityCheck(production_id=log_sel.id, parameter=param, result=res, remarks=remarks)
-                        db.add(new_qc)
-                        db.commit()
-                        st.success("Quality inspection recorded.")
+                        if st.form_submit_button("💾 Save QC Result"):
+                            new_qc = QualityCheck(production_id=log_sel.id, parameter=param, result=res, remarks=remarks)
+                            db.add(new_qc)
+                            db.commit()
+                            refresh_rollups(db)
+                            st.success("Quality inspection recorded.")
                         
         with tab2:
-            qcs = db.query(QualityCheck).all()
+            qcs = db.query(QualityCheck).order_by(QualityCheck.id.desc()).limit(500).all()
             if qcs:
+                st.caption("Showing the 500 most recent inspections.")
                 st.dataframe(pd.DataFrame([{
                     "Date": q.date, "Batch ID": q.production_id, 
                     "Parameter": q.parameter, "Result": q.result, "Remarks": q.remarks
@@ -90,11 +99,45 @@ def run_production_module():
 
     elif option == "Production Analytics":
         st.subheader("Performance Intelligence")
-        logs = db.query(ProductionLog).all()
-        if logs:
-            df = pd.DataFrame([{ "Date": l.date, "Output": l.quantity_produced, "Waste": l.waste_generated } for l in logs])
-            st.metric("Total Plant Yield", f"{df['Output'].sum():,.0f} Units")
-            fig = px.bar(df, x="Date", y="Output", title="Output Quantity over Time")
+        refresh_rollups(db)
+
+        col_g, col_p = st.columns([1, 3])
+        grain = col_g.radio("Granularity", ["Daily", "Weekly"], horizontal=True)
+        # Only id and name are needed to fill the widget
+        projects = db.query(Project.id, Project.name).order_by(Project.name).all()
+        p_filter = col_p.multiselect("Projects", projects, format_func=lambda x: x.name)
+        g = "D" if grain == "Daily" else "W"
+        bounds = db.query(func.min(ProductionRollup.period_start), func.max(ProductionRollup.period_start))\
+            .filter(ProductionRollup.grain == g).one()
+        start, end = zoom_window("Zoom Period", bounds[0], bounds[1], key="prod_zoom")
+        df = read_rollups(db, grain=g, project_ids=[p.id for p in p_filter], start=start, end=end)
+
+        if not df.empty:
+            total_out = df["output"].sum()
+            total_waste = df["waste"].sum()
+            qc_total = df["qc_total"].sum()
+            k1, k2, k3, k4 = st.columns(4)
+            k1.metric("Total Plant Yield", f"{total_out:,.0f} Units")
+            k2.metric("Waste Ratio", f"{(total_waste / (total_out + total_waste) * 100) if total_out + total_waste else 0:.1f}%")
+            k3.metric("Avg. Efficiency", f"{(df['efficiency_sum'].sum() / df['log_count'].sum()) if df['log_count'].sum() else 0:.1f}%")
+            k4.metric("QC Pass Rate", f"{(df['qc_pass'].sum() / qc_total * 100):.1f}%" if qc_total else "N/A")
+
+            period = df.groupby("period_start", as_index=False)[["output", "waste", "efficiency_sum", "log_count", "qc_total", "qc_pass"]].sum()
+            period["OEE (est.) %"] = (period["efficiency_sum"] / period["log_count"].where(period["log_count"] > 0)).fillna(0) \
+                * (period["qc_pass"] / period["qc_total"].where(period["qc_total"] > 0)).fillna(1.0)
+            period = period.rename(columns={"period_start": "Date", "output": "Output", "waste": "Waste"})
+            points = len(period)
+            period = downsample_frame(period, "Date", "Output")
+            if len(period) < points:
+                st.caption(f"Showing {len(period)} of {points} periods. Narrow the zoom period for full detail.")
+
+            fig = px.bar(period, x="Date", y=["Output", "Waste"], title=f"{grain} Output Quantity over Time")
             st.plotly_chart(fig, use_container_width=True)
+            fig_oee = px.line(period, x="Date", y="OEE (est.) %", markers=True, title="Estimated OEE (Efficiency x QC Pass Rate)")
+            st.plotly_chart(fig_oee, use_container_width=True)
         else:
             st.info("No data for analytics.")
+
+        if st.button("♻️ Rebuild Rollups"):
+            result = rebuild_rollups(db)
+            st.success(f"Rollups rebuilt from {result['logs']} logs and {result['checks']} inspections.")
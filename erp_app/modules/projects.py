@@ -3,9 +3,12 @@ import pandas as pd
 import plotly.express as px
 from sqlalchemy.orm import Session
 from database.models import Project, ProjectStatus
-from database.db_manager import get_db
+from database.db_manager import get_db, get_read_db
 from datetime import datetime, timedelta
 from utils.time_utils import get_ist
+from utils.figure_cache import cached_figure
+from utils.mis_data import projects_frame
+from ui.components import analytics_source_caption, entity_picker
 
 def run_projects_module():
     st.header("Project Management 🏗️")
@@ -65,61 +68,51 @@ def run_projects_module():
     # --- Management (Edit/Delete) ---
     elif action == "Management":
         st.subheader("Project Maintenance")
-        projects = db.query(Project).all()
-        if not projects:
+        if not db.query(Project.id).first():
             st.info("No projects to manage.")
         else:
-            proj_to_edit = st.selectbox("Select Project to Update", projects, format_func=lambda x: f"{x.id}: {x.name}")
-            
-            with st.form("edit_project_form"):
-                col1, col2 = st.columns(2)
-                e_name = col1.text_input("Project Name", value=proj_to_edit.name)
-                e_client = col2.text_input("Client Name", value=proj_to_edit.client)
-                e_budget = col1.number_input("Total Budget", value=proj_to_edit.total_budget)
-                e_status = col2.selectbox("Status", [s.value for s in ProjectStatus], index=[s.value for s in ProjectStatus].index(proj_to_edit.status.value))
-                e_progress = col1.slider("Progress %", 0, 100, proj_to_edit.progress)
-                e_desc = st.text_area("Description", value=proj_to_edit.description or "")
+            proj_to_edit = entity_picker("Select Project to Update", db, Project, "project_edit", Project.name,
+                                         lambda r: f"{r.id}: {r.name}", columns=(Project.name,))
+            if proj_to_edit:
+                with st.form("edit_project_form"):
+                    col1, col2 = st.columns(2)
+                    e_name = col1.text_input("Project Name", value=proj_to_edit.name)
+                    e_client = col2.text_input("Client Name", value=proj_to_edit.client)
+                    e_budget = col1.number_input("Total Budget", value=proj_to_edit.total_budget)
+                    e_status = col2.selectbox("Status", [s.value for s in ProjectStatus], index=[s.value for s in ProjectStatus].index(proj_to_edit.status.value))
+                    e_progress = col1.slider("Progress %", 0, 100, proj_to_edit.progress)
+                    e_desc = st.text_area("Description", value=proj_to_edit.description or "")
                 
-                if st.form_submit_button("Update Project Details"):
-                    proj_to_edit.name = e_name
-                    proj_to_edit.client = e_client
-                    proj_to_edit.total_budget = e_budget
-                    proj_to_edit.status = ProjectStatus(e_status)
-                    proj_to_edit.progress = e_progress
-                    proj_to_edit.description = e_desc
-                    db.commit()
-                    st.success("Project updated successfully!")
-                    st.rerun()
+                    if st.form_submit_button("Update Project Details"):
+                        proj_to_edit.name = e_name
+                        proj_to_edit.client = e_client
+                        proj_to_edit.total_budget = e_budget
+                        proj_to_edit.status = ProjectStatus(e_status)
+                        proj_to_edit.progress = e_progress
+                        proj_to_edit.description = e_desc
+                        db.commit()
+                        st.success("Project updated successfully!")
+                        st.rerun()
 
-            st.divider()
-            if st.button("🔴 DELETE PROJECT PERMANENTLY"):
-                if st.session_state.get('confirm_delete') == proj_to_edit.id:
-                    db.delete(proj_to_edit)
-                    db.commit()
-                    st.success("Project deleted.")
-                    st.session_state['confirm_delete'] = None
-                    st.rerun()
-                else:
-                    st.session_state['confirm_delete'] = proj_to_edit.id
-                    st.warning("Click again to confirm deletion. This cannot be undone.")
+                st.divider()
+                if st.button("🔴 DELETE PROJECT PERMANENTLY"):
+                    if st.session_state.get('confirm_delete') == proj_to_edit.id:
+                        db.delete(proj_to_edit)
+                        db.commit()
+                        st.success("Project deleted.")
+                        st.session_state['confirm_delete'] = None
+                        st.rerun()
+                    else:
+                        st.session_state['confirm_delete'] = proj_to_edit.id
+                        st.warning("Click again to confirm deletion. This cannot be undone.")
 
     # --- Analytics ---
     elif action == "Analytics":
         st.subheader("Advanced Project Analytical Platform 📊")
-        projects = db.query(Project).all()
+        db = next(get_read_db())
+        df = projects_frame(db)
         
-        if projects:
-            # Prepare Data
-            df = pd.DataFrame([{ 
-                "ID": p.id,
-                "Name": p.name,
-                "Client": p.client,
-                "Budget": p.total_budget,
-                "Status": p.status.value,
-                "Progress": p.progress,
-                "Start": pd.to_datetime(p.start_date),
-                "End": pd.to_datetime(p.end_date)
-            } for p in projects])
+        if not df.empty:
             
             # --- ROW 1: CORE KPIs ---
             st.markdown("### 🔑 Core Performance Indicators")
@@ -142,7 +135,8 @@ def run_projects_module():
             completed_count = len(df[df['Status'] == ProjectStatus.COMPLETED.value])
             unique_clients = df['Client'].nunique()
             avg_budget = df['Budget'].mean()
-            upcoming_deadlines = len(df[(df['End'] >= get_ist()) & (df['End'] <= get_ist() + timedelta(days=30))])
+            today = pd.Timestamp(get_ist().date())
+            upcoming_deadlines = len(df[(df['End'] >= today) & (df['End'] <= today + timedelta(days=30))])
             
             kpi5.metric("Completed", completed_count)
             kpi6.metric("Unique Clients", unique_clients)
@@ -170,23 +164,27 @@ def run_projects_module():
             
             with col_v1:
                 # Status Distribution
-                fig_status = px.pie(df, names='Status', title='Project Portfolio by Status',
-                                   color_discrete_sequence=px.colors.qualitative.Prism)
+                fig_status = cached_figure(df[['Status']], {"chart": "portfolio_status"}, lambda d: px.pie(
+                    d, names='Status', title='Project Portfolio by Status',
+                    color_discrete_sequence=px.colors.qualitative.Prism))
                 st.plotly_chart(fig_status, use_container_width=True)
                 
             with col_v2:
                 # Top Clients by Budget
                 client_spend = df.groupby('Client')['Budget'].sum().sort_values(ascending=False).reset_index()
-                fig_client = px.bar(client_spend, x='Client', y='Budget', title='Top Clients by Investment Value',
-                                   labels={'Budget': 'Total Budget (₹)'}, color='Budget')
+                fig_client = cached_figure(client_spend, {"chart": "top_clients"}, lambda d: px.bar(
+                    d, x='Client', y='Budget', title='Top Clients by Investment Value',
+                    labels={'Budget': 'Total Budget (₹)'}, color='Budget'))
                 st.plotly_chart(fig_client, use_container_width=True)
 
             # Budget vs Progress Scatter
             st.markdown("### 🔍 Strategic Overview")
-            fig_scatter = px.scatter(df, x='Budget', y='Progress', size='Budget', color='Status',
-                                    hover_name='Name', title='Budget vs. Completion Matrix',
-                                    labels={'Budget': 'Project Budget (₹)', 'Progress': 'Phase Percentage (%)'})
+            fig_scatter = cached_figure(df[['Name', 'Budget', 'Progress', 'Status']], {"chart": "budget_vs_progress"}, lambda d: px.scatter(
+                d, x='Budget', y='Progress', size='Budget', color='Status',
+                hover_name='Name', title='Budget vs. Completion Matrix',
+                labels={'Budget': 'Project Budget (₹)', 'Progress': 'Phase Percentage (%)'}))
             st.plotly_chart(fig_scatter, use_container_width=True)
+            analytics_source_caption()
             
         else:
             st.info("Add projects to the system to unlock advanced analytics.")
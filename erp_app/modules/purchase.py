@@ -2,9 +2,13 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from database.models import Vendor, PurchaseOrder
-from database.db_manager import get_db
+from database.db_manager import get_db, get_read_db
 from datetime import datetime, timedelta
 from utils.time_utils import get_ist, get_ist_date
+from utils.chart_data import daily_series, date_bounds
+from utils.figure_cache import cached_figure
+from utils.mis_data import purchase_orders_frame
+from ui.components import zoom_window, analytics_source_caption, entity_picker
 
 def run_purchase_module():
     st.header("Purchase Management 🛒")
@@ -60,49 +64,49 @@ def run_purchase_module():
 
         with tab2:
             st.subheader("Vendor Master Maintenance")
-            vendors = db.query(Vendor).all()
-            if vendors:
-                v_to_edit = st.selectbox("Select Vendor", vendors, format_func=lambda x: f"{x.name} (ID: {x.id})")
-                with st.form("edit_v"):
-                    e_name = st.text_input("Company Name", value=v_to_edit.name)
-                    e_contact = st.text_input("Contact Person", value=v_to_edit.contact_person or "")
-                    e_phone = st.text_input("Phone", value=v_to_edit.phone or "")
-                    e_email = st.text_input("Email", value=v_to_edit.email or "")
-                    e_rating = st.slider("Rating", 1, 5, v_to_edit.rating if v_to_edit.rating else 3)
+            if db.query(Vendor.id).first():
+                v_to_edit = entity_picker("Select Vendor", db, Vendor, "vendor_edit", Vendor.name,
+                                          lambda r: f"{r.name} (ID: {r.id})", columns=(Vendor.name,))
+                if v_to_edit:
+                    with st.form("edit_v"):
+                        e_name = st.text_input("Company Name", value=v_to_edit.name)
+                        e_contact = st.text_input("Contact Person", value=v_to_edit.contact_person or "")
+                        e_phone = st.text_input("Phone", value=v_to_edit.phone or "")
+                        e_email = st.text_input("Email", value=v_to_edit.email or "")
+                        e_rating = st.slider("Rating", 1, 5, v_to_edit.rating if v_to_edit.rating else 3)
                     
-                    if st.form_submit_button("💾 Save Changes"):
-                        v_to_edit.name = e_name
-                        v_to_edit.contact_person = e_contact
-                        v_to_edit.phone = e_phone
-                        v_to_edit.email = e_email
-                        v_to_edit.rating = e_rating
-                        db.commit()
-                        st.success("Vendor details updated.")
-                        st.rerun()
+                        if st.form_submit_button("💾 Save Changes"):
+                            v_to_edit.name = e_name
+                            v_to_edit.contact_person = e_contact
+                            v_to_edit.phone = e_phone
+                            v_to_edit.email = e_email
+                            v_to_edit.rating = e_rating
+                            db.commit()
+                            st.success("Vendor details updated.")
+                            st.rerun()
                 
-                st.divider()
-                if st.button("🔴 DELETE VENDOR PERMANENTLY"):
-                    if st.session_state.get('v_del_id') == v_to_edit.id:
-                        db.delete(v_to_edit)
-                        db.commit()
-                        st.success("Vendor removed.")
-                        st.session_state['v_del_id'] = None
-                        st.rerun()
-                    else:
-                        st.session_state['v_del_id'] = v_to_edit.id
-                        st.warning("Click again to confirm PERMANENT deletion.")
+                    st.divider()
+                    if st.button("🔴 DELETE VENDOR PERMANENTLY"):
+                        if st.session_state.get('v_del_id') == v_to_edit.id:
+                            db.delete(v_to_edit)
+                            db.commit()
+                            st.success("Vendor removed.")
+                            st.session_state['v_del_id'] = None
+                            st.rerun()
+                        else:
+                            st.session_state['v_del_id'] = v_to_edit.id
+                            st.warning("Click again to confirm PERMANENT deletion.")
             else:
                 st.info("No vendors registered yet.")
 
     elif option == "Create PO":
         st.subheader("Generate Purchase Order")
-        vendors = db.query(Vendor).all()
-        if not vendors:
+        if not db.query(Vendor.id).first():
             st.error("You must register a Vendor first.")
         else:
+            v_sel = entity_picker("Vendor Selection", db, Vendor, "po_vendor", Vendor.name, lambda r: r.name, columns=(Vendor.name,))
             with st.form("po_form"):
                 col1, col2 = st.columns(2)
-                v_sel = col1.selectbox("Vendor Selection", vendors, format_func=lambda x: x.name)
                 po_ref = col2.text_input("PO Reference #", value=f"PO-{get_ist().strftime('%Y%m%d%H%M')}")
                 
                 amt = col1.number_input("Total Order Amount (₹)", min_value=0.0)
@@ -113,15 +117,18 @@ def run_purchase_module():
                 st.caption("Status will be set to 'Pending' by default for approval workflow.")
                 
                 if st.form_submit_button("📝 Generate Purchase Order"):
-                    new_po = PurchaseOrder(
-                        vendor_id=v_sel.id, 
-                        total_amount=amt, 
-                        expected_delivery=date,
-                        status="Pending"
-                    )
-                    db.add(new_po)
-                    db.commit()
-                    st.success(f"PO {po_ref} generated for {v_sel.name}.")
+                    if v_sel:
+                        new_po = PurchaseOrder(
+                            vendor_id=v_sel.id, 
+                            total_amount=amt, 
+                            expected_delivery=date,
+                            status="Pending"
+                        )
+                        db.add(new_po)
+                        db.commit()
+                        st.success(f"PO {po_ref} generated for {v_sel.name}.")
+                    else:
+                        st.error("Select a vendor for this order.")
 
     elif option == "Track Orders":
         st.subheader("PO Tracking & Status Management")
@@ -168,17 +175,10 @@ def run_purchase_module():
 
     elif option == "Purchase Analytics":
         st.subheader("Purchase & Procurement Intelligence 📈")
-        orders = db.query(PurchaseOrder).all()
-        vendors = db.query(Vendor).all()
+        db = next(get_read_db())
+        df = purchase_orders_frame(db)
         
-        if orders:
-            df = pd.DataFrame([{
-                "Vendor": p.vendor.name,
-                "Amount": p.total_amount,
-                "Status": p.status,
-                "Date": pd.to_datetime(p.order_date),
-                "Delivery": pd.to_datetime(p.expected_delivery)
-            } for p in orders])
+        if not df.empty:
 
             # --- SECTION 1: FINANCIAL KPIs ---
             st.markdown("### 💰 Financial Procurement Stats")
@@ -214,7 +214,7 @@ def run_purchase_module():
             
             active_vendors = df['Vendor'].nunique()
             top_vendor = df.groupby('Vendor')['Amount'].sum().idxmax()
-            upcoming_deliveries = len(df[(df['Delivery'] >= get_ist()) & (df['Status'] != "Delivered")])
+            upcoming_deliveries = len(df[(df['Delivery'] >= pd.Timestamp(get_ist_date())) & (df['Status'] != "Delivered")])
             daily_burn = total_spend / 30 # Simple estimate for a month
             
             v1.metric("Active Vendors", active_vendors)
@@ -229,26 +229,33 @@ def run_purchase_module():
             
             with col_chart1:
                 # Spend by Vendor
-                fig_vendor = px.pie(df, values='Amount', names='Vendor', hole=0.4,
-                                   title='Procurement Value by Vendor',
-                                   color_discrete_sequence=px.colors.qualitative.Bold)
+                fig_vendor = cached_figure(df[['Vendor', 'Amount']], {"chart": "vendor_spend"}, lambda d: px.pie(
+                    d, values='Amount', names='Vendor', hole=0.4,
+                    title='Procurement Value by Vendor',
+                    color_discrete_sequence=px.colors.qualitative.Bold))
                 st.plotly_chart(fig_vendor, use_container_width=True)
             
             with col_chart2:
                 # Status Breakdown
                 status_grouped = df.groupby('Status').size().reset_index(name='Count')
-                fig_status = px.bar(status_grouped, x='Status', y='Count', color='Status',
-                                   title='Order Volume by Lifecycle Stage',
-                                   color_discrete_map={"Pending": "#fbbf24", "Approved": "#3b82f6", "Delivered": "#10b981", "Cancelled": "#ef4444"})
+                fig_status = cached_figure(status_grouped, {"chart": "po_status"}, lambda d: px.bar(
+                    d, x='Status', y='Count', color='Status',
+                    title='Order Volume by Lifecycle Stage',
+                    color_discrete_map={"Pending": "#fbbf24", "Approved": "#3b82f6", "Delivered": "#10b981", "Cancelled": "#ef4444"}))
                 st.plotly_chart(fig_status, use_container_width=True)
+            analytics_source_caption()
 
             # Timeline of Spending
             st.markdown("### 📅 Spending Timeline")
-            df_time = df.sort_values("Date")
-            fig_time = px.line(df_time, x="Date", y="Amount", markers=True,
+            lo, hi = date_bounds(db, PurchaseOrder.order_date)
+            start, end = zoom_window("Zoom Period", lo, hi, key="po_zoom")
+            df_time, points = daily_series(db, PurchaseOrder.order_date, PurchaseOrder.total_amount, start, end)
+            fig_time = px.line(df_time, x="Date", y="Value", markers=len(df_time) < 200,
                               title="PO Value Trend Over Time",
-                              labels={"Amount": "Order Amount (₹)", "Date": "Issue Date"})
+                              labels={"Value": "Daily Order Value (₹)", "Date": "Issue Date"})
             st.plotly_chart(fig_time, use_container_width=True)
+            if len(df_time) < points:
+                st.caption(f"Showing {len(df_time)} of {points} days. Narrow the zoom period for full detail.")
             
         else:
             st.info("Insufficient data for detailed procurement analytics. Issue your first PO to see metrics.")
@@ -2,13 +2,15 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from database.db_manager import get_db
-from database.models import Project, FinanceRecord, TransactionType, InventoryItem, Employee, PurchaseOrder, Client
-from sqlalchemy import func
+from database.db_manager import get_read_db
+from database.models import Project, InventoryItem, Employee, PurchaseOrder
+from utils.figure_cache import cached_figure
+from utils.mis_data import executive_kpis, finance_frame, finance_by_category, projects_frame
+from ui.components import analytics_source_caption
 
 def run_reports_module():
     st.header("Business Intelligence & MIS Hub 📊")
-    db = next(get_db())
+    db = next(get_read_db())
     
     with st.sidebar:
         option = st.radio("Reports Menu", [
@@ -22,30 +24,30 @@ def run_reports_module():
     if option == "Executive BI Dashboard":
         # ... (Existing BI Dashboard logic remains largely similar, just ensured it fits the new structure)
         st.subheader("Strategic Performance Indicators")
-        income = db.query(func.sum(FinanceRecord.amount)).filter(FinanceRecord.type == TransactionType.INCOME).scalar() or 0
-        expense = db.query(func.sum(FinanceRecord.amount)).filter(FinanceRecord.type == TransactionType.EXPENSE).scalar() or 0
-        projects = db.query(Project).all()
-        clients = db.query(Client).all()
+        kpis = executive_kpis(db)
+        income, expense = kpis["income"], kpis["expense"]
         
         k1, k2, k3, k4 = st.columns(4)
         k1.metric("Gross Revenue", f"₹{income:,.0f}")
         profit_margin = ((income - expense) / income * 100) if income > 0 else 0
         k2.metric("Profit Margin", f"{profit_margin:.1f}%")
-        k3.metric("Project Count", len(projects))
-        k4.metric("Client Base", len(clients))
+        k3.metric("Project Count", kpis["projects"])
+        k4.metric("Client Base", kpis["clients"])
+        analytics_source_caption()
         st.divider()
 
     elif option == "Financial MIS":
         st.subheader("Financial Performance Reports")
-        recs = db.query(FinanceRecord).all()
-        if recs:
-            df = pd.DataFrame([{ "Date": r.date, "Type": r.type.value, "Category": r.category, "Amount": r.amount } for r in recs])
+        df = finance_frame(db)
+        if not df.empty:
             st.dataframe(df, use_container_width=True)
             
             # Summary Metrics
             st.markdown("#### Category Distribution")
-            fig = px.pie(df, values='Amount', names='Category', hole=0.3)
+            fig = cached_figure(finance_by_category(db), {"chart": "finance_categories"}, lambda d: px.pie(
+                d, values='Amount', names='Category', hole=0.3))
             st.plotly_chart(fig, use_container_width=True)
+            analytics_source_caption()
 
     elif option == "Custom Report Builder":
         st.subheader("🔍 Custom Intelligence Builder")
@@ -54,13 +56,10 @@ def run_reports_module():
         source = st.selectbox("Select Data Source", ["Projects", "Finance", "Inventory", "Workforce"])
         
         # Load relevant data based on source
-        data = []
         if source == "Projects":
-            data = db.query(Project).all()
-            df = pd.DataFrame([{ "Name": x.name, "Budget": x.total_budget, "Status": x.status.value, "Progress": x.progress } for x in data])
+            df = projects_frame(db)[["Name", "Budget", "Status", "Progress"]]
         elif source == "Finance":
-            data = db.query(FinanceRecord).all()
-            df = pd.DataFrame([{ "Date": x.date, "Amount": x.amount, "Category": x.category, "Type": x.type.value } for x in data])
+            df = finance_frame(db)[["Date", "Amount", "Category", "Type"]]
         else:
             df = pd.DataFrame() # Placeholder
             
@@ -2,9 +2,15 @@ import streamlit as st
 import pandas as pd
 import json
 import os
-from database.models import Company, Branch, SystemSetting
+from database.models import Company, Branch, SystemSetting, Job, JobSchedule, ChangeEvent
 from database.db_manager import get_db
 from datetime import datetime
+from sqlalchemy import func
+from utils.config import CATEGORIES, current_config, save_setting
+from utils.jobs import JOBS, enqueue, retry_job, save_schedule
+from utils.tenancy import TENANT_MODELS, current_tenant, tenant_stats
+from utils.importer import IMPORT_SPECS, DEFAULT_CHUNK, import_file, template_csv
+from utils import analytics_mirror as mirror, outbox
 
 def run_settings_module():
     st.header("Enterprise Settings & Configuration ⚙️")
@@ -15,6 +21,11 @@ def run_settings_module():
             "Company Management", 
             "Branch Management", 
             "System Configuration", 
+            "Background Jobs",
+            "Tenant Usage",
+            "Analytics Mirror",
+            "Change Feed",
+            "Bulk Data Import",
             "Backup & Recovery"
         ])
         
@@ -88,7 +99,7 @@ def run_settings_module():
         settings = db.query(SystemSetting).all()
         
         if settings:
-            st.write("**Current Config Key-Values**")
+            st.write(f"**Current Config Key-Values** (version {current_config().version})")
             df_s = pd.DataFrame([{
                 "Category": s.category, "Key": s.key, "Value": s.value, "Description": s.description
             } for s in settings])
@@ -97,24 +108,228 @@ def run_settings_module():
         st.divider()
         st.subheader("Update / Define Parameter")
         with st.form("setting_form"):
-            cat = st.selectbox("Category", ["General", "Finance", "Security", "Notifications"])
+            cat = st.selectbox("Category", CATEGORIES)
             key = st.text_input("Config Key (e.g., TAX_RATE)")
             val = st.text_input("Value")
             desc = st.text_area("Description")
             
             if st.form_submit_button("💾 Save Configuration"):
-                existing = db.query(SystemSetting).filter(SystemSetting.key == key).first()
-                if existing:
-                    existing.value = val
-                    existing.category = cat
-                    existing.description = desc
+                if key:
+                    save_setting(db, key, val, category=cat, description=desc)
+                    st.success(f"Config '{key}' synchronized.")
+                    st.rerun()
                 else:
-                    new_s = SystemSetting(category=cat, key=key, value=val, description=desc)
-                    db.add(new_s)
-                db.commit()
-                st.success(f"Config '{key}' synchronized.")
+                    st.error("Config key is required.")
+
+    elif option == "Background Jobs":
+        st.subheader("Background Job Queue")
+        counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Queued", counts.get("Queued", 0))
+        c2.metric("Running", counts.get("Running", 0))
+        c3.metric("Succeeded", counts.get("Succeeded", 0))
+        c4.metric("Failed", counts.get("Failed", 0))
+        if st.button("🔄 Refresh Status"):
+            st.rerun()
+
+        tab1, tab2, tab3 = st.tabs(["Recent Jobs", "Run Now", "Schedules"])
+
+        with tab1:
+            for j in db.query(Job).filter(Job.status == "Running").order_by(Job.id).all():
+                st.progress(j.progress or 0.0, text=f"#{j.id} {j.name} — {j.progress_note or 'running'}")
+
+            recent = db.query(Job).order_by(Job.id.desc()).limit(100).all()
+            if recent:
+                st.dataframe(pd.DataFrame([{
+                    "ID": j.id, "Job": j.name, "Status": j.status, "Progress": f"{(j.progress or 0) * 100:.0f}%",
+                    "Attempts": f"{j.attempts}/{j.max_attempts}", "Queued": j.created_at, "Started": j.started_at,
+                    "Duration (s)": round(j.duration_ms / 1000, 2) if j.duration_ms else None,
+                    "Result": j.result or (j.error or "").split("\n")[0]
+                } for j in recent]), use_container_width=True)
+
+                failed = [j for j in recent if j.status == "Failed"]
+                if failed:
+                    f_sel = st.selectbox("Inspect Failed Job", failed, format_func=lambda x: f"#{x.id} {x.name}")
+                    st.code(f_sel.error or "", language="text")
+                    if st.button("🔁 Retry Job"):
+                        retry_job(db, f_sel.id)
+                        st.success(f"Job #{f_sel.id} re-queued.")
+                        st.rerun()
+            else:
+                st.info("No jobs have run yet.")
+
+        with tab2:
+            with st.form("run_job"):
+                j_name = st.selectbox("Job", sorted(JOBS))
+                payload = st.text_area("Arguments (JSON)", value="{}")
+                if st.form_submit_button("▶️ Queue Job"):
+                    try:
+                        queued = enqueue(db, j_name, json.loads(payload or "{}"))
+                        st.success(f"Job #{queued.id} queued.")
+                    except json.JSONDecodeError as e:
+                        st.error(f"Arguments are not valid JSON: {e}")
+
+        with tab3:
+            schedules = db.query(JobSchedule).order_by(JobSchedule.name).all()
+            if schedules:
+                st.dataframe(pd.DataFrame([{
+                    "Name": s.name, "Job": s.job_name, "Cron": s.cron, "Active": s.is_active,
+                    "Last Run": s.last_run, "Next Run": s.next_run
+                } for s in schedules]), use_container_width=True)
+
+            st.caption("Cron fields: minute hour day month weekday (0 = Sunday), e.g. `*/15 * * * *` or `30 1 * * 1-5`.")
+            with st.form("job_schedule"):
+                s_name = st.text_input("Schedule Name*")
+                s_job = st.selectbox("Job", sorted(JOBS))
+                s_cron = st.text_input("Cron Expression*", value="0 2 * * *")
+                s_active = st.checkbox("Active", value=True)
+                if st.form_submit_button("💾 Save Schedule"):
+                    if s_name and s_cron:
+                        try:
+                            save_schedule(db, s_name, s_job, s_cron, is_active=s_active)
+                            st.success(f"Schedule '{s_name}' saved.")
+                            st.rerun()
+                        except ValueError as e:
+                            st.error(f"Invalid cron expression: {e}")
+                    else:
+                        st.error("Name and cron expression are required.")
+
+    elif option == "Tenant Usage":
+        st.subheader("Per-Tenant Data & Query Load")
+        companies = {c.id: c.name for c in db.query(Company).all()}
+        branches = {b.id: b.name for b in db.query(Branch).all()}
+
+        def tenant_label(company_id, branch_id):
+            if company_id is None and branch_id is None:
+                return "Unassigned"
+            label = companies.get(company_id, "Unassigned")
+            return f"{label} / {branches.get(branch_id, '?')}" if branch_id else label
+
+        tenant = current_tenant()
+        st.caption(f"Active scope: {tenant_label(*tenant) if tenant else 'All Companies'}")
+
+        rows = {}
+        for model in TENANT_MODELS:
+            counts = db.query(model.company_id, model.branch_id, func.count(model.id))\
+                .group_by(model.company_id, model.branch_id)\
+                .execution_options(all_tenants=True).all()
+            for company_id, branch_id, n in counts:
+                key = tenant_label(company_id, branch_id)
+                rows.setdefault(key, {"Tenant": key})[model.__tablename__] = n
+        if rows:
+            st.write("**Row counts (all tenants)**")
+            st.dataframe(pd.DataFrame(list(rows.values())).fillna(0), use_container_width=True)
+
+        stats = tenant_stats.snapshot()
+        if stats:
+            st.write("**ORM query timings since process start**")
+            st.dataframe(pd.DataFrame([{
+                "Tenant": tenant_label(*t) if t else "All Companies", "Queries": s["queries"],
+                "Avg (ms)": round(s["total_ms"] / s["queries"], 2), "Max (ms)": round(s["max_ms"], 2),
+                "Total (s)": round(s["total_ms"] / 1000, 2)
+            } for t, s in stats.items()]), use_container_width=True)
+            if st.button("Reset Timings"):
+                tenant_stats.reset()
                 st.rerun()
 
+    elif option == "Analytics Mirror":
+        st.subheader("Columnar Analytics Mirror (DuckDB)")
+        reason = mirror.unavailable_reason()
+        if reason:
+            st.warning(f"Mirror unavailable, MIS screens read the live database: {reason}")
+        else:
+            lag = mirror.lag_report(db)
+            synced = mirror.last_synced()
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Status", "Serving MIS" if mirror.ready() else "Stale / not synced")
+            c2.metric("Rows Behind", int(lag["Behind"].sum()))
+            c3.metric("Last Sync", synced.strftime("%d %b %H:%M") if synced else "Never")
+            st.dataframe(lag, use_container_width=True)
+            st.caption(f"MIS screens fall back to the live database when the mirror is older than {mirror.MAX_AGE_MINUTES} minutes.")
+
+            b1, b2 = st.columns(2)
+            if b1.button("🔄 Sync Now"):
+                queued = enqueue(db, "analytics_mirror_sync")
+                st.success(f"Job #{queued.id} queued.")
+            if b2.button("🧱 Full Rebuild"):
+                queued = enqueue(db, "analytics_mirror_sync", {"full": True})
+                st.success(f"Job #{queued.id} queued.")
+
+    elif option == "Change Feed":
+        st.subheader("Transactional Outbox")
+        st.caption("Every ORM write is recorded in `change_events` in the same transaction as the write. Consumers read the feed from their own cursor; entries every consumer has read are compacted hourly.")
+        by_table = dict(db.query(ChangeEvent.table_name, func.count(ChangeEvent.id)).group_by(ChangeEvent.table_name).all())
+        c1, c2 = st.columns(2)
+        c1.metric("Retained Events", sum(by_table.values()))
+        c2.metric("Latest Event ID", outbox.latest_event_id(db))
+
+        feed = outbox.consumers(db)
+        if feed:
+            st.markdown("#### Consumers")
+            st.dataframe(pd.DataFrame(feed), use_container_width=True)
+        else:
+            st.info("No consumers registered yet; events are retained until one reads them.")
+
+        if by_table:
+            st.markdown("#### Retained Events by Table")
+            st.dataframe(pd.DataFrame(sorted(by_table.items(), key=lambda x: -x[1]), columns=["Table", "Events"]),
+                         use_container_width=True)
+            recent = db.query(ChangeEvent).order_by(ChangeEvent.id.desc()).limit(50).all()
+            st.markdown("#### Latest Changes")
+            st.dataframe(pd.DataFrame([{
+                "ID": e.id, "Table": e.table_name, "Row": e.row_id, "Op": e.op, "At": e.changed_at, "Changes": e.changes
+            } for e in recent]), use_container_width=True)
+
+        b1, b2 = st.columns(2)
+        if b1.button("🧹 Compact Now"):
+            st.success(f"Removed {outbox.compact(db)} consumed events.")
+        if feed:
+            drop = b2.selectbox("Retire Consumer", [f["Consumer"] for f in feed])
+            if b2.button("🗑️ Drop Consumer"):
+                outbox.drop_consumer(db, drop)
+                st.success(f"Consumer '{drop}' dropped; it no longer holds back compaction.")
+                st.rerun()
+
+    elif option == "Bulk Data Import":
+        st.subheader("Bulk CSV / Excel Import 📥")
+        target = st.selectbox("Import Into", list(IMPORT_SPECS))
+        spec = IMPORT_SPECS[target]
+        required = [f.name for f in spec.fields if f.required] + [l.column for l in spec.lookups if l.required]
+        st.caption(f"Columns: {', '.join(spec.columns)}  ·  Required: {', '.join(required) or 'none'}")
+        if spec.lookups:
+            st.caption("Name columns (" + ", ".join(l.column for l in spec.lookups) + ") are matched to existing records by exact name.")
+        st.download_button("⬇️ Download CSV Template", template_csv(spec), file_name=f"{target.lower().replace(' ', '_')}_template.csv", mime="text/csv")
+
+        upload = st.file_uploader("Upload File", type=["csv", "xlsx"])
+        col1, col2 = st.columns(2)
+        chunk = col1.number_input("Rows per Batch", min_value=500, max_value=100000, value=DEFAULT_CHUNK, step=500)
+        dry_run = col2.checkbox("Validate only (no insert)")
+
+        if upload and st.button("🚀 Run Import"):
+            data = upload.getvalue()
+            # Line count is a cheap row estimate for CSV; XLSX only reports rows done
+            total = max(data.count(b"\n") - 1, 1) if upload.name.lower().endswith(".csv") else None
+            bar = st.progress(0.0, text="Reading file...")
+            started = datetime.now()
+            result = import_file(db, target, data, upload.name, chunksize=int(chunk), dry_run=dry_run,
+                                 on_chunk=lambda n: bar.progress(min(n / total, 0.99) if total else 0.5, text=f"{n:,} rows processed"))
+            elapsed = (datetime.now() - started).total_seconds()
+            bar.progress(1.0, text=f"Done in {elapsed:.1f}s")
+
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Rows Read", f"{result['rows']:,}")
+            m2.metric("Valid" if dry_run else "Inserted", f"{result['valid']:,}")
+            m3.metric("Rejected", f"{result['rejected']:,}")
+            m4.metric("Rows / min", f"{result['rows'] / elapsed * 60:,.0f}" if elapsed else "—")
+
+            errors = result["errors"]
+            if errors.empty:
+                st.success("All rows passed validation.")
+            else:
+                st.warning(f"{len(errors):,} problems in {result['rejected']:,} rows (line numbers count the header as line 1).")
+                st.dataframe(errors.head(1000), use_container_width=True)
+                st.download_button("⬇️ Download Error Report", errors.to_csv(index=False), file_name="import_errors.csv", mime="text/csv")
+
     elif option == "Backup & Recovery":
         st.subheader("Security & Data Resilience 🛡️")
         col1, col2 = st.columns(2)
@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 from database.models import HSERecord, DocumentAsset, Project
 from database.db_manager import get_db
+from utils.doc_store import save_document, delete_document, open_blob, project_storage, store_totals, human_size
 from datetime import datetime
+from ui.components import entity_picker
 
 def run_site_ops_module():
     st.header("Site Operations & Compliance 🏗️")
@@ -19,23 +21,24 @@ def run_site_ops_module():
         st.subheader("HSE Incident & Inspection Tracker")
         tab1, tab2 = st.tabs(["Log HSE Entry", "Inspection History"])
         
-        projects = db.query(Project).all()
-        
         with tab1:
+            p_sel = entity_picker("Site Location", db, Project, "hse_project", Project.name, lambda r: r.name, columns=(Project.name,))
             with st.form("hse_form"):
                 col1, col2 = st.columns(2)
-                p_sel = col1.selectbox("Site Location", projects, format_func=lambda x: x.name)
-                i_type = col2.selectbox("Entry Type", ["Safety Inspection", "Near Miss", "Site Injury", "Environmental Check"])
+                i_type = col1.selectbox("Entry Type", ["Safety Inspection", "Near Miss", "Site Injury", "Environmental Check"])
                 
                 desc = st.text_area("Observation / Incident Details")
                 action = st.text_area("Corrective Action Taken")
                 reporter = st.text_input("Reported By")
                 
                 if st.form_submit_button("🚨 Submit HSE Report"):
-                    new_hse = HSERecord(project_id=p_sel.id, incident_type=i_type, description=desc, action_taken=action, reported_by=reporter)
-                    db.add(new_hse)
-                    db.commit()
-                    st.success("HSE Record synchronized to Central Safety Register.")
+                    if p_sel:
+                        new_hse = HSERecord(project_id=p_sel.id, incident_type=i_type, description=desc, action_taken=action, reported_by=reporter)
+                        db.add(new_hse)
+                        db.commit()
+                        st.success("HSE Record synchronized to Central Safety Register.")
+                    else:
+                        st.error("Select the site this report belongs to.")
                     
         with tab2:
             hses = db.query(HSERecord).all()
@@ -49,36 +52,73 @@ def run_site_ops_module():
 
     elif option == "DMS (Document Management)":
         st.subheader("Centralized Document Management System")
-        tab1, tab2 = st.tabs(["Asset Repository", "Upload New Asset"])
+        tab1, tab2, tab3 = st.tabs(["Asset Repository", "Upload New Asset", "Storage by Project"])
         
         with tab1:
-            docs = db.query(DocumentAsset).all()
+            docs = db.query(DocumentAsset).order_by(DocumentAsset.upload_date.desc()).all()
             if docs:
                 st.dataframe(pd.DataFrame([{
                     "ID": d.id, "Title": d.title, "Category": d.category,
-                    "Project": d.project.name if d.project else "Global", "Uploaded": d.upload_date
+                    "Project": d.project.name if d.project else "Global", "File": d.original_filename or "—",
+                    "Size": human_size(d.size_bytes or 0), "Uploaded": d.upload_date
                 } for d in docs]))
+
+                stored = [d for d in docs if d.content_hash]
+                if stored:
+                    st.markdown("#### Retrieve Document")
+                    doc = st.selectbox("Document", stored, format_func=lambda x: f"#{x.id} · {x.title} ({x.original_filename})")
+                    col1, col2 = st.columns(2)
+                    # Deferred: the blob is opened only when the button is clicked
+                    col1.download_button("⬇️ Download", lambda: open_blob(doc.content_hash), file_name=doc.original_filename,
+                                         mime=doc.mime_type, key=f"dms_dl_{doc.id}")
+                    if col2.button("🗑️ Delete Document"):
+                        delete_document(db, doc)
+                        st.success("Document removed from the vault.")
+                        st.rerun()
+                    st.caption(f"SHA-256 `{doc.content_hash}` · {human_size(doc.size_bytes)} · {doc.mime_type}")
             else:
                 st.info("Repository empty. Upload site drawings or contracts.")
                 
         with tab2:
-            projects = db.query(Project).all()
-            with st.form("dms_form"):
+            p_sel = entity_picker("Link to Project", db, Project, "dms_project", Project.name, lambda r: r.name,
+                                  columns=(Project.name,), none_label="Global")
+            with st.form("dms_form", clear_on_submit=True):
                 title = st.text_input("Document Title*")
                 cat = st.selectbox("Category", ["Drawing", "Contract", "Permit", "License", "Insurance"])
-                p_sel = st.selectbox("Link to Project", projects, format_func=lambda x: x.name)
-                # Placeholder for real file handling
-                st.write("---")
-                st.caption("Simulator: Files would be stored securely in the cloud/on-prem vault.")
+                files = st.file_uploader("Files*", accept_multiple_files=True)
+                st.caption("Identical files are stored once and shared across projects.")
                 
                 if st.form_submit_button("📂 Upload to DMS"):
-                    if title:
-                        new_doc = DocumentAsset(title=title, category=cat, project_id=p_sel.id)
-                        db.add(new_doc)
-                        db.commit()
-                        st.success("Document vaulted successfully.")
+                    if title and files:
+                        reused = 0
+                        for f in files:
+                            doc_title = title if len(files) == 1 else f"{title} - {f.name}"
+                            _, deduplicated = save_document(db, f, f.name, doc_title, cat,
+                                                            project_id=p_sel.id if p_sel else None, mime_type=f.type)
+                            reused += deduplicated
+                        msg = f"{len(files)} document(s) vaulted successfully."
+                        if reused:
+                            msg += f" {reused} matched existing content and were not stored again."
+                        st.success(msg)
                     else:
-                        st.error("Title needed.")
+                        st.error("Title and at least one file needed.")
+
+        with tab3:
+            totals = store_totals(db)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Documents", f"{totals['files']:,}")
+            col2.metric("Logical Size", human_size(totals["logical_bytes"]))
+            col3.metric("On Disk", human_size(totals["stored_bytes"]),
+                        delta=f"-{human_size(totals['logical_bytes'] - totals['stored_bytes'])} deduplicated", delta_color="off")
+            usage = project_storage(db)
+            if usage:
+                df_u = pd.DataFrame(usage).sort_values("logical_bytes", ascending=False)
+                st.dataframe(pd.DataFrame({
+                    "Project": df_u["project"], "Files": df_u["files"],
+                    "Logical Size": df_u["logical_bytes"].map(human_size), "Stored Size": df_u["stored_bytes"].map(human_size)
+                }), use_container_width=True, hide_index=True)
+            else:
+                st.info("No files stored yet.")
 
     elif option == "Workflow & Approvals":
         st.subheader("Workflow & Approval Engine Status")
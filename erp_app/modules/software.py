@@ -3,7 +3,7 @@ import pandas as pd
 from database.models import SoftwareAsset
 from database.db_manager import get_db
 from datetime import datetime
-from utils.time_utils import get_ist_date
+from utils.alerts import active_alert_summary
 
 def run_software_module():
     st.header("Software & License Management 💻")
@@ -16,13 +16,11 @@ def run_software_module():
         st.subheader("Digital Asset Inventory")
         assets = db.query(SoftwareAsset).all()
         if assets:
+            # Expiry is tracked by the license_expired alert rule
+            counts, alerts = active_alert_summary(db, limit=None, rule="license_expired")
+            expired = {a.entity_id for a in alerts}
             data = []
             for a in assets:
-                # Basic expiry check
-                status = a.status
-                if a.expiry_date and a.expiry_date < get_ist_date():
-                    status = "🔴 Expired"
-                
                 data.append({
                     "ID": a.id,
                     "Software Name": a.name,
@@ -30,12 +28,12 @@ def run_software_module():
                     "License Key": "********" if a.license_key else "None",
                     "Assigned To": a.assigned_to or "Unassigned",
                     "Expiry": a.expiry_date,
-                    "Status": status
+                    "Status": "🔴 Expired" if a.id in expired else a.status
                 })
             df = pd.DataFrame(data)
             st.dataframe(df, use_container_width=True)
             
-            expired_recs = len([d for d in data if "Expired" in str(d['Status'])])
+            expired_recs = sum(counts.values())
             if expired_recs > 0:
                 st.error(f"Attention: {expired_recs} software licenses have expired!")
         else:
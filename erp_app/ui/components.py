@@ -0,0 +1,43 @@
+import streamlit as st
+import pandas as pd
+from utils.time_utils import get_ist
+from utils.analytics_mirror import ready, last_synced
+from utils.typeahead import prefix_matches, DEFAULT_LIMIT
+
+def zoom_window(label, lo, hi, key):
+    """Date-range slider acting as server-side chart zoom; returns (start, end)."""
+    if lo is None or hi is None or lo >= hi:
+        return lo, hi
+    lo, hi = pd.Timestamp(lo).date(), pd.Timestamp(hi).date()
+    return st.slider(label, min_value=lo, max_value=hi, value=(lo, hi), key=key, format="DD MMM YYYY")
+
+def analytics_source_caption():
+    """Caption saying whether MIS figures come from the analytics mirror or the live database."""
+    if ready():
+        minutes = (get_ist().replace(tzinfo=None) - last_synced()).total_seconds() / 60
+        st.caption(f"⚡ Analytics mirror, synced {minutes:.0f} min ago")
+    else:
+        st.caption("Live database figures (analytics mirror not synced)")
+
+def entity_picker(label, db, model, key, search_column, format_func, columns=(), where=(), order_by=None,
+                  none_label=None, container=None, limit=DEFAULT_LIMIT):
+    """Typeahead picker: a search box plus a selectbox of the top prefix matches.
+
+    Only the matching ids and their labels reach the page and session
+    state; the chosen row is loaded by primary key. `format_func`
+    receives a result row carrying `columns`. Must sit outside st.form so
+    typing refreshes the matches. Returns the ORM object, or None.
+    """
+    container = container or st
+    term = container.text_input(label, key=f"{key}_search", placeholder="Type to search, or #id")
+    rows = prefix_matches(db, model, search_column, term, columns, where, order_by, limit)
+    labels = {r.id: format_func(r) for r in rows}
+    options = ([None] if none_label else []) + list(labels)
+    if not options:
+        container.caption(f"No matches for '{term}'.")
+        return None
+    chosen = container.selectbox(label, options, key=key, label_visibility="collapsed",
+                                 format_func=lambda i: none_label if i is None else labels[i])
+    if len(rows) == limit:
+        container.caption(f"Showing the first {limit} matches; keep typing to narrow down.")
+    return db.get(model, chosen) if chosen is not None else None
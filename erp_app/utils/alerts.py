@@ -0,0 +1,219 @@
+import threading
+from sqlalchemy import event, select, update, insert, func, case, bindparam
+from database.models import Alert, InventoryItem, SoftwareAsset, MaintenanceSchedule, Invoice
+from utils.watermarks import get_watermark
+from utils.time_utils import get_ist, get_ist_date
+
+SWEEP_WATERMARK = "alerts:due_sweep"
+SEVERITY_ORDER = {"Critical": 0, "Warning": 1, "Info": 2}
+
+class AlertRule:
+    """A condition on one table that raises or clears an alert per row.
+
+    `check(row, today)` returns (severity, message) while the condition
+    holds and None otherwise. Rules with a `due_column` turn true purely
+    with the passage of time, so they are also picked up by the sweep.
+    """
+
+    def __init__(self, name, model, check, due_column=None, open_filter=None):
+        self.name = name
+        self.model = model
+        self.check = check
+        self.due_column = due_column
+        self.open_filter = open_filter
+
+    def evaluate(self, row, today):
+        result = self.check(row, today)
+        due = getattr(row, self.due_column.key) if self.due_column is not None else None
+        if result is None:
+            return (self.name, row.id, None, None, due)
+        return (self.name, row.id, result[0], result[1], due)
+
+def _low_stock(item, today):
+    if item.current_stock is None or item.min_stock_alert is None:
+        return None
+    if item.current_stock > item.min_stock_alert:
+        return None
+    severity = "Critical" if item.current_stock <= 0 else "Warning"
+    qty = f"{item.current_stock} {item.unit}" if item.unit else str(item.current_stock)
+    return severity, f"Low stock: {item.name} ({qty} left, min {item.min_stock_alert})"
+
+def _license_expired(sw, today):
+    if not sw.expiry_date or sw.expiry_date >= today:
+        return None
+    return "Warning", f"License expired: {sw.name} on {sw.expiry_date}"
+
+def _maintenance_overdue(task, today):
+    if task.status == "Completed" or not task.scheduled_date or task.scheduled_date >= today:
+        return None
+    return "Critical", f"Maintenance overdue: {task.task_name} (asset #{task.asset_id}) since {task.scheduled_date}"
+
+def _invoice_overdue(inv, today):
+    if inv.status == "Paid" or not inv.due_date or inv.due_date >= today:
+        return None
+    severity = "Critical" if (today - inv.due_date).days > 30 else "Warning"
+    return severity, f"Invoice overdue: {inv.invoice_number} ₹{inv.amount:,.2f} due {inv.due_date}"
+
+RULES = [
+    AlertRule("low_stock", InventoryItem, _low_stock),
+    AlertRule("license_expired", SoftwareAsset, _license_expired,
+              due_column=SoftwareAsset.expiry_date),
+    AlertRule("maintenance_overdue", MaintenanceSchedule, _maintenance_overdue,
+              due_column=MaintenanceSchedule.scheduled_date,
+              open_filter=MaintenanceSchedule.status != "Completed"),
+    AlertRule("invoice_overdue", Invoice, _invoice_overdue,
+              due_column=Invoice.due_date,
+              open_filter=Invoice.status != "Paid"),
+]
+RULES_BY_MODEL = {}
+for _rule in RULES:
+    RULES_BY_MODEL.setdefault(_rule.model, []).append(_rule)
+
+CHUNK = 500
+
+def _chunks(values, size=CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def apply_alert_changes(conn, changes):
+    """Upsert or resolve alerts from (rule, entity_id, severity, message, due) tuples.
+
+    Statements are batched per rule: one UPDATE per chunk of resolved ids,
+    and executemany UPDATE/INSERT for raised alerts split by whether an
+    alert row already exists.
+    """
+    now = get_ist()
+    by_rule = {}
+    for rule, entity_id, severity, message, due in changes:
+        by_rule.setdefault(rule, {})[entity_id] = (severity, message, due)
+    for rule, entries in by_rule.items():
+        resolved = [eid for eid, (severity, _, _) in entries.items() if severity is None]
+        for ids in _chunks(resolved):
+            conn.execute(update(Alert).where(Alert.rule == rule, Alert.entity_id.in_(ids), Alert.is_active == True)
+                         .values(is_active=False, resolved_at=now))
+        raised = [eid for eid, (severity, _, _) in entries.items() if severity is not None]
+        existing = {}
+        for ids in _chunks(raised):
+            existing.update(conn.execute(select(Alert.entity_id, Alert.id)
+                                         .where(Alert.rule == rule, Alert.entity_id.in_(ids))).all())
+        updates = [{"_id": existing[eid], "_severity": entries[eid][0], "_message": entries[eid][1][:255],
+                    "_due": entries[eid][2]} for eid in raised if eid in existing]
+        if updates:
+            conn.execute(update(Alert).where(Alert.id == bindparam("_id")).values(
+                severity=bindparam("_severity"), message=bindparam("_message"), due_date=bindparam("_due"),
+                is_active=True, resolved_at=None
+            ), updates)
+        inserts = [{"rule": rule, "entity_id": eid, "severity": entries[eid][0], "message": entries[eid][1][:255],
+                    "due_date": entries[eid][2], "is_active": True, "created_at": now}
+                   for eid in raised if eid not in existing]
+        if inserts:
+            conn.execute(insert(Alert), inserts)
+
+def _on_flush(session, flush_context):
+    """Re-evaluate the rules only for rows written in this flush."""
+    if not (session.new or session.dirty or session.deleted):
+        return
+    today = get_ist_date()
+    changes = []
+    for obj in list(session.new) + list(session.dirty):
+        for rule in RULES_BY_MODEL.get(type(obj), ()):
+            if obj.id is not None:
+                changes.append(rule.evaluate(obj, today))
+    for obj in session.deleted:
+        for rule in RULES_BY_MODEL.get(type(obj), ()):
+            changes.append((rule.name, obj.id, None, None, None))
+    if changes:
+        apply_alert_changes(session.connection(), changes)
+
+def install_alert_hooks(session_factory=None):
+    """Attach incremental rule evaluation to a sessionmaker (idempotent)."""
+    if session_factory is None:
+        from database.db_manager import SessionLocal
+        session_factory = SessionLocal
+    if not event.contains(session_factory, "after_flush", _on_flush):
+        event.listen(session_factory, "after_flush", _on_flush)
+
+def evaluate_rule(db, name, after_id=None):
+    """Re-check one rule after a bulk Core insert (commits).
+
+    With `after_id` only rows with a higher id are read, so an import
+    re-checks the rows it added rather than the whole table. Rows are
+    read as plain tuples in id batches, not as ORM objects.
+    """
+    rule = next(r for r in RULES if r.name == name)
+    base = select(*rule.model.__table__.columns)
+    if rule.open_filter is not None:
+        base = base.where(rule.open_filter)
+    today = get_ist_date()
+    last, evaluated = after_id or 0, 0
+    while True:
+        rows = db.execute(base.where(rule.model.id > last).order_by(rule.model.id).limit(CHUNK * 10)).all()
+        if not rows:
+            break
+        changes = [rule.evaluate(row, today) for row in rows]
+        if after_id is not None:
+            # New rows have no alerts to resolve
+            changes = [c for c in changes if c[2] is not None]
+        apply_alert_changes(db.connection(), changes)
+        evaluated += len(rows)
+        last = rows[-1].id
+    db.commit()
+    return evaluated
+
+def sweep_due_alerts(db, today=None, full=False):
+    """Raise alerts for rows whose due date passed since the last sweep.
+
+    Each dated rule reads only the index range (last sweep day, today) of
+    its due column, so a daily sweep touches a day's worth of rows. The
+    first run (or `full=True`) evaluates every rule against the whole table.
+    """
+    today = today or get_ist_date()
+    mark = get_watermark(db, SWEEP_WATERMARK)
+    since = None if full or not mark.last_run else mark.last_run.date()
+    if since is not None and since >= today:
+        return {"evaluated": 0, "raised": 0}
+
+    changes = []
+    for rule in RULES:
+        if since is not None and rule.due_column is None:
+            continue
+        stmt = select(rule.model)
+        if since is not None:
+            stmt = stmt.where(rule.due_column >= since, rule.due_column < today)
+            if rule.open_filter is not None:
+                stmt = stmt.where(rule.open_filter)
+        changes.extend(rule.evaluate(row, today) for row in db.execute(stmt).scalars())
+
+    apply_alert_changes(db.connection(), changes)
+    mark.last_run = get_ist()
+    mark.rows_processed = (mark.rows_processed or 0) + len(changes)
+    db.commit()
+    return {"evaluated": len(changes), "raised": sum(1 for c in changes if c[2])}
+
+_last_sweep = {"date": None}
+_sweep_lock = threading.Lock()
+
+def sweep_if_stale(db):
+    """Run the due-date sweep at most once per day per process."""
+    today = get_ist_date()
+    if _last_sweep["date"] == today:
+        return None
+    with _sweep_lock:
+        if _last_sweep["date"] == today:
+            return None
+        result = sweep_due_alerts(db, today=today)
+        _last_sweep["date"] = today
+        return result
+
+def active_alert_summary(db, limit=10, rule=None):
+    """Counts per severity plus the most urgent active alerts for the badge.
+
+    `rule` narrows both to one rule, e.g. for a module's own overview;
+    `limit=None` returns every active alert.
+    """
+    scope = [Alert.is_active == True] + ([Alert.rule == rule] if rule else [])
+    counts = dict(db.query(Alert.severity, func.count(Alert.id))
+                  .filter(*scope).group_by(Alert.severity).all())
+    rank = case(SEVERITY_ORDER, value=Alert.severity, else_=3)
+    top = db.query(Alert).filter(*scope).order_by(rank, Alert.due_date, Alert.id).limit(limit).all()
+    return counts, top
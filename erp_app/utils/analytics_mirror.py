@@ -0,0 +1,253 @@
+"""Columnar analytics mirror: a DuckDB copy of the tables behind the MIS screens.
+
+The `analytics_mirror_sync` job keeps an embedded DuckDB file in step
+with the transactional database. New rows are copied past an id
+watermark per table. Updates and deletes come from the outbox change
+feed (utils.outbox): changed rows are re-read from the source and
+replaced, and a bulk update/delete recopies the whole table. Analytics
+pages then aggregate with DuckDB's vectorized engine instead of holding
+read transactions on the OLTP database while users post forms.
+"""
+import enum
+import os
+import threading
+import time
+import pandas as pd
+from sqlalchemy import select, func, Boolean, Integer, Float, Numeric, Date, DateTime, Enum
+from database.models import Base
+from utils.tenancy import current_tenant
+from utils.outbox import read_batch, acknowledge, backlog, latest_event_id
+from utils.time_utils import get_ist
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+MIRROR_PATH = os.getenv("ANALYTICS_MIRROR_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analytics.duckdb")
+MAX_AGE_MINUTES = int(os.getenv("ANALYTICS_MIRROR_MAX_AGE_MINUTES", "60"))
+CHUNK = 50000
+ID_BATCH = 500
+OUTBOX_CONSUMER = "analytics_mirror"
+# A backlog longer than this is cheaper to rebuild than to replay row by row
+MAX_REPLAY = 20000
+
+TABLES = [
+    "finance_records", "attendance", "production_logs", "projects", "clients",
+    "contracts", "vendors", "purchase_orders", "invoices", "employees",
+]
+
+STATE_DDL = """CREATE TABLE IF NOT EXISTS _mirror_state (
+    table_name VARCHAR PRIMARY KEY, last_id BIGINT, row_count BIGINT, synced_at TIMESTAMP)"""
+
+_con = None
+_error = None
+_open_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+def _now():
+    # Naive IST, matching what DuckDB TIMESTAMP columns hand back
+    return get_ist().replace(tzinfo=None)
+
+def _connect():
+    """The process-wide mirror connection, or None if DuckDB is missing or the file is locked."""
+    global _con, _error
+    if _con is None and _error is None:
+        with _open_lock:
+            if _con is None and _error is None:
+                if duckdb is None:
+                    _error = "duckdb is not installed"
+                    return None
+                try:
+                    con = duckdb.connect(MIRROR_PATH)
+                    con.execute(STATE_DDL)
+                    _con = con
+                except duckdb.Error as e:
+                    _error = str(e)
+                    print(f"Analytics mirror unavailable, MIS screens read the live database: {e}")
+    return _con
+
+def unavailable_reason():
+    _connect()
+    return _error
+
+def query(sql, params=None):
+    """Run SQL on the mirror and return a DataFrame (one cursor per call, safe across threads)."""
+    cur = _connect().cursor()
+    try:
+        return cur.execute(sql, params or []).df()
+    finally:
+        cur.close()
+
+def last_synced():
+    """Oldest per-table sync time, or None until every mirrored table has been synced."""
+    if _connect() is None:
+        return None
+    state = query("SELECT count(*) AS tables, min(synced_at) AS oldest FROM _mirror_state WHERE table_name IN "
+                  f"({', '.join('?' * len(TABLES))})", list(TABLES))
+    if state["tables"][0] < len(TABLES):
+        return None
+    return state["oldest"][0].to_pydatetime()
+
+def ready():
+    """True when the mirror is complete and fresher than ANALYTICS_MIRROR_MAX_AGE_MINUTES."""
+    synced = last_synced()
+    return synced is not None and (_now() - synced).total_seconds() <= MAX_AGE_MINUTES * 60
+
+def tenant_filter(alias=None):
+    """(predicate, params) limiting a tenant-owned mirror table to the active company/branch."""
+    tenant = current_tenant()
+    if not tenant:
+        return "TRUE", []
+    prefix = f"{alias}." if alias else ""
+    clauses, params = [], []
+    for column, value in zip(("company_id", "branch_id"), tenant):
+        if value:
+            clauses.append(f"{prefix}{column} = ?")
+            params.append(value)
+    return " AND ".join(clauses), params
+
+def _duck_type(column):
+    kind = column.type
+    if isinstance(kind, Enum):
+        return "VARCHAR"
+    if isinstance(kind, Boolean):
+        return "BOOLEAN"
+    if isinstance(kind, Integer):
+        return "BIGINT"
+    if isinstance(kind, (Float, Numeric)):
+        return "DOUBLE"
+    if isinstance(kind, DateTime):
+        return "TIMESTAMP"
+    if isinstance(kind, Date):
+        return "DATE"
+    return "VARCHAR"
+
+def _ensure_table(cur, table, rebuild):
+    """Create the mirror table; recreate it if the source columns changed. True if (re)created."""
+    existing = [r[0] for r in cur.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = 'main' AND table_name = ? "
+        "ORDER BY ordinal_position", [table.name]).fetchall()]
+    wanted = [c.name for c in table.columns]
+    if existing == wanted and not rebuild:
+        return False
+    columns = ", ".join(f'"{c.name}" {_duck_type(c)}' for c in table.columns)
+    cur.execute(f'DROP TABLE IF EXISTS "{table.name}"')
+    cur.execute(f'CREATE TABLE "{table.name}" ({columns})')
+    return True
+
+def _read_rows(conn, table, where):
+    df = pd.read_sql(select(table).where(where).order_by(table.c.id).limit(CHUNK), conn)
+    for column in table.columns:
+        if isinstance(column.type, Enum):
+            df[column.name] = df[column.name].map(lambda v: v.value if isinstance(v, enum.Enum) else v).astype(object)
+        elif isinstance(column.type, (Date, DateTime)):
+            df[column.name] = pd.to_datetime(df[column.name])
+    return df
+
+def _insert(cur, name, df):
+    cur.register("_chunk", df)
+    cur.execute(f'INSERT INTO "{name}" BY NAME SELECT * FROM _chunk')
+    cur.unregister("_chunk")
+
+def _outbox_changes(events):
+    """(row ids to re-read per table, tables needing a full recopy) from outbox events."""
+    changed, reload = {}, set()
+    for e in events:
+        if e["row_id"] is not None:
+            changed.setdefault(e["table"], set()).add(e["row_id"])
+        elif e["op"] != "insert":
+            reload.add(e["table"]) # Bulk inserts are picked up by the id watermark
+    return changed, reload
+
+def sync_mirror(db, full=False):
+    """Bring the mirror up to date; `full=True` rebuilds every table.
+
+    Reads go through `db`'s connection as Core statements, so the copy
+    covers all tenants. All mirror writes happen in one DuckDB
+    transaction together with the id watermarks: MIS readers keep seeing
+    the previous sync until it commits, and a failed sync leaves nothing
+    half-copied. The outbox cursor moves only after that commit; replaying
+    events is idempotent, so a crash in between just repeats work.
+    Returns rows copied, changed rows replaced, what is still behind and
+    the duration.
+    """
+    con = _connect()
+    if con is None:
+        raise RuntimeError(f"Analytics mirror unavailable: {_error}")
+    started = time.perf_counter()
+    conn = db.connection()
+    copied = replaced = 0
+    with _sync_lock:
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN TRANSACTION")
+            marks = dict(cur.execute("SELECT table_name, last_id FROM _mirror_state").fetchall())
+            full = full or not marks or sum(backlog(db, OUTBOX_CONSUMER, TABLES).values()) > MAX_REPLAY
+            if full:
+                events, upto = [], latest_event_id(db)
+            else:
+                events, upto = read_batch(db, OUTBOX_CONSUMER, TABLES, limit=MAX_REPLAY)
+            changed, reload = _outbox_changes(events)
+            for name in TABLES:
+                table = Base.metadata.tables[name]
+                last = marks.get(name) or 0
+                if _ensure_table(cur, table, full) or name in reload:
+                    cur.execute(f'DELETE FROM "{name}"')
+                    last = 0
+                else:
+                    # Rows past the watermark are appended below; older ones are replaced in place
+                    ids = sorted(i for i in changed.get(name, ()) if i <= last)
+                    for i in range(0, len(ids), ID_BATCH):
+                        batch = ids[i:i + ID_BATCH]
+                        cur.execute(f'DELETE FROM "{name}" WHERE id IN (SELECT unnest(?::BIGINT[]))', [batch])
+                        rows = _read_rows(conn, table, table.c.id.in_(batch))
+                        if not rows.empty:
+                            _insert(cur, name, rows)
+                        replaced += len(batch)
+                while True:
+                    chunk = _read_rows(conn, table, table.c.id > last)
+                    if chunk.empty:
+                        break
+                    _insert(cur, name, chunk)
+                    copied += len(chunk)
+                    last = int(chunk["id"].max())
+                    if len(chunk) < CHUNK:
+                        break
+                cur.execute(f'INSERT OR REPLACE INTO _mirror_state SELECT ?, ?, count(*), ? FROM "{name}"',
+                            [name, last, _now()])
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        finally:
+            cur.close()
+    acknowledge(db, OUTBOX_CONSUMER, upto, len(events))
+    db.commit()
+    lag = lag_report(db)
+    return {"rows": copied, "changed": replaced, "reloaded": sorted(reload), "behind": int(lag["Behind"].sum()),
+            "pending_changes": int(lag["Pending Changes"].sum()), "seconds": round(time.perf_counter() - started, 2),
+            "full": full}
+
+def lag_report(db):
+    """Per-table freshness: new source rows, unapplied changes and age of the last sync."""
+    state = {}
+    if _connect() is not None:
+        state = {r["table_name"]: r for r in query("SELECT * FROM _mirror_state").to_dict("records")}
+    pending = backlog(db, OUTBOX_CONSUMER, TABLES)
+    now = _now()
+    rows = []
+    for name in TABLES:
+        table = Base.metadata.tables[name]
+        source_max = db.execute(select(func.max(table.c.id))).scalar() or 0
+        s = state.get(name)
+        synced = s["synced_at"].to_pydatetime() if s else None
+        rows.append({
+            "Table": name, "Mirrored Rows": int(s["row_count"]) if s else 0,
+            "Source Max ID": source_max, "Mirror Max ID": int(s["last_id"]) if s else 0,
+            "Behind": max(source_max - (int(s["last_id"]) if s else 0), 0),
+            "Pending Changes": pending.get(name, 0),
+            "Last Sync": synced, "Age (s)": round((now - synced).total_seconds()) if synced else None
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,267 @@
+"""Packed attendance: one row per employee-month instead of one per day.
+
+Each `attendance_months` row holds four 31-bit masks (present, half day,
+leave, absent; bit d-1 is day d) and the hours worked per day as 31
+bytes in tenths of an hour. A month for thousands of workers is one
+indexed fetch, and days present, daily headcount and absence streaks are
+numpy bit operations over the masks instead of scans of the daily rows.
+
+The store is derived from `attendance` and kept current by
+`refresh_attendance_store()`: new rows are found by id watermark (this
+covers ORM, CSV and API bulk inserts alike), and edits and deletes come
+from the outbox change feed. Each dirty employee-month is repacked from
+its source rows, so replaying a change is harmless.
+"""
+import calendar
+from datetime import date
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, delete, func, or_, and_
+from database.models import Attendance, AttendanceMonth, Employee, SyncWatermark
+from utils.outbox import read_batch, acknowledge, backlog, latest_event_id
+from utils.watermarks import get_watermark, claim_watermark
+from utils.time_utils import get_ist
+
+CONSUMER = "attendance_bitmap"
+ROWS_WATERMARK = "attendance_bitmap:rows"
+# Beyond this many unread attendance events a full repack is cheaper than replaying them
+MAX_REPLAY = 5000
+ID_BATCH = 500
+MAX_DAYS = 31
+STATUS_MASKS = {"Present": ("present_bits",), "Half Day": ("present_bits", "half_day_bits"),
+                "Leave": ("leave_bits",), "Absent": ("absent_bits",)}
+MASKS = ["present_bits", "half_day_bits", "leave_bits", "absent_bits"]
+# Paid per day present rather than a monthly salary prorated by attendance
+DAILY_RATE_TYPES = {"Daily Wage", "Labour"}
+
+def month_bounds(month):
+    """First and last date of a 'YYYY-MM' month."""
+    year, mon = int(month[:4]), int(month[5:7])
+    return date(year, mon, 1), date(year, mon, calendar.monthrange(year, mon)[1])
+
+def _chunks(values, size=ID_BATCH):
+    values = sorted(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _bit_matrix(bits, days):
+    """(employees x days) booleans from a vector of day masks."""
+    return ((bits[:, None] >> np.arange(days, dtype=np.int64)) & 1).astype(bool)
+
+def _popcount(bits):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).astype(int)
+    return _bit_matrix(bits, MAX_DAYS).sum(axis=1)
+
+def pack_attendance(df):
+    """Store rows for a frame of attendance (id, employee_id, date, status, hours_worked).
+
+    When a day was logged more than once the latest row wins.
+    """
+    if df.empty:
+        return []
+    df = df.sort_values("id").drop_duplicates(["employee_id", "date"], keep="last")
+    dates = pd.to_datetime(df["date"])
+    keys = pd.DataFrame({"employee_id": df["employee_id"].astype(int).to_numpy(),
+                         "month": dates.dt.strftime("%Y-%m").to_numpy()})
+    codes = keys.groupby(["employee_id", "month"], sort=False).ngroup().to_numpy()
+    groups = keys.drop_duplicates().reset_index(drop=True)
+    day = dates.dt.day.to_numpy() - 1
+    bit = np.left_shift(np.int64(1), day.astype(np.int64))
+    status = df["status"].fillna("").to_numpy()
+
+    masks = {name: np.zeros(len(groups), dtype=np.int64) for name in MASKS}
+    for value, names in STATUS_MASKS.items():
+        hit = status == value
+        for name in names:
+            np.bitwise_or.at(masks[name], codes[hit], bit[hit])
+    hours = np.zeros((len(groups), MAX_DAYS), dtype=np.uint8)
+    worked = (status == "Present") | (status == "Half Day")
+    tenths = np.clip(np.round(df["hours_worked"].fillna(0).to_numpy(dtype=float) * 10), 0, 255)
+    hours[codes[worked], day[worked]] = tenths[worked]
+
+    now = get_ist()
+    return [{"employee_id": int(e), "month": m, "hours": hours[i].tobytes(), "updated_at": now,
+             **{name: int(masks[name][i]) for name in MASKS}}
+            for i, (e, m) in enumerate(zip(groups["employee_id"], groups["month"]))]
+
+def _read_attendance(conn, *where):
+    return pd.read_sql(select(Attendance.id, Attendance.employee_id, Attendance.date, Attendance.status,
+                              Attendance.hours_worked)
+                       .where(Attendance.employee_id.isnot(None), Attendance.date.isnot(None), *where), conn)
+
+def _scopes(keys, employees, full):
+    """(attendance filter, store filter) pairs that together cover the dirty rows."""
+    if full:
+        yield (), ()
+        return
+    for ids in _chunks(employees):
+        yield (Attendance.employee_id.in_(ids),), (AttendanceMonth.employee_id.in_(ids),)
+    by_month = {}
+    for emp, month in keys:
+        if emp not in employees:
+            by_month.setdefault(month, set()).add(emp)
+    for month, emps in by_month.items():
+        first, last = month_bounds(month)
+        for ids in _chunks(emps):
+            yield ((Attendance.employee_id.in_(ids), Attendance.date.between(first, last)),
+                   (AttendanceMonth.employee_id.in_(ids), AttendanceMonth.month == month))
+
+def _repack(db, keys=(), employees=(), full=False):
+    """Rebuild the store rows for (employee_id, month) keys, whole employees, or everything."""
+    conn = db.connection()
+    packed = 0
+    for source, target in _scopes(set(keys), set(employees), full):
+        db.execute(delete(AttendanceMonth).where(*target))
+        rows = pack_attendance(_read_attendance(conn, *source))
+        if rows:
+            db.execute(insert(AttendanceMonth), rows)
+        packed += len(rows)
+    return packed
+
+def _dirty_from_events(db, events):
+    """(keys, employees, full) touched by attendance update/delete events."""
+    keys, employees, full = set(), set(), False
+    ids = [e["row_id"] for e in events if e["row_id"] is not None]
+    current = {}
+    for batch in _chunks(ids):
+        current.update({r.id: r for r in db.execute(select(Attendance.id, Attendance.employee_id, Attendance.date)
+                                                    .where(Attendance.id.in_(batch)))})
+    for e in events:
+        if e["row_id"] is None:
+            # Bulk statement: inserts are picked up by id, anything else touched unknown rows
+            full = full or e["op"] != "insert"
+            continue
+        row, changes = current.get(e["row_id"]), e["changes"]
+        if row is not None and row.employee_id is not None and row.date is not None:
+            keys.add((row.employee_id, row.date.strftime("%Y-%m")))
+        if e["op"] == "delete":
+            if changes.get("employee_id") is not None and changes.get("date"):
+                keys.add((changes["employee_id"], changes["date"][:7]))
+            else:
+                full = True
+        elif e["op"] == "update" and "employee_id" in changes:
+            full = True # The previous owner of the row is unknown
+        elif e["op"] == "update" and "date" in changes and row is not None and row.employee_id is not None:
+            employees.add(row.employee_id) # The previous month is unknown
+    return keys, employees, full
+
+def refresh_attendance_store(db, full=False):
+    """Bring the packed store up to date with `attendance` (commits).
+
+    New rows since the id watermark and the employee-months named by
+    unread change events are repacked in one transaction with the
+    watermark and outbox cursor moves. The first run, a large backlog or
+    a bulk update/delete repacks everything.
+
+    The row watermark is claimed with compare-and-set before any store
+    rows are touched. That row lock serializes concurrent refreshes, and a
+    run that loses the race to a newer one returns without writing.
+    """
+    mark = get_watermark(db, ROWS_WATERMARK)
+    seen = mark.last_id or 0
+    full = full or not mark.last_run or sum(backlog(db, CONSUMER, ["attendance"]).values()) > MAX_REPLAY
+    if full:
+        events, upto = [], latest_event_id(db)
+    else:
+        events, upto = read_batch(db, CONSUMER, ["attendance"], limit=MAX_REPLAY)
+    keys, employees, replay_full = _dirty_from_events(db, events)
+    full = full or replay_full
+
+    top = db.execute(select(func.max(Attendance.id))).scalar() or 0
+    new_rows = [] if full else db.execute(select(Attendance.employee_id, Attendance.date).where(
+        Attendance.id > seen, Attendance.id <= top,
+        Attendance.employee_id.isnot(None), Attendance.date.isnot(None)).distinct()).all()
+    keys.update((emp, day.strftime("%Y-%m")) for emp, day in new_rows)
+
+    if not claim_watermark(db, ROWS_WATERMARK, seen, max(top, seen), len(new_rows)):
+        db.rollback()
+        return {"packed": 0, "events": 0, "new_days": 0, "full": False, "skipped": True}
+    packed = _repack(db, keys, employees, full) if (full or keys or employees) else 0
+    acknowledge(db, CONSUMER, upto, len(events))
+    db.commit()
+    return {"packed": packed, "events": len(events), "new_days": len(new_rows), "full": full}
+
+def last_refreshed(db):
+    """When the packed store was last brought up to date, or None."""
+    return db.execute(select(SyncWatermark.last_run).where(SyncWatermark.name == ROWS_WATERMARK)).scalar()
+
+class MonthAttendance:
+    """One month of packed attendance for a set of employees, with vectorized queries."""
+
+    def __init__(self, month, frame):
+        self.month = month
+        self.days = month_bounds(month)[1].day
+        self.employees = frame[["employee_id", "name", "role", "salary", "contract_type"]].reset_index(drop=True)
+        for name in MASKS:
+            setattr(self, name.replace("_bits", ""), frame[name].fillna(0).to_numpy(dtype=np.int64))
+        blank = bytes(MAX_DAYS)
+        packed = b"".join(h if isinstance(h, bytes) and len(h) == MAX_DAYS else blank for h in frame["hours"])
+        self.hours = np.frombuffer(packed, dtype=np.uint8).reshape(len(frame), MAX_DAYS)[:, :self.days] / 10
+
+    def __len__(self):
+        return len(self.employees)
+
+    def days_present(self):
+        return _popcount(self.present)
+
+    def recorded_days(self):
+        """Days with any attendance mark (unmarked days are holidays or not yet logged)."""
+        return _popcount(self.present | self.leave | self.absent)
+
+    def payable_days(self):
+        """Present days counting half days as half, plus leave days."""
+        return self.days_present() - 0.5 * _popcount(self.half_day) + _popcount(self.leave)
+
+    def daily_headcount(self):
+        """Workers present on each day of the month."""
+        return _bit_matrix(self.present, self.days).sum(axis=0)
+
+    def longest_absence(self):
+        """Longest run of consecutive recorded absent days per employee."""
+        runs, bits = np.zeros(len(self), dtype=int), self.absent.copy()
+        while bits.any():
+            runs += bits != 0
+            bits &= bits >> 1
+        return runs
+
+    def matrix(self):
+        """Employees x days grid of P / ½ / L / A with monthly totals."""
+        grid = np.full((len(self), self.days), "", dtype=object)
+        for code, bits in (("A", self.absent), ("L", self.leave), ("P", self.present), ("½", self.half_day)):
+            grid[_bit_matrix(bits, self.days)] = code
+        df = pd.DataFrame(grid, columns=[str(d) for d in range(1, self.days + 1)])
+        df.insert(0, "Employee", self.employees["name"])
+        df["Present"] = self.days_present()
+        df["Hours"] = self.hours.sum(axis=1).round(1)
+        df["Longest Absence"] = self.longest_absence()
+        return df
+
+def load_month(db, month, active_only=True):
+    """Packed attendance for `month` with employee details, in one query.
+
+    Employees with nothing logged that month come back with empty masks.
+    Inactive employees are included only if they have attendance.
+    """
+    stmt = select(Employee.id.label("employee_id"), Employee.name, Employee.role, Employee.salary,
+                  Employee.contract_type, *[getattr(AttendanceMonth, n) for n in MASKS], AttendanceMonth.hours)\
+        .outerjoin(AttendanceMonth, and_(AttendanceMonth.employee_id == Employee.id, AttendanceMonth.month == month))
+    if active_only:
+        stmt = stmt.where(or_(Employee.is_active == True, AttendanceMonth.id.isnot(None)))
+    rows = db.execute(stmt.order_by(Employee.name, Employee.id)).all()
+    columns = ["employee_id", "name", "role", "salary", "contract_type"] + MASKS + ["hours"]
+    return MonthAttendance(month, pd.DataFrame(rows, columns=columns))
+
+def prorated_salary(salary, contract_type, payable_days, recorded_days):
+    """Gross pay for a month of attendance.
+
+    Daily-rate workers earn their rate per payable day. Monthly salaries
+    are scaled by the share of marked days that were payable; staff with
+    no attendance logged for the month are paid in full.
+    """
+    salary = salary or 0.0
+    if contract_type in DAILY_RATE_TYPES:
+        return salary * payable_days
+    if not recorded_days:
+        return salary
+    return salary * payable_days / recorded_days
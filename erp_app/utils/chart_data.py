@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+
+# Roughly the plot width of a full-width chart; more points than this are invisible
+DEFAULT_BUDGET = 800
+
+def _as_float(values):
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values) or values.dtype == object:
+        values = pd.to_datetime(values)
+        return values.astype("int64").to_numpy(dtype=float)
+    return values.to_numpy(dtype=float)
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of the points worth drawing."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x, y = _as_float(x), np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:nxt_hi].mean(), y[hi:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def minmax_buckets(x, y, buckets):
+    """Keep the min and max point of each equal-width x bucket (good for bars/spikes)."""
+    n = len(x)
+    if buckets * 2 >= n:
+        return np.arange(n)
+    xf = _as_float(x)
+    span = (xf[-1] - xf[0]) or 1.0
+    bucket = np.minimum(((xf - xf[0]) / span * buckets).astype(int), buckets - 1)
+    s = pd.Series(np.asarray(y, dtype=float))
+    grouped = s.groupby(bucket)
+    return np.unique(np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy()]))
+
+def downsample_frame(df, x, y, budget=DEFAULT_BUDGET, method="lttb"):
+    """Rows of an x-sorted frame reduced to the pixel budget, chosen on column `y`."""
+    if len(df) <= budget:
+        return df
+    df = df.reset_index(drop=True)
+    if method == "minmax":
+        idx = minmax_buckets(df[x], df[y], budget // 2)
+    else:
+        idx = lttb(df[x], df[y], budget)
+    return df.iloc[idx]
+
+def daily_series(db, date_col, value_col, start=None, end=None, filters=(), budget=DEFAULT_BUDGET, cumulative=False):
+    """Daily SUM of a column aggregated in SQL over a window, then downsampled.
+
+    Returns (frame, raw_points). Narrowing start/end re-queries only that
+    window, so zooming in brings back full daily resolution. With
+    `cumulative`, the running total starts from the balance before `start`.
+    """
+    stmt = select(date_col.label("Date"), func.sum(value_col).label("Value")).where(*filters)
+    if start:
+        stmt = stmt.where(date_col >= start)
+    if end:
+        stmt = stmt.where(date_col <= end)
+    # Executed through the session so tenant criteria apply
+    rows = db.execute(stmt.group_by(date_col).order_by(date_col)).all()
+    df = pd.DataFrame(rows, columns=["Date", "Value"])
+    df["Date"] = pd.to_datetime(df["Date"])
+    if cumulative:
+        opening = 0
+        if start:
+            opening = db.execute(select(func.sum(value_col)).where(*filters, date_col < start)).scalar() or 0
+        df["Value"] = df["Value"].cumsum() + opening
+    return downsample_frame(df, "Date", "Value", budget), len(df)
+
+def date_bounds(db, date_col, filters=()):
+    """Min/max of a date column, for sizing the zoom control."""
+    return db.execute(select(func.min(date_col), func.max(date_col)).where(*filters)).one()
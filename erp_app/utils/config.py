@@ -0,0 +1,118 @@
+import threading
+import time
+from types import MappingProxyType
+from sqlalchemy import select, update
+from database.db_manager import SessionLocal
+from database.models import SystemSetting, SyncWatermark
+from utils.watermarks import get_watermark
+
+# The version lives in a sync_watermarks row: last_id is bumped on every write
+VERSION_KEY = "config:system_settings"
+CATEGORIES = ["General", "Finance", "Security", "Notifications"]
+CHECK_INTERVAL = 2.0 # seconds between version probes per process
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+class ConfigSnapshot:
+    """Immutable view of every SystemSetting at one version."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.values = MappingProxyType({key: value for _, key, value in rows})
+        by_category = {}
+        for category, key, value in rows:
+            by_category.setdefault(category or "General", {})[key] = value
+        self.categories = MappingProxyType({c: MappingProxyType(v) for c, v in by_category.items()})
+
+    def get(self, key, default=None):
+        value = self.values.get(key)
+        return default if value is None or value == "" else value
+
+_snapshot = ConfigSnapshot(-1, [])
+_checked_at = 0.0
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0} # misses = settings table reloads
+
+def _read_version(db):
+    return db.execute(select(SyncWatermark.last_id).where(SyncWatermark.name == VERSION_KEY)).scalar() or 0
+
+def current_config():
+    """The latest snapshot, reloading only when the stored version changed.
+
+    Within CHECK_INTERVAL the cached snapshot is returned without touching
+    the database; after that a single-row version probe decides whether
+    the settings table needs to be read again.
+    """
+    global _snapshot, _checked_at
+    if time.monotonic() - _checked_at < CHECK_INTERVAL:
+        _stats["hits"] += 1
+        return _snapshot
+    with _lock:
+        if time.monotonic() - _checked_at < CHECK_INTERVAL:
+            return _snapshot
+        db = SessionLocal.session_factory()
+        try:
+            version = _read_version(db)
+            if version != _snapshot.version:
+                _stats["misses"] += 1
+                rows = db.execute(select(SystemSetting.category, SystemSetting.key, SystemSetting.value)).all()
+                _snapshot = ConfigSnapshot(version, [tuple(r) for r in rows])
+            else:
+                _stats["hits"] += 1
+        except Exception as e:
+            print(f"Config reload failed, keeping version {_snapshot.version}: {e}")
+        finally:
+            db.close()
+        _checked_at = time.monotonic()
+    return _snapshot
+
+def cache_stats():
+    """Snapshot reuse since start: hits served the cached snapshot, misses reloaded it."""
+    return dict(_stats)
+
+def invalidate():
+    """Force the next read to probe the version (e.g. after a local write)."""
+    global _checked_at
+    _checked_at = 0.0
+
+def save_setting(db, key, value, category="General", description=None):
+    """Create or update a setting and bump the config version (commits)."""
+    setting = db.query(SystemSetting).filter(SystemSetting.key == key).first()
+    if not setting:
+        setting = SystemSetting(key=key)
+        db.add(setting)
+    setting.value = "" if value is None else str(value)
+    setting.category = category
+    if description is not None:
+        setting.description = description
+    get_watermark(db, VERSION_KEY)
+    db.execute(update(SyncWatermark).where(SyncWatermark.name == VERSION_KEY)
+               .values(last_id=SyncWatermark.last_id + 1))
+    db.commit()
+    invalidate()
+    return setting
+
+# --- Typed accessors ---
+def get_str(key, default=None):
+    return current_config().get(key, default)
+
+def get_int(key, default=None):
+    try:
+        return int(float(current_config().get(key)))
+    except (TypeError, ValueError):
+        return default
+
+def get_float(key, default=None):
+    try:
+        return float(current_config().get(key))
+    except (TypeError, ValueError):
+        return default
+
+def get_bool(key, default=False):
+    value = current_config().get(key)
+    if value is None:
+        return default
+    return str(value).strip().lower() in TRUE_VALUES
+
+def category(name):
+    """Read-only key/value mapping for one settings category."""
+    return current_config().categories.get(name, MappingProxyType({}))
@@ -0,0 +1,46 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from database.db_manager import ReadSessionLocal
+
+MAX_WORKERS = int(os.getenv("DASHBOARD_QUERY_WORKERS", "6"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dashboard-query")
+    return _executor
+
+def _run(fn, session_factory):
+    db = session_factory()
+    started = time.perf_counter()
+    try:
+        return fn(db), (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+
+def load_parallel(queries, session_factory=None):
+    """Run independent `name -> fn(db)` queries concurrently and collect the results.
+
+    Each query gets its own session (and so its own pooled connection) on
+    a shared thread pool, so the wait is bounded by the slowest query
+    rather than the sum. Every task runs in a copy of the caller's context,
+    which carries the tenant scope and performance attribution along.
+    Results must be plain values or fully loaded objects: the session is
+    closed once the query function returns. Returns (results, timings_ms).
+    """
+    session_factory = session_factory or ReadSessionLocal.session_factory
+    if len(queries) <= 1 or MAX_WORKERS <= 1:
+        done = {name: _run(fn, session_factory) for name, fn in queries.items()}
+    else:
+        executor = _get_executor()
+        futures = {name: executor.submit(copy_context().run, _run, fn, session_factory) for name, fn in queries.items()}
+        done = {name: f.result() for name, f in futures.items()}
+    return {name: r[0] for name, r in done.items()}, {name: r[1] for name, r in done.items()}
@@ -0,0 +1,195 @@
+import hashlib
+import mimetypes
+import os
+import tempfile
+import time
+from sqlalchemy import func, select
+from database.models import DocumentAsset, Project
+
+CHUNK_SIZE = 1024 * 1024
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_ROOT = os.getenv("DOCUMENT_STORE_PATH", os.path.join(BASE_DIR, "document_store"))
+# Unreferenced blobs and temp files younger than this are left alone by the
+# sweep: an upload renames its blob into place before committing its row
+SWEEP_GRACE_SECONDS = 3600
+SWEEP_BATCH = 500
+
+def blob_path(digest, root=None):
+    """Blobs are sharded by the first two hash bytes: ab/cd/abcd..."""
+    return os.path.join(root or STORE_ROOT, digest[:2], digest[2:4], digest)
+
+def store_stream(stream, root=None):
+    """Copy a file-like object into the store chunk by chunk.
+
+    The content is hashed while it is written to a temp file beside the
+    blob directory; the temp file is then renamed onto its SHA-256 path,
+    even when that blob already exists. The rename is atomic and gives the
+    blob a fresh mtime, which keeps the orphan sweep off it until the
+    document row is committed. Returns (digest, size, deduplicated).
+    """
+    root = root or STORE_ROOT
+    tmp_dir = os.path.join(root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    sha, size = hashlib.sha256(), 0
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+        target = blob_path(digest, root)
+        deduplicated = os.path.exists(target)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp, target)
+        return digest, size, deduplicated
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def parse_range(header, size):
+    """Resolve an HTTP `Range: bytes=a-b` header to inclusive (start, end).
+
+    Returns None for a missing or multi-range header (serve the whole
+    file) and raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if start > end or start >= size:
+        raise ValueError(f"range {header} not satisfiable for {size} bytes")
+    return start, end
+
+def iter_range(digest, start=0, end=None, root=None):
+    """Yield the blob's bytes from `start` to `end` (inclusive) in chunks."""
+    with open(blob_path(digest, root), "rb") as f:
+        if end is None:
+            end = os.fstat(f.fileno()).st_size - 1
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def open_blob(digest, root=None):
+    return open(blob_path(digest, root), "rb")
+
+def save_document(db, stream, filename, title, category, project_id=None, mime_type=None):
+    """Store an upload and create its DocumentAsset row."""
+    digest, size, deduplicated = store_stream(stream)
+    doc = DocumentAsset(
+        title=title, category=category, project_id=project_id,
+        file_path=os.path.relpath(blob_path(digest), STORE_ROOT),
+        content_hash=digest, size_bytes=size, original_filename=filename,
+        mime_type=mime_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    )
+    db.add(doc)
+    db.commit()
+    return doc, deduplicated
+
+def delete_document(db, doc):
+    """Remove a document row; its blob is reclaimed by `sweep_orphan_blobs`.
+
+    Unlinking here could race an upload that deduplicates onto the same
+    hash between the reference check and the unlink.
+    """
+    db.delete(doc)
+    db.commit()
+
+def _referenced(db, digests):
+    return set(db.execute(select(DocumentAsset.content_hash).where(DocumentAsset.content_hash.in_(digests))).scalars())
+
+def sweep_orphan_blobs(db, root=None, grace_seconds=SWEEP_GRACE_SECONDS):
+    """Delete blobs no document references, plus abandoned temp files.
+
+    Only files older than the grace period are considered. Each candidate
+    is first renamed aside, so a concurrent upload that renames a fresh
+    copy into place is not lost. References are then checked again before
+    the file is unlinked. Returns counts and bytes freed.
+    """
+    root = root or STORE_ROOT
+    cutoff = time.time() - grace_seconds
+    removed = freed = temps = 0
+    tmp_dir = os.path.join(root, "tmp")
+    if os.path.isdir(tmp_dir):
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                temps += 1
+
+    candidates = []
+    for folder, dirs, files in os.walk(root):
+        if os.path.abspath(folder) == os.path.abspath(tmp_dir):
+            dirs[:] = []
+            continue
+        candidates.extend(name for name in files if len(name) == 64 and os.path.getmtime(os.path.join(folder, name)) < cutoff)
+
+    for i in range(0, len(candidates), SWEEP_BATCH):
+        batch = candidates[i:i + SWEEP_BATCH]
+        for digest in set(batch) - _referenced(db, batch):
+            path = blob_path(digest, root)
+            aside = f"{path}.sweep"
+            try:
+                os.replace(path, aside)
+            except FileNotFoundError:
+                continue
+            if os.path.getmtime(aside) >= cutoff or _referenced(db, [digest]):
+                # Re-uploaded meanwhile: put it back unless a fresh copy already landed
+                if os.path.exists(path):
+                    os.remove(aside)
+                else:
+                    os.replace(aside, path)
+                continue
+            freed += os.path.getsize(aside)
+            os.remove(aside)
+            removed += 1
+    return {"blobs": removed, "bytes": freed, "temp_files": temps}
+
+def project_storage(db):
+    """Per-project size index: files, logical bytes and bytes on disk.
+
+    Logical bytes count every document; stored bytes count each distinct
+    blob once within the project. Reads only the covering index.
+    """
+    blobs = select(
+        DocumentAsset.project_id, DocumentAsset.content_hash,
+        func.count().label("files"), func.sum(DocumentAsset.size_bytes).label("logical"),
+        func.max(DocumentAsset.size_bytes).label("stored")
+    ).where(DocumentAsset.content_hash.isnot(None)).group_by(DocumentAsset.project_id, DocumentAsset.content_hash).subquery()
+    rows = db.execute(select(
+        blobs.c.project_id, Project.name, func.sum(blobs.c.files), func.sum(blobs.c.logical), func.sum(blobs.c.stored)
+    ).outerjoin(Project, Project.id == blobs.c.project_id).group_by(blobs.c.project_id, Project.name)).all()
+    return [{"project_id": p_id, "project": name or "Global", "files": int(files),
+             "logical_bytes": int(logical or 0), "stored_bytes": int(stored or 0)}
+            for p_id, name, files, logical, stored in rows]
+
+def store_totals(db):
+    """Whole-store figures: documents, logical bytes and unique blob bytes."""
+    files, logical = db.execute(select(func.count(DocumentAsset.id), func.sum(DocumentAsset.size_bytes))
+                                .where(DocumentAsset.content_hash.isnot(None))).one()
+    per_blob = select(func.max(DocumentAsset.size_bytes).label("size"))\
+        .where(DocumentAsset.content_hash.isnot(None)).group_by(DocumentAsset.content_hash).subquery()
+    unique = db.execute(select(func.sum(per_blob.c.size))).scalar()
+    return {"files": files or 0, "logical_bytes": int(logical or 0), "stored_bytes": int(unique or 0)}
+
+def human_size(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
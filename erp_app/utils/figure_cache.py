@@ -0,0 +1,111 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+def _payload_size(value):
+    """Approximate byte size of a trace property value.
+
+    Numeric arrays count their nbytes; object arrays (hover names, labels)
+    are extrapolated from the first few elements.
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            flat = value.ravel()
+            sample = flat[:64]
+            return len(flat) * sum(_payload_size(v) for v in sample) // max(len(sample), 1)
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(len(k) + _payload_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(v) for v in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 8
+
+def figure_size(figure):
+    """Cheap size estimate of a figure from its trace data; layout is ignored.
+
+    Reads each trace's stored properties in place; `to_plotly_json` would
+    deep-copy every array just to be measured.
+    """
+    return sum(_payload_size(trace._props or {}) for trace in figure.data)
+
+class FigureCache:
+    """Process-wide LRU of built Plotly figures, bounded by count and estimated size.
+
+    Cached figures are shared between sessions and reruns, so callers must
+    treat them as read-only; any styling belongs inside the build function.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, figure):
+        size = figure_size(figure)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (figure, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries), "bytes": self._bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+figure_cache = FigureCache()
+
+def frame_fingerprint(df):
+    """Fast content hash of a DataFrame (values, index, column names and dtypes)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((list(df.columns), [str(t) for t in df.dtypes])).encode())
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def cached_figure(df, spec, build):
+    """Return `build(df)`, reusing the figure while the frame and spec are unchanged.
+
+    `spec` is any JSON-serialisable description of the chart (titles, axes,
+    options); the build function's source location is part of the key too.
+    """
+    code = build.__code__
+    key = (frame_fingerprint(df), json.dumps(spec, sort_keys=True, default=str), code.co_filename, code.co_firstlineno)
+    figure = figure_cache.get(key)
+    if figure is None:
+        figure = build(df)
+        figure_cache.put(key, figure)
+    return figure
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from sqlalchemy import select, insert, delete
+from database.models import AssetLog, FuelAnomaly
+from utils.watermarks import get_watermark, claim_watermark
+
+WATERMARK = "fuel_anomaly"
+
+def score_fuel_usage(logs, window=14, min_periods=5):
+    """Robust z-score of litres/hour against each asset's own recent history.
+
+    The baseline for a log is the rolling median of the previous `window`
+    logs of the same asset; the spread is the rolling median absolute
+    deviation of those logs. All assets are scored in one grouped pass.
+    """
+    logs = logs.sort_values(["asset_id", "date", "id"]).reset_index(drop=True)
+    logs["lph"] = logs["fuel_consumed"] / logs["hours_used"]
+
+    by_asset = logs.groupby("asset_id", sort=False)
+    prior = by_asset["lph"].shift(1)
+    logs["baseline"] = prior.groupby(logs["asset_id"]).rolling(window, min_periods=min_periods)\
+        .median().reset_index(level=0, drop=True)
+
+    deviation = (logs["lph"] - logs["baseline"]).abs()
+    prior_dev = deviation.groupby(logs["asset_id"]).shift(1)
+    mad = prior_dev.groupby(logs["asset_id"]).rolling(window, min_periods=min_periods)\
+        .median().reset_index(level=0, drop=True)
+    # Guard against perfectly steady assets where the MAD collapses to zero
+    mad = np.maximum(mad, 0.05 * logs["baseline"].abs())
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs["zscore"] = 0.6745 * (logs["lph"] - logs["baseline"]) / mad
+    return logs
+
+def detect_fuel_anomalies(db, window=14, threshold=3.5, lookback_days=60, full=False):
+    """Score logs newer than the watermark and persist the flagged ones.
+
+    History for the rolling baseline is read only for assets that have new
+    logs, limited to `lookback_days` before the oldest new log. `full=True`
+    rescans everything and replaces the open anomalies; reviewed ones are
+    kept. The watermark is claimed with compare-and-set before anything is
+    written, so a scan racing the hourly job backs off instead of
+    inserting the same anomalies twice.
+    """
+    seen = get_watermark(db, WATERMARK).last_id or 0
+    last_id = 0 if full else seen
+    conn = db.connection()
+
+    fresh = (AssetLog.id > last_id) & (AssetLog.hours_used > 0)
+    bounds = db.query(AssetLog.date).filter(fresh).order_by(AssetLog.date).first()
+    if not bounds:
+        if claim_watermark(db, WATERMARK, seen, seen, 0):
+            db.commit()
+        else:
+            db.rollback()
+        return {"scanned": 0, "flagged": 0}
+
+    touched_assets = select(AssetLog.asset_id).where(fresh).distinct()
+    logs = pd.read_sql(select(
+        AssetLog.id, AssetLog.asset_id, AssetLog.date, AssetLog.hours_used, AssetLog.fuel_consumed
+    ).where(
+        AssetLog.asset_id.in_(touched_assets),
+        AssetLog.hours_used > 0,
+        AssetLog.date >= bounds[0] - timedelta(days=lookback_days)
+    ), conn)
+
+    scored = score_fuel_usage(logs, window=window)
+    new = scored[scored["id"] > last_id]
+    flagged = new[new["zscore"].abs() > threshold]
+
+    if not claim_watermark(db, WATERMARK, seen, max(int(new["id"].max()), seen), len(new)):
+        db.rollback()
+        return {"scanned": 0, "flagged": 0, "skipped": True}
+    if full:
+        db.execute(delete(FuelAnomaly).where(FuelAnomaly.status == "Open"))
+    if not flagged.empty:
+        kept = set(db.execute(select(FuelAnomaly.log_id).where(
+            FuelAnomaly.log_id.in_([int(i) for i in flagged["id"]]))).scalars())
+        flagged = flagged[~flagged["id"].isin(kept)]
+    if not flagged.empty:
+        db.execute(insert(FuelAnomaly), [{
+            "log_id": int(r.id), "asset_id": int(r.asset_id), "date": r.date,
+            "litres_per_hour": float(r.lph), "baseline": float(r.baseline),
+            "zscore": float(r.zscore), "status": "Open"
+        } for r in flagged.itertuples()])
+    db.commit()
+    return {"scanned": len(new), "flagged": len(flagged)}
@@ -0,0 +1,272 @@
+import io
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, func
+from database.models import (
+    Vendor, Employee, InventoryItem, Client, FinanceRecord, TransactionType,
+    PurchaseOrder, Invoice, Project, Company, Branch, Attendance, ProductionLog
+)
+from utils.tenancy import TENANT_MODELS, current_tenant
+from utils.alerts import evaluate_rule
+
+DEFAULT_CHUNK = 10000
+TRUE_VALUES = {"1", "true", "yes", "y", "active"}
+FALSE_VALUES = {"0", "false", "no", "n", "inactive"}
+
+class Field:
+    """One importable column: type, required flag, max length or allowed values."""
+
+    def __init__(self, name, kind="str", required=False, length=None, choices=None, default=None):
+        self.name = name
+        self.kind = kind # str, int, float, date, bool, choice
+        self.required = required
+        self.length = length
+        self.choices = choices # {lowercase input: stored value}
+        self.default = default
+
+class Lookup:
+    """Resolve a name column to a foreign key id via the target's `name` column.
+
+    With by="id" the column already holds ids and is only checked to exist.
+    """
+
+    def __init__(self, column, model, target, required=False, by="name"):
+        self.column = column
+        self.model = model
+        self.target = target
+        self.required = required
+        self.by = by
+
+class ImportSpec:
+    def __init__(self, model, fields, lookups=(), alert_rules=()):
+        self.model = model
+        self.fields = fields
+        self.lookups = lookups
+        self.alert_rules = alert_rules
+
+    @property
+    def columns(self):
+        return [f.name for f in self.fields] + [l.column for l in self.lookups]
+
+IMPORT_SPECS = {
+    "Vendors": ImportSpec(Vendor, [
+        Field("name", required=True, length=100), Field("contact_person", length=100),
+        Field("phone", length=20), Field("email", length=100), Field("rating", "int", default=3),
+    ]),
+    "Employees": ImportSpec(Employee, [
+        Field("name", required=True, length=100), Field("role", length=50), Field("department", length=50),
+        Field("joining_date", "date"), Field("salary", "float", default=0.0),
+        Field("contract_type", "choice", choices={"permanent": "Permanent", "contract": "Contract"}),
+        Field("is_active", "bool", default=True),
+    ]),
+    "Inventory Items": ImportSpec(InventoryItem, [
+        Field("name", required=True, length=100), Field("category", length=50),
+        Field("current_stock", "int", default=0), Field("unit", length=20),
+        Field("min_stock_alert", "int", default=10), Field("location", length=100),
+    ], alert_rules=["low_stock"]),
+    "Clients": ImportSpec(Client, [
+        Field("name", required=True, length=100), Field("company", length=100), Field("email", length=100),
+        Field("phone", length=20), Field("address"),
+        Field("status", "choice", default="Lead", choices={"lead": "Lead", "active": "Active", "inactive": "Inactive"}),
+    ]),
+    "Finance Records": ImportSpec(FinanceRecord, [
+        Field("date", "date", required=True),
+        Field("type", "choice", required=True, choices={t.value.lower(): t for t in TransactionType}),
+        Field("category", length=100), Field("amount", "float", required=True),
+        Field("currency", length=10, default="INR"), Field("exchange_rate", "float", default=1.0),
+        Field("description", length=255), Field("payment_method", length=50),
+    ], lookups=[Lookup("company", Company, "company_id"), Lookup("branch", Branch, "branch_id")]),
+    "Purchase Orders": ImportSpec(PurchaseOrder, [
+        Field("order_date", "date"), Field("expected_delivery", "date"),
+        Field("total_amount", "float", default=0.0), Field("currency", length=10, default="INR"),
+        Field("status", "choice", default="Pending",
+              choices={"pending": "Pending", "approved": "Approved", "delivered": "Delivered"}),
+    ], lookups=[Lookup("vendor", Vendor, "vendor_id", required=True)]),
+    "Invoices": ImportSpec(Invoice, [
+        Field("invoice_number", required=True, length=50), Field("date_issued", "date"),
+        Field("due_date", "date"), Field("amount", "float", required=True),
+        Field("status", "choice", default="Unpaid",
+              choices={"unpaid": "Unpaid", "paid": "Paid", "partially paid": "Partially Paid"}),
+    ], lookups=[Lookup("project", Project, "project_id")], alert_rules=["invoice_overdue"]),
+    "Attendance": ImportSpec(Attendance, [
+        Field("date", "date", required=True),
+        Field("status", "choice", required=True,
+              choices={"present": "Present", "absent": "Absent", "half day": "Half Day", "leave": "Leave"}),
+        Field("hours_worked", "float", default=8.0),
+    ], lookups=[Lookup("employee_id", Employee, "employee_id", required=True, by="id")]),
+    "Production Logs": ImportSpec(ProductionLog, [
+        Field("date", "date", required=True), Field("quantity_produced", "float", required=True),
+        Field("efficiency", "float"), Field("waste_generated", "float", default=0.0), Field("notes"),
+    ], lookups=[Lookup("project_id", Project, "project_id", required=True, by="id")]),
+}
+
+def template_csv(spec):
+    return ",".join(spec.columns) + "\n"
+
+def _normalise_header(name):
+    return str(name).strip().lower().replace(" ", "_").replace("-", "_")
+
+def read_chunks(data, filename, chunksize=DEFAULT_CHUNK):
+    """Yield raw string DataFrames of at most `chunksize` rows.
+
+    CSV is streamed by pandas; XLSX is streamed row by row with openpyxl in
+    read-only mode, so neither loads the whole file into a frame at once.
+    """
+    if filename.lower().endswith(".csv"):
+        for chunk in pd.read_csv(io.BytesIO(data), chunksize=chunksize, dtype=str, skipinitialspace=True):
+            yield chunk.rename(columns=_normalise_header)
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    rows = wb.active.iter_rows(values_only=True)
+    header = [_normalise_header(h) for h in next(rows, [])]
+    buffer = []
+    for row in rows:
+        if any(v is not None and v != "" for v in row):
+            buffer.append(row)
+        if len(buffer) >= chunksize:
+            yield pd.DataFrame(buffer, columns=header[:len(buffer[0])]).astype(object)
+            buffer = []
+    if buffer:
+        yield pd.DataFrame(buffer, columns=header[:len(buffer[0])]).astype(object)
+    wb.close()
+
+def _blank(values):
+    return values.isna() | (values.astype(str).str.strip() == "")
+
+def parse_dates(values):
+    """Parse ISO dates as written and everything else day-first (01/03/2025 = 1 March).
+
+    pandas 3 applies dayfirst to ISO strings under format="mixed", which
+    reads 2025-03-01 as 3 January, so ISO is tried on its own first.
+    """
+    typed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    rest = typed.isna() & values.notna()
+    if rest.any():
+        typed[rest] = pd.to_datetime(values[rest], errors="coerce", format="mixed", dayfirst=True)
+    return typed
+
+def coerce_chunk(raw, spec):
+    """Vectorised type coercion. Returns (typed frame, error frame)."""
+    out = pd.DataFrame(index=raw.index)
+    errors = []
+
+    def fail(mask, column, message):
+        if mask.any():
+            errors.append(pd.DataFrame({
+                "row": raw.index[mask], "column": column,
+                "value": raw[column][mask].fillna("").astype(str).values if column in raw else "", "error": message
+            }))
+
+    for f in spec.fields:
+        values = raw[f.name] if f.name in raw else pd.Series(np.nan, index=raw.index, dtype=object)
+        blank = _blank(values)
+        if f.kind == "str":
+            typed = values.astype("string").str.strip()
+            if f.length:
+                fail(~blank & (typed.str.len() > f.length), f.name, f"longer than {f.length} characters")
+        elif f.kind in ("int", "float"):
+            typed = pd.to_numeric(values.astype(str).str.replace(",", "").str.strip().where(~blank), errors="coerce")
+            fail(~blank & typed.isna(), f.name, "not a number")
+            if f.kind == "int":
+                fail(typed.notna() & (typed % 1 != 0), f.name, "not a whole number")
+        elif f.kind == "date":
+            typed = parse_dates(values.where(~blank))
+            fail(~blank & typed.isna(), f.name, "not a date")
+            typed = typed.dt.date
+        elif f.kind == "bool":
+            lowered = values.astype(str).str.strip().str.lower()
+            typed = pd.Series(np.where(lowered.isin(TRUE_VALUES), True, np.where(lowered.isin(FALSE_VALUES), False, None)),
+                              index=raw.index, dtype=object)
+            fail(~blank & typed.isna(), f.name, "not yes/no")
+        else: # choice
+            typed = values.astype(str).str.strip().str.lower().map(f.choices)
+            fail(~blank & typed.isna(), f.name, f"must be one of: {', '.join(getattr(v, 'value', v) for v in dict.fromkeys(f.choices.values()))}")
+
+        if f.required:
+            fail(blank, f.name, "required")
+        elif f.default is not None:
+            typed = typed.astype(object).where(~blank, f.default)
+        out[f.name] = typed.astype(object).where(pd.notna(typed), None)
+
+    for l in spec.lookups:
+        values = raw[l.column] if l.column in raw else pd.Series(np.nan, index=raw.index, dtype=object)
+        out[l.column] = values.astype("string").str.strip().where(~_blank(values))
+        if l.required:
+            fail(_blank(values), l.column, "required")
+
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=["row", "column", "value", "error"])
+    return out, errors
+
+def resolve_lookups(db, typed, spec):
+    """Map name columns to ids with one IN query per lookup for the whole chunk."""
+    errors = []
+    for l in spec.lookups:
+        keys = typed[l.column]
+        if l.by == "id":
+            numbers = pd.to_numeric(keys, errors="coerce")
+            keys = numbers.where(numbers % 1 == 0).map(lambda v: None if pd.isna(v) else int(v), na_action="ignore")
+        names = keys.dropna().unique().tolist()
+        ids = {}
+        if names:
+            key_col = getattr(l.model, l.by)
+            ids = dict(db.execute(select(key_col, l.model.id).where(key_col.in_(names))).all())
+        resolved = keys.map(ids)
+        missing = typed[l.column].notna() & resolved.isna()
+        if missing.any():
+            errors.append(pd.DataFrame({
+                "row": typed.index[missing], "column": l.column,
+                "value": typed[l.column][missing].astype(str).values, "error": f"unknown {l.column}"
+            }))
+        typed = typed.drop(columns=[l.column])
+        typed[l.target] = resolved.astype(object).where(resolved.notna(), None)
+    return typed, errors
+
+def fill_tenant(frame, tenant):
+    """Default company/branch ids to the active tenant where the row has none."""
+    if not tenant:
+        return frame
+    frame = frame.copy()
+    for column, value in zip(("company_id", "branch_id"), tenant):
+        current = frame[column] if column in frame else pd.Series(None, index=frame.index, dtype=object)
+        if value:
+            frame[column] = current.where(current.notna(), value)
+    return frame
+
+def import_file(db, target, data, filename, chunksize=DEFAULT_CHUNK, dry_run=False, on_chunk=None):
+    """Validate and bulk insert an uploaded file chunk by chunk.
+
+    Valid rows of each chunk are inserted with one executemany and
+    committed; invalid rows are skipped and reported with their source
+    line number (header = line 1). `on_chunk(rows_seen)` is called after
+    each chunk for progress display.
+    """
+    spec = IMPORT_SPECS[target]
+    tenant = current_tenant() if spec.model in TENANT_MODELS else None
+    seen = inserted = 0
+    reports = []
+    # Alert rules only need to re-check rows added from here on
+    start_id = db.execute(select(func.max(spec.model.id))).scalar() or 0
+    for raw in read_chunks(data, filename, chunksize):
+        raw.index = pd.RangeIndex(seen + 2, seen + 2 + len(raw))
+        seen += len(raw)
+        typed, errors = coerce_chunk(raw, spec)
+        typed, lookup_errors = resolve_lookups(db, typed, spec)
+        errors = pd.concat([errors] + lookup_errors, ignore_index=True)
+        reports.append(errors)
+
+        valid = fill_tenant(typed[~typed.index.isin(errors["row"])], tenant)
+        if not valid.empty and not dry_run:
+            db.execute(insert(spec.model), valid.to_dict("records"))
+            db.commit()
+        inserted += len(valid)
+        if on_chunk:
+            on_chunk(seen)
+
+    if inserted and not dry_run:
+        for rule in spec.alert_rules:
+            evaluate_rule(db, rule, after_id=start_id)
+    report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=["row", "column", "value", "error"])
+    return {"rows": seen, "inserted": 0 if dry_run else inserted, "valid": inserted,
+            "rejected": report["row"].nunique(), "errors": report.sort_values(["row", "column"])}
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from database.models import JobSchedule
+from database.db_manager import write_replica_heartbeat
+from utils.jobs import job, save_schedule, prune_finished
+from utils.predictive_maintenance import run_predictive_maintenance
+from utils.fuel_anomaly import detect_fuel_anomalies
+from utils.production_metrics import refresh_rollups, rebuild_rollups
+from utils.alerts import sweep_due_alerts
+from utils.analytics_mirror import sync_mirror
+from utils.outbox import compact
+from utils.attendance_bitmap import refresh_attendance_store
+from utils.doc_store import sweep_orphan_blobs
+from utils.config import get_int, get_float
+
+@job("predictive_maintenance")
+def predictive_maintenance_job(db, progress, horizon_days=None, usage_window=None):
+    progress(0.05, "Forecasting service dates")
+    result = run_predictive_maintenance(
+        db,
+        horizon_days=horizon_days or get_int("MAINTENANCE_HORIZON_DAYS", 14),
+        usage_window=usage_window or get_int("USAGE_WINDOW_DAYS", 14)
+    )
+    return {k: v for k, v in result.items() if k != "forecast"}
+
+@job("fuel_anomaly_scan")
+def fuel_anomaly_job(db, progress, full=False):
+    progress(0.05, "Scoring new asset logs")
+    return detect_fuel_anomalies(db, threshold=get_float("FUEL_ANOMALY_THRESHOLD", 3.5), full=full)
+
+@job("production_rollups")
+def production_rollups_job(db, progress, full=False):
+    if full:
+        progress(0.05, "Rebuilding production rollups")
+        return rebuild_rollups(db)
+    progress(0.05, "Folding new production logs")
+    return refresh_rollups(db)
+
+@job("alert_sweep", max_attempts=2)
+def alert_sweep_job(db, progress, full=False):
+    progress(0.05, "Sweeping due dates")
+    return sweep_due_alerts(db, full=full)
+
+# The heartbeat is written every few seconds by start_replica_heartbeat();
+# this job only serves schedules created before that thread existed.
+@job("replica_heartbeat", max_attempts=1)
+def replica_heartbeat_job(db, progress):
+    write_replica_heartbeat()
+    return None
+
+# A full rebuild copies every table in one step without progress calls
+@job("analytics_mirror_sync", max_attempts=1, lease=timedelta(hours=3))
+def analytics_mirror_job(db, progress, full=False):
+    progress(0.05, "Rebuilding analytics mirror" if full else "Copying new rows to the analytics mirror")
+    return sync_mirror(db, full=full)
+
+@job("outbox_compaction", max_attempts=1)
+def outbox_compaction_job(db, progress):
+    progress(0.05, "Removing change events every consumer has read")
+    return {"removed": compact(db)}
+
+@job("attendance_bitmap_refresh", max_attempts=2, lease=timedelta(hours=2))
+def attendance_bitmap_job(db, progress, full=False):
+    progress(0.05, "Repacking attendance" if full else "Packing new and edited attendance")
+    return refresh_attendance_store(db, full=full)
+
+@job("document_blob_sweep", max_attempts=1)
+def document_blob_sweep_job(db, progress):
+    progress(0.05, "Removing unreferenced document blobs")
+    return sweep_orphan_blobs(db)
+
+@job("job_retention", max_attempts=1)
+def job_retention_job(db, progress, days=None):
+    progress(0.05, "Deleting old finished jobs")
+    return {"removed": prune_finished(db, days or get_int("JOB_RETENTION_DAYS", 14))}
+
+# name -> (job, cron[, payload])
+DEFAULT_SCHEDULES = {
+    "Nightly predictive maintenance": ("predictive_maintenance", "30 1 * * *"),
+    "Hourly fuel anomaly scan": ("fuel_anomaly_scan", "5 * * * *"),
+    "Production rollups": ("production_rollups", "*/15 * * * *"),
+    "Nightly production rollup rebuild": ("production_rollups", "15 2 * * *", {"full": True}),
+    "Daily alert sweep": ("alert_sweep", "10 0 * * *"),
+    "Analytics mirror sync": ("analytics_mirror_sync", "*/5 * * * *"),
+    "Nightly analytics mirror rebuild": ("analytics_mirror_sync", "45 2 * * *", {"full": True}),
+    "Hourly change feed compaction": ("outbox_compaction", "50 * * * *"),
+    "Attendance bitmap refresh": ("attendance_bitmap_refresh", "*/10 * * * *"),
+    "Nightly job history cleanup": ("job_retention", "20 3 * * *"),
+    "Nightly document blob sweep": ("document_blob_sweep", "40 3 * * *"),
+}
+
+def ensure_default_schedules(db):
+    """Create the built-in schedules on first start; edits made later are kept."""
+    existing = {name for (name,) in db.query(JobSchedule.name)}
+    for name, (job_name, cron, *payload) in DEFAULT_SCHEDULES.items():
+        if name not in existing:
+            save_schedule(db, name, job_name, cron, *payload)
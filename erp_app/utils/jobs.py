@@ -0,0 +1,326 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from sqlalchemy import select, update, delete
+from database.db_manager import SessionLocal, engine
+from database.models import Job, JobSchedule
+from utils.time_utils import get_ist
+
+JOBS = {}
+LEASE = timedelta(minutes=30)
+MAX_RETRY_DELAY = 3600
+PRUNE_CHUNK = 1000
+
+def _now():
+    # Job timestamps are stored naive (IST) so SQLite and Postgres compare alike
+    return get_ist().replace(tzinfo=None)
+
+def job(name, max_attempts=3, retry_delay=30, lease=LEASE):
+    """Register a function as a background job.
+
+    The function is called as `fn(db, progress, **payload)` on a worker
+    thread with its own session and should return something JSON
+    serialisable. `progress(fraction, note)` is best effort and uses its own
+    connection; on SQLite call it between commits, not in the middle of
+    uncommitted writes. Failures are retried with exponential backoff
+    starting at `retry_delay` seconds.
+
+    Each progress call renews the job's lease. A running job that goes
+    longer than `lease` without one is assumed dead and requeued, so jobs
+    with long silent steps need a longer lease.
+    """
+    def register(fn):
+        JOBS[name] = {"fn": fn, "max_attempts": max_attempts, "retry_delay": retry_delay, "lease": lease}
+        return fn
+    return register
+
+def enqueue(db, name, payload=None, run_at=None, priority=0, schedule_id=None):
+    """Queue a registered job and return the new row (commits)."""
+    spec = JOBS.get(name, {})
+    new_job = Job(
+        name=name, payload=json.dumps(payload or {}, default=str), status="Queued",
+        priority=priority, max_attempts=spec.get("max_attempts", 3),
+        run_at=run_at or _now(), schedule_id=schedule_id
+    )
+    db.add(new_job)
+    db.commit()
+    return new_job
+
+# --- Cron expressions (minute hour day month weekday) ---
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+def _parse_field(text, lo, hi):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = end = int(part)
+            if step > 1:
+                end = hi
+        if start < lo or end > hi or start > end or step < 1:
+            raise ValueError(f"Cron field '{text}' is outside {lo}-{hi}")
+        values.update(range(start, end + 1, step))
+    return values
+
+def parse_cron(expr):
+    """Parse a 5-field cron expression into sets of allowed values."""
+    parts = (expr or "").split()
+    if len(parts) != 5:
+        raise ValueError("Cron needs 5 fields: minute hour day month weekday")
+    fields = [_parse_field(p, lo, hi) for p, (lo, hi) in zip(parts, CRON_FIELDS)]
+    return fields, parts[2] == "*", parts[4] == "*"
+
+def cron_next(expr, after):
+    """First run time strictly after `after` (weekday 0 = Sunday, as in cron)."""
+    (minutes, hours, days, months, weekdays), any_day, any_weekday = parse_cron(expr)
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = t + timedelta(days=366 * 5)
+    while t < limit:
+        if t.month not in months:
+            t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            continue
+        dom_ok, dow_ok = t.day in days, (t.weekday() + 1) % 7 in weekdays
+        # Like cron: when both day fields are restricted either may match
+        day_ok = dom_ok or dow_ok if not (any_day or any_weekday) else dom_ok and dow_ok
+        if not day_ok:
+            t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if t.hour not in hours:
+            t = t.replace(minute=0) + timedelta(hours=1)
+            continue
+        if t.minute not in minutes:
+            t += timedelta(minutes=1)
+            continue
+        return t
+    raise ValueError(f"Cron '{expr}' never fires")
+
+# --- Claiming & execution ---
+def claim_next(db, worker_id):
+    """Atomically take the next due job, or None.
+
+    Postgres uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers
+    never wait on each other. SQLite has no row locks; there a job is
+    claimed by a conditional UPDATE that only one worker can win.
+    """
+    now = _now()
+    claim = dict(status="Running", locked_by=worker_id, locked_at=now, started_at=now,
+                 attempts=Job.attempts + 1, progress=0.0, progress_note=None)
+    ready = select(Job).where(Job.status == "Queued", Job.run_at <= now)\
+        .order_by(Job.priority, Job.run_at, Job.id).limit(1)
+
+    if db.get_bind().dialect.name == "postgresql":
+        picked = db.execute(ready.with_for_update(skip_locked=True)).scalar_one_or_none()
+        if picked is None:
+            db.commit()
+            return None
+        db.execute(update(Job).where(Job.id == picked.id).values(**claim))
+        db.commit()
+        return db.get(Job, picked.id)
+
+    candidates = db.execute(select(Job.id).where(Job.status == "Queued", Job.run_at <= now)
+                            .order_by(Job.priority, Job.run_at, Job.id).limit(5)).scalars().all()
+    for job_id in candidates:
+        won = db.execute(update(Job).where(Job.id == job_id, Job.status == "Queued").values(**claim))
+        if won.rowcount == 1:
+            db.commit()
+            return db.get(Job, job_id)
+    db.commit()
+    return None
+
+def set_progress(job_id, fraction, note=""):
+    """Record progress and renew the job's lease (best effort)."""
+    try:
+        with engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id == job_id).values(
+                progress=max(0.0, min(1.0, float(fraction))), progress_note=(note or "")[:255], locked_at=_now()
+            ))
+    except Exception as e:
+        print(f"Job {job_id} progress update skipped: {e}")
+
+def execute_job(db, job_id):
+    """Run a claimed job and record success, retry or failure."""
+    current = db.get(Job, job_id)
+    spec = JOBS.get(current.name)
+    payload = json.loads(current.payload or "{}")
+    started = time.perf_counter()
+    try:
+        if spec is None:
+            raise LookupError(f"No job registered as '{current.name}'")
+        result = spec["fn"](db, lambda fraction, note="": set_progress(job_id, fraction, note), **payload)
+        db.commit()
+        db.execute(update(Job).where(Job.id == job_id).values(
+            status="Succeeded", finished_at=_now(), progress=1.0, error=None,
+            duration_ms=(time.perf_counter() - started) * 1000,
+            result=json.dumps(result, default=str) if result is not None else None
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        current = db.get(Job, job_id)
+        elapsed = (time.perf_counter() - started) * 1000
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        if spec is not None and current.attempts < current.max_attempts:
+            delay = min(spec["retry_delay"] * 2 ** (current.attempts - 1), MAX_RETRY_DELAY)
+            values = dict(status="Queued", run_at=_now() + timedelta(seconds=delay), locked_by=None)
+        else:
+            values = dict(status="Failed", finished_at=_now())
+        db.execute(update(Job).where(Job.id == job_id).values(error=error, duration_ms=elapsed, **values))
+        db.commit()
+
+def retry_job(db, job_id):
+    """Put a failed job back on the queue with a fresh set of attempts."""
+    db.execute(update(Job).where(Job.id == job_id, Job.status == "Failed").values(
+        status="Queued", attempts=0, run_at=_now(), locked_by=None, finished_at=None
+    ))
+    db.commit()
+
+def requeue_stale(db):
+    """Return jobs whose worker stopped renewing its lease to the queue."""
+    now = _now()
+    custom = {n: spec["lease"] for n, spec in JOBS.items() if spec["lease"] != LEASE}
+    db.execute(update(Job).where(Job.status == "Running", Job.name.not_in(custom), Job.locked_at < now - LEASE)
+               .values(status="Queued", locked_by=None))
+    for lease in set(custom.values()):
+        names = [n for n, value in custom.items() if value == lease]
+        db.execute(update(Job).where(Job.status == "Running", Job.name.in_(names), Job.locked_at < now - lease)
+                   .values(status="Queued", locked_by=None))
+    db.commit()
+
+def prune_finished(db, days):
+    """Delete succeeded and failed jobs that finished more than `days` ago (commits).
+
+    Runs in chunks so a large backlog does not hold the write lock for long.
+    """
+    cutoff = _now() - timedelta(days=days)
+    removed = 0
+    while True:
+        ids = db.execute(select(Job.id).where(Job.status.in_(["Succeeded", "Failed"]), Job.finished_at < cutoff)
+                         .order_by(Job.id).limit(PRUNE_CHUNK)).scalars().all()
+        if not ids:
+            return removed
+        removed += db.execute(delete(Job).where(Job.id.in_(ids))).rowcount
+        db.commit()
+
+def enqueue_due_schedules(db):
+    """Queue one job per schedule whose next run has passed.
+
+    The schedule's next_run is advanced with compare-and-set, so with
+    several app processes only one of them enqueues each occurrence. A
+    schedule whose previous job is still pending is skipped for that slot.
+    """
+    now = _now()
+    due = db.query(JobSchedule).filter(JobSchedule.is_active == True, JobSchedule.next_run <= now).all()
+    for s in due:
+        try:
+            nxt = cron_next(s.cron, now)
+        except ValueError as e:
+            print(f"Schedule '{s.name}' disabled: {e}")
+            s.is_active = False
+            continue
+        moved = db.query(JobSchedule).filter(JobSchedule.id == s.id, JobSchedule.next_run == s.next_run)\
+            .update({JobSchedule.next_run: nxt, JobSchedule.last_run: now}, synchronize_session=False)
+        pending = db.query(Job.id).filter(Job.schedule_id == s.id, Job.status.in_(["Queued", "Running"])).first()
+        if moved and not pending:
+            db.add(Job(name=s.job_name, payload=s.payload or "{}", status="Queued", run_at=now,
+                       max_attempts=JOBS.get(s.job_name, {}).get("max_attempts", 3), schedule_id=s.id))
+    db.commit()
+
+def save_schedule(db, name, job_name, cron, payload=None, is_active=True):
+    """Create or update a named schedule; raises ValueError on a bad cron."""
+    nxt = cron_next(cron, _now())
+    s = db.query(JobSchedule).filter(JobSchedule.name == name).first()
+    if not s:
+        s = JobSchedule(name=name)
+        db.add(s)
+    s.job_name, s.cron, s.is_active, s.next_run = job_name, cron, is_active, nxt
+    s.payload = json.dumps(payload or {}, default=str)
+    db.commit()
+    return s
+
+class WorkerPool:
+    """Dispatcher thread feeding claimed jobs to a thread pool.
+
+    Jobs here are database and pandas bound, so threads (not processes)
+    share the engine's connection pool and the registered event hooks.
+    """
+
+    def __init__(self, workers=2, poll_interval=2.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="erp-job")
+        self._active = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="erp-job-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Job dispatcher error: {e}")
+            finally:
+                SessionLocal.remove()
+            self._stop.wait(self.poll_interval)
+
+    def tick(self):
+        db = SessionLocal()
+        enqueue_due_schedules(db)
+        requeue_stale(db)
+        self._active = {f for f in self._active if not f.done()}
+        while len(self._active) < self.workers:
+            claimed = claim_next(db, self.worker_id)
+            if claimed is None:
+                break
+            self._active.add(self._executor.submit(self._run, claimed.id))
+
+    def _run(self, job_id):
+        try:
+            execute_job(SessionLocal(), job_id)
+        except Exception as e:
+            print(f"Job {job_id} crashed: {e}")
+        finally:
+            SessionLocal.remove()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def start_workers():
+    """Start the process-wide worker pool once (JOB_WORKERS=0 disables it)."""
+    global _pool
+    from utils.job_tasks import ensure_default_schedules
+    workers = int(os.getenv("JOB_WORKERS", "2"))
+    with _pool_lock:
+        if _pool is None and workers > 0:
+            db = SessionLocal.session_factory()
+            try:
+                ensure_default_schedules(db)
+            finally:
+                db.close()
+            _pool = WorkerPool(workers=workers).start()
+    return _pool
+
+# Built-in jobs register themselves on import
+import utils.job_tasks  # noqa: E402, F401
@@ -0,0 +1,327 @@
+"""OpenMetrics exporter for runtime and business throughput counters.
+
+A ThreadingHTTPServer started next to Streamlit serves GET /metrics on
+METRICS_HOST:METRICS_PORT (default 127.0.0.1:9464; METRICS_PORT=0 turns it
+off). Every label is drawn from a fixed or capped set so a scrape never
+grows with data volume.
+
+Self-check from the erp_app directory:  python -m utils.metrics
+"""
+import bisect
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+from sqlalchemy.sql.dml import Insert, Update, Delete
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+SQL_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RERUN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+MAX_LABEL_VALUES = 50 # per label; later values collapse into "other"
+
+class LabelSet:
+    """Caps the distinct values one label may take."""
+
+    def __init__(self, allowed=None, limit=MAX_LABEL_VALUES):
+        self.allowed = set(allowed) if allowed is not None else None
+        self.limit = limit
+        self.seen = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        value = str(value)
+        if self.allowed is not None:
+            return value if value in self.allowed else "other"
+        if value in self.seen:
+            return value
+        with self._lock:
+            if len(self.seen) < self.limit:
+                self.seen.add(value)
+                return value
+        return "other"
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self.values.items())
+        return [(f"{self.name}_total", dict(zip(self.labels, k)), v) for k, v in items]
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=SQL_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        self.values = {} # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            row = self.values.get(label_values)
+            if row is None:
+                row = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[slot] += 1
+            row[-1] += seconds
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self.values.items())
+        out = []
+        for key, row in items:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                out.append((f"{self.name}_bucket", {**labels, "le": _le(bound)}, cumulative))
+            out.append((f"{self.name}_count", labels, cumulative))
+            out.append((f"{self.name}_sum", labels, row[-1]))
+        return out
+
+def _le(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+# --- Registry ---
+MODULES = LabelSet()
+TABLES = LabelSet() # narrowed to mapped tables by install_metrics_hooks
+STATEMENT_KINDS = ("select", "insert", "update", "delete", "other")
+
+SQL_SECONDS = Histogram("erp_sql_query_duration_seconds", "SQL statement latency.", ("kind",), SQL_BUCKETS)
+RERUN_SECONDS = Histogram("erp_module_rerun_duration_seconds", "Module render time per rerun.", ("module",), RERUN_BUCKETS)
+LOGINS = Counter("erp_logins", "Login attempts by outcome.", ("result",))
+TABLE_WRITES = Counter("erp_table_writes", "Rows written per table and operation.", ("table", "op"))
+_pools = {}
+
+def register_pool(name, engine):
+    _pools[name] = engine
+
+def _kind(statement):
+    word = statement.lstrip()[:6].lower()
+    return word if word in STATEMENT_KINDS else "other"
+
+# --- Hooks ---
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_start")
+    if not starts:
+        return
+    SQL_SECONDS.observe(time.perf_counter() - starts.pop(), _kind(statement))
+    compiled = getattr(context, "compiled", None)
+    stmt = getattr(compiled, "statement", None)
+    if isinstance(stmt, Insert):
+        # Batched inserts (insertmanyvalues) fire once per batch and report no
+        # rowcount while RETURNING is pending: count the whole parameter set once
+        if not getattr(context, "_metrics_counted", False):
+            context._metrics_counted = True
+            TABLE_WRITES.inc(TABLES(stmt.table.name), "insert", amount=len(context.compiled_parameters or [None]))
+    elif isinstance(stmt, (Update, Delete)):
+        rows = cursor.rowcount
+        if rows is None or rows < 0:
+            rows = len(context.compiled_parameters or [None])
+        if rows:
+            TABLE_WRITES.inc(TABLES(stmt.table.name), "update" if isinstance(stmt, Update) else "delete", amount=rows)
+
+def install_metrics_hooks(engine, metadata=None):
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    if metadata is not None:
+        TABLES.allowed = set(metadata.tables)
+
+def observe_rerun(module, seconds):
+    RERUN_SECONDS.observe(seconds, MODULES(module))
+
+def record_login(result):
+    LOGINS.inc(result)
+
+# --- Collection ---
+def _pool_samples():
+    out = []
+    for name, engine in sorted(_pools.items()):
+        pool = engine.pool
+        for metric, attr in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+            fn = getattr(pool, attr, None)
+            if fn is not None:
+                out.append((f"erp_db_pool_{metric}", {"pool": name}, fn()))
+    return out
+
+def _cache_samples():
+    from utils.figure_cache import figure_cache
+    from utils.config import cache_stats
+    caches = {"figure": figure_cache.stats(), "config": cache_stats()}
+    hits, misses, ratio = [], [], []
+    for name, s in caches.items():
+        hits.append(("erp_cache_hits_total", {"cache": name}, s["hits"]))
+        misses.append(("erp_cache_misses_total", {"cache": name}, s["misses"]))
+        total = s["hits"] + s["misses"]
+        ratio.append(("erp_cache_hit_ratio", {"cache": name}, s["hits"] / total if total else 0.0))
+    return hits, misses, ratio
+
+def render():
+    """The full exposition text, ending with # EOF."""
+    families = []
+    pools = _pool_samples()
+    for metric in ("size", "checked_out", "checked_in", "overflow"):
+        families.append((f"erp_db_pool_{metric}", "gauge", f"Connection pool {metric.replace('_', ' ')}.",
+                         [s for s in pools if s[0] == f"erp_db_pool_{metric}"]))
+    families.append((SQL_SECONDS.name, "histogram", SQL_SECONDS.help, SQL_SECONDS.samples()))
+    families.append((RERUN_SECONDS.name, "histogram", RERUN_SECONDS.help, RERUN_SECONDS.samples()))
+    hits, misses, ratio = _cache_samples()
+    families.append(("erp_cache_hits", "counter", "Cache lookups served from cache.", hits))
+    families.append(("erp_cache_misses", "counter", "Cache lookups that had to rebuild.", misses))
+    families.append(("erp_cache_hit_ratio", "gauge", "Hits over all lookups since start.", ratio))
+    families.append((LOGINS.name, "counter", LOGINS.help, LOGINS.samples()))
+    families.append((TABLE_WRITES.name, "counter", TABLE_WRITES.help, TABLE_WRITES.samples()))
+
+    lines = []
+    for name, kind, help, samples in families:
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"# HELP {name} {help}")
+        for sample, labels, value in samples:
+            lines.append(f"{sample}{_labels(labels)} {_value(value)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _value(v):
+    if isinstance(v, float):
+        return repr(v) if v == v and abs(v) != float("inf") else ("NaN" if v != v else ("+Inf" if v > 0 else "-Inf"))
+    return str(int(v))
+
+# --- HTTP endpoint ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # scrapes every few seconds would flood the Streamlit console
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server():
+    """Serve /metrics once per process; a taken port is reported, not raised."""
+    global _server
+    port = int(os.getenv("METRICS_PORT", "9464"))
+    host = os.getenv("METRICS_HOST", "127.0.0.1")
+    with _server_lock:
+        if _server is None and port > 0:
+            try:
+                _server = _serve(host, port)
+            except OSError as e:
+                print(f"Metrics endpoint not started on {host}:{port}: {e}")
+                _server = False # don't retry on every rerun
+    return _server or None
+
+def _serve(host, port):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+# --- Exposition check ---
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})? (\S+)$')
+LABEL_PAIR = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+def parse_exposition(text):
+    """Parse OpenMetrics text into {family: {"type", "samples": [(name, labels, value)]}}.
+
+    Raises ValueError on anything a scraper would reject: samples outside
+    a declared family, malformed lines, or a missing # EOF terminator.
+    """
+    lines = text.rstrip("\n").split("\n")
+    if lines[-1] != "# EOF":
+        raise ValueError("missing # EOF")
+    families, current = {}, None
+    for line in lines[:-1]:
+        if line.startswith("# TYPE "):
+            name, kind = line[7:].split(" ", 1)
+            if name in families:
+                raise ValueError(f"duplicate family {name}")
+            families[name] = {"type": kind, "samples": []}
+            current = name
+        elif line.startswith("# HELP ") or line.startswith("# UNIT "):
+            continue
+        else:
+            m = SAMPLE_LINE.match(line)
+            if not m:
+                raise ValueError(f"malformed line: {line!r}")
+            name, _, label_text, value = m.groups()
+            if current is None or not name.startswith(current):
+                raise ValueError(f"sample {name} outside family {current}")
+            labels = dict(LABEL_PAIR.findall(label_text or ""))
+            families[current]["samples"].append((name, labels, float(value)))
+    for name, family in families.items():
+        if family["type"] == "histogram":
+            for s_name, labels, value in family["samples"]:
+                if s_name.endswith("_bucket") and "le" not in labels:
+                    raise ValueError(f"{name} bucket without le")
+    return families
+
+def _self_check():
+    import tempfile
+    import urllib.request
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'metrics.db')}")
+    from database.db_manager import init_db, SessionLocal
+    from database.models import Vendor
+    init_db()
+    db = SessionLocal()
+    db.add_all([Vendor(name=f"Vendor {i}") for i in range(3)])
+    db.commit()
+    db.query(Vendor).all()
+    db.close()
+    record_login("success")
+    observe_rerun("Dashboard", 0.2)
+    for i in range(MAX_LABEL_VALUES + 5):
+        observe_rerun(f"page {i}", 0.01)
+
+    server = _serve("127.0.0.1", 0)
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}/metrics"
+    with urllib.request.urlopen(url) as resp:
+        content_type, text = resp.headers["Content-Type"], resp.read().decode()
+    families = parse_exposition(text)
+    writes = {(l["table"], l["op"]): v for n, l, v in families["erp_table_writes"]["samples"]}
+    modules = {l["module"] for n, l, v in families["erp_module_rerun_duration_seconds"]["samples"]}
+    checks = [
+        ("content type is OpenMetrics", content_type == CONTENT_TYPE),
+        ("pool gauges present", bool(families["erp_db_pool_size"]["samples"])),
+        ("vendor inserts counted", writes.get(("vendors", "insert")) == 3),
+        ("select latency observed", any(l.get("kind") == "select" for n, l, v in families["erp_sql_query_duration_seconds"]["samples"])),
+        ("login counter", ("erp_logins_total", {"result": "success"}, 1.0) in families["erp_logins"]["samples"]),
+        ("module label capped", len(modules) == MAX_LABEL_VALUES + 1 and "other" in modules),
+    ]
+    for label, ok in checks:
+        print(f"[{'PASS' if ok else 'FAIL'}] {label}")
+    print(f"\n{sum(ok for _, ok in checks)}/{len(checks)} checks passed ({len(families)} families scraped from {url})")
+    return all(ok for _, ok in checks)
+
+if __name__ == "__main__":
+    import importlib
+    import sys
+    # Run against the importable module: db_manager installs its hooks there, not in __main__
+    sys.exit(0 if importlib.import_module("utils.metrics")._self_check() else 1)
@@ -0,0 +1,93 @@
+"""Data for the MIS / analytics screens.
+
+Each loader aggregates on the DuckDB analytics mirror when it is synced
+and fresh, and otherwise falls back to the same query on the live
+database through the caller's (tenant-scoped) session. Column names are
+the ones the pages display.
+"""
+import pandas as pd
+from sqlalchemy import select, func
+from database.models import Project, FinanceRecord, TransactionType, PurchaseOrder, Vendor, Client, Contract
+from utils import analytics_mirror as mirror
+
+def _frame(db, stmt, columns):
+    return pd.DataFrame(db.execute(stmt).all(), columns=columns)
+
+def executive_kpis(db):
+    """Income, expense, project and client counts for the executive dashboard."""
+    if mirror.ready():
+        where, params = mirror.tenant_filter()
+        row = mirror.query(f"""
+            SELECT coalesce(sum(amount) FILTER (WHERE type = 'Income'), 0) AS income,
+                   coalesce(sum(amount) FILTER (WHERE type = 'Expense'), 0) AS expense,
+                   (SELECT count(*) FROM projects WHERE {where}) AS projects,
+                   (SELECT count(*) FROM clients) AS clients
+            FROM finance_records WHERE {where}""", params + params).iloc[0]
+        return {"income": row["income"], "expense": row["expense"], "projects": int(row["projects"]), "clients": int(row["clients"])}
+    return {
+        "income": db.query(func.sum(FinanceRecord.amount)).filter(FinanceRecord.type == TransactionType.INCOME).scalar() or 0,
+        "expense": db.query(func.sum(FinanceRecord.amount)).filter(FinanceRecord.type == TransactionType.EXPENSE).scalar() or 0,
+        "projects": db.query(func.count(Project.id)).scalar(),
+        "clients": db.query(func.count(Client.id)).scalar(),
+    }
+
+def finance_frame(db):
+    """Every finance record as Date / Type / Category / Amount."""
+    if mirror.ready():
+        where, params = mirror.tenant_filter()
+        return mirror.query(f"""SELECT date AS "Date", type AS "Type", category AS "Category", amount AS "Amount"
+                                FROM finance_records WHERE {where} ORDER BY id""", params)
+    df = _frame(db, select(FinanceRecord.date, FinanceRecord.type, FinanceRecord.category, FinanceRecord.amount)
+                .order_by(FinanceRecord.id), ["Date", "Type", "Category", "Amount"])
+    df["Type"] = df["Type"].map(lambda t: t.value if t else None)
+    return df
+
+def finance_by_category(db):
+    """Total amount per finance category."""
+    if mirror.ready():
+        where, params = mirror.tenant_filter()
+        return mirror.query(f"""SELECT category AS "Category", sum(amount) AS "Amount" FROM finance_records
+                                WHERE {where} GROUP BY category ORDER BY "Amount" DESC""", params)
+    return _frame(db, select(FinanceRecord.category, func.sum(FinanceRecord.amount)).group_by(FinanceRecord.category)
+                  .order_by(func.sum(FinanceRecord.amount).desc()), ["Category", "Amount"])
+
+def projects_frame(db):
+    """Project portfolio as ID / Name / Client / Budget / Status / Progress / Start / End."""
+    columns = ["ID", "Name", "Client", "Budget", "Status", "Progress", "Start", "End"]
+    if mirror.ready():
+        where, params = mirror.tenant_filter()
+        df = mirror.query(f"""SELECT id, name, client, total_budget, status, progress, start_date, end_date
+                              FROM projects WHERE {where} ORDER BY id""", params)
+        df.columns = columns
+    else:
+        df = _frame(db, select(Project.id, Project.name, Project.client, Project.total_budget, Project.status,
+                               Project.progress, Project.start_date, Project.end_date).order_by(Project.id), columns)
+        df["Status"] = df["Status"].map(lambda s: s.value if s else None)
+    df["Start"], df["End"] = pd.to_datetime(df["Start"]), pd.to_datetime(df["End"])
+    return df
+
+def purchase_orders_frame(db):
+    """Purchase orders with vendor names as Vendor / Amount / Status / Date / Delivery."""
+    columns = ["Vendor", "Amount", "Status", "Date", "Delivery"]
+    if mirror.ready():
+        df = mirror.query("""SELECT v.name, p.total_amount, p.status, p.order_date, p.expected_delivery
+                             FROM purchase_orders p JOIN vendors v ON v.id = p.vendor_id ORDER BY p.id""")
+        df.columns = columns
+    else:
+        df = _frame(db, select(Vendor.name, PurchaseOrder.total_amount, PurchaseOrder.status, PurchaseOrder.order_date,
+                               PurchaseOrder.expected_delivery).join(Vendor, Vendor.id == PurchaseOrder.vendor_id)
+                    .order_by(PurchaseOrder.id), columns)
+    df["Date"], df["Delivery"] = pd.to_datetime(df["Date"]), pd.to_datetime(df["Delivery"])
+    return df
+
+def crm_summary(db):
+    """(clients per status, contract count and value per status) for CRM analytics."""
+    if mirror.ready():
+        clients = mirror.query("""SELECT status AS "Status", count(*) AS "Count" FROM clients GROUP BY status""")
+        contracts = mirror.query("""SELECT status AS "Status", count(*) AS "Count", sum(contract_value) AS "Value"
+                                    FROM contracts GROUP BY status""")
+        return clients, contracts
+    clients = _frame(db, select(Client.status, func.count(Client.id)).group_by(Client.status), ["Status", "Count"])
+    contracts = _frame(db, select(Contract.status, func.count(Contract.id), func.sum(Contract.contract_value))
+                       .group_by(Contract.status), ["Status", "Count", "Value"])
+    return clients, contracts
@@ -0,0 +1,247 @@
+"""Transactional outbox: every ORM write also lands in the `change_events` table.
+
+Hooks on the Session class record inserted, updated and deleted rows in
+the same transaction as the write, so an event exists exactly when the
+change was committed. Consumers (the analytics mirror, exports, alerting)
+read the feed in id order from a cursor kept in `sync_watermarks` as
+"outbox:<consumer>", and `compact()` drops what every consumer has
+acknowledged.
+
+ORM-enabled bulk statements (`db.execute(insert(Model), rows)`,
+`db.execute(update(Model), rows)`, `query.update()`, `delete(Model)`)
+are recorded as one event with no row id: consumers should refresh that
+table. Two write paths bypass the feed and must not be used for business
+tables: plain Core statements on a Connection, and the legacy
+`Session.bulk_insert_mappings` / `bulk_update_mappings` /
+`bulk_save_objects`, which fire neither hook. Use the ORM bulk forms above.
+
+Ordering: event ids are allocated at flush, not at commit. On SQLite
+writers are serialized, so ids become visible in order. On Postgres a
+long transaction can commit an id below one a consumer has already
+passed. read_batch therefore holds the cursor back behind the oldest
+transaction that is still writing, as reported by pg_stat_activity.
+That needs the app's role to see its own backends (always true) or
+pg_read_all_stats for other roles. Where the activity view cannot be
+read (other roles' sessions without that grant), only the settle
+window applies to them and delivery is best effort.
+"""
+import enum
+import json
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, insert, select, delete, func, inspect, text
+from sqlalchemy.orm import Session
+from database.models import ChangeEvent, SyncWatermark
+from utils.time_utils import get_ist
+from utils.watermarks import get_watermark, advance_watermark
+
+# Bookkeeping tables and stores derived from the feed: their churn is not
+# business data, and recording it would make consumers feed themselves.
+EXCLUDED_TABLES = {"change_events", "sync_watermarks", "jobs", "job_schedules", "attendance_months"}
+# Consumers learn that these changed, never the value
+REDACTED_COLUMNS = {"password_hash"}
+CONSUMER_PREFIX = "outbox:"
+BATCH = 500
+COMPACT_CHUNK = 10000
+# Events younger than this are held back to absorb clock and flush-order
+# jitter between concurrent writers (see "Ordering" above)
+SETTLE_SECONDS = float(os.getenv("OUTBOX_SETTLE_SECONDS", "2"))
+
+def _now():
+    return get_ist().replace(tzinfo=None)
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return str(value)
+
+def _event(table, row_id, op, values, now):
+    return {"table_name": table, "row_id": row_id, "op": op, "changed_at": now,
+            "changes": json.dumps(values, default=_default, separators=(",", ":"))}
+
+def _record_flush(session, flush_context):
+    """Write one change event per flushed row (history is still intact here)."""
+    now, rows = _now(), []
+    for op, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            state = inspect(obj)
+            table = state.mapper.local_table.name
+            if table in EXCLUDED_TABLES:
+                continue
+            values = {}
+            for attr in state.mapper.column_attrs:
+                name = attr.columns[0].name
+                if op == "update":
+                    added = state.attrs[attr.key].history.added
+                    if added:
+                        values[name] = added[0]
+                elif attr.key in state.dict:
+                    values[name] = state.dict[attr.key]
+                if name in REDACTED_COLUMNS and name in values:
+                    values[name] = "<redacted>"
+            if op == "update" and not values:
+                continue # Only relationship collections changed
+            row_id = state.identity[0] if state.identity else state.dict.get("id")
+            rows.append(_event(table, row_id, op, values, now))
+    if rows:
+        session.connection().execute(insert(ChangeEvent), rows)
+
+def _record_bulk(state):
+    """ORM bulk insert/update/delete: one event for the whole statement."""
+    if not (state.is_insert or state.is_update or state.is_delete) or state.bind_mapper is None:
+        return
+    table = state.bind_mapper.local_table.name
+    if table in EXCLUDED_TABLES:
+        return
+    op = "insert" if state.is_insert else "update" if state.is_update else "delete"
+    params = state.parameters
+    count = len(params) if isinstance(params, (list, tuple)) else None
+    state.session.connection().execute(insert(ChangeEvent), [_event(table, None, op, {"rows": count}, _now())])
+
+def install_outbox_hooks():
+    """Record ORM writes from every Session (pages, jobs, API, scripts)."""
+    if not event.contains(Session, "after_flush", _record_flush):
+        event.listen(Session, "after_flush", _record_flush)
+        event.listen(Session, "do_orm_execute", _record_bulk)
+
+# --- Consumer API ---
+def _cursor_name(consumer):
+    return CONSUMER_PREFIX + consumer
+
+def _cursor(db, consumer):
+    return db.execute(select(SyncWatermark.last_id).where(SyncWatermark.name == _cursor_name(consumer))).scalar() or 0
+
+def latest_event_id(db):
+    return db.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+
+def register_consumer(db, consumer, from_start=False):
+    """Create a consumer cursor, by default at the current end of the feed (commits)."""
+    mark = get_watermark(db, _cursor_name(consumer))
+    if not from_start and not mark.last_id:
+        mark.last_id = latest_event_id(db)
+    db.commit()
+    return mark.last_id
+
+def _oldest_writer_age(db):
+    """Seconds the oldest other open writing transaction has run (Postgres), or 0."""
+    if db.get_bind().dialect.name != "postgresql":
+        return 0.0
+    try:
+        with db.begin_nested():
+            # Activity is otherwise a snapshot taken once per transaction
+            db.execute(text("SELECT pg_stat_clear_snapshot()"))
+            age = db.execute(text(
+                "SELECT EXTRACT(EPOCH FROM clock_timestamp() - min(xact_start)) FROM pg_stat_activity "
+                "WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+            )).scalar()
+    except Exception as e:
+        print(f"Outbox writer check unavailable, using settle window only: {e}")
+        return 0.0
+    return float(age or 0.0)
+
+def settled_cutoff(db):
+    """Flush time up to which every event is committed (or rolled back)."""
+    return _now() - timedelta(seconds=SETTLE_SECONDS + _oldest_writer_age(db))
+
+def unsettled_floor(db, table):
+    """Lowest row id of `table` whose insert is not yet settled, or None.
+
+    Readers that page a table by id watermark stop below this, so a row a
+    long transaction commits late is not passed over (see "Ordering").
+    An unsettled bulk insert has no row ids and yields 0: skip the table.
+    """
+    lowest, total, with_id = db.execute(select(
+        func.min(ChangeEvent.row_id), func.count(), func.count(ChangeEvent.row_id)
+    ).where(ChangeEvent.table_name == table, ChangeEvent.op == "insert",
+            ChangeEvent.changed_at > settled_cutoff(db))).one()
+    if total > with_id:
+        return 0
+    return lowest
+
+def read_batch(db, consumer, tables=None, limit=BATCH):
+    """(events, upto): the next settled events after the consumer's cursor.
+
+    At most `limit` events are scanned; those for `tables` (all if None)
+    come back as dicts in id order. Acknowledge `upto` once the batch is
+    handled: it also moves the cursor past events for other tables. The
+    batch stops before the first visible event that is not yet settled.
+    """
+    cursor = _cursor(db, consumer)
+    cutoff = settled_cutoff(db)
+    pending = db.execute(select(func.min(ChangeEvent.id)).where(
+        ChangeEvent.id > cursor, ChangeEvent.changed_at > cutoff)).scalar()
+    window = select(ChangeEvent.id).where(ChangeEvent.id > cursor, ChangeEvent.changed_at <= cutoff)
+    if pending is not None:
+        window = window.where(ChangeEvent.id < pending)
+    window = window.order_by(ChangeEvent.id).limit(limit).subquery()
+    upto = db.execute(select(func.max(window.c.id))).scalar()
+    if upto is None:
+        return [], cursor
+    stmt = select(ChangeEvent).where(ChangeEvent.id > cursor, ChangeEvent.id <= upto).order_by(ChangeEvent.id)
+    if tables:
+        stmt = stmt.where(ChangeEvent.table_name.in_(tables))
+    return [{
+        "id": e.id, "table": e.table_name, "row_id": e.row_id, "op": e.op,
+        "changes": json.loads(e.changes or "{}"), "changed_at": e.changed_at
+    } for e in db.execute(stmt).scalars()], upto
+
+def acknowledge(db, consumer, upto, handled=0):
+    """Move the consumer's cursor forward to `upto` (caller commits)."""
+    advance_watermark(db, _cursor_name(consumer), upto, handled)
+
+def consume(db, consumer, handler, tables=None, limit=BATCH):
+    """Feed batches to `handler(db, events)` until caught up; returns events handled.
+
+    The handler's writes and the cursor move commit together, so a
+    consumer writing to this database sees each event exactly once.
+    """
+    handled = 0
+    while True:
+        events, upto = read_batch(db, consumer, tables, limit)
+        if upto <= _cursor(db, consumer):
+            return handled
+        if events:
+            handler(db, events)
+        acknowledge(db, consumer, upto, len(events))
+        db.commit()
+        handled += len(events)
+
+def backlog(db, consumer, tables=None):
+    """Unacknowledged events per table for a consumer."""
+    cursor = _cursor(db, consumer)
+    stmt = select(ChangeEvent.table_name, func.count(ChangeEvent.id)).where(ChangeEvent.id > cursor)
+    if tables:
+        stmt = stmt.where(ChangeEvent.table_name.in_(tables))
+    return dict(db.execute(stmt.group_by(ChangeEvent.table_name)).all())
+
+def consumers(db):
+    """Registered consumers with their cursor, events behind and last acknowledgement."""
+    marks = db.query(SyncWatermark).filter(SyncWatermark.name.like(f"{CONSUMER_PREFIX}%")).order_by(SyncWatermark.name).all()
+    return [{
+        "Consumer": m.name[len(CONSUMER_PREFIX):], "Cursor": m.last_id or 0,
+        "Behind": db.execute(select(func.count(ChangeEvent.id)).where(ChangeEvent.id > (m.last_id or 0))).scalar(),
+        "Events Handled": m.rows_processed or 0, "Last Ack": m.last_run
+    } for m in marks]
+
+def drop_consumer(db, consumer):
+    """Forget a consumer so it no longer holds back compaction (commits)."""
+    db.query(SyncWatermark).filter(SyncWatermark.name == _cursor_name(consumer)).delete(synchronize_session=False)
+    db.commit()
+
+def compact(db):
+    """Delete events every registered consumer has acknowledged; returns rows removed.
+
+    Runs in chunks so a large backlog does not hold the write lock for
+    long. With no consumers registered nothing is removed.
+    """
+    floor = db.query(func.min(SyncWatermark.last_id)).filter(SyncWatermark.name.like(f"{CONSUMER_PREFIX}%")).scalar()
+    oldest = db.execute(select(func.min(ChangeEvent.id))).scalar()
+    removed = 0
+    while floor and oldest is not None and oldest <= floor:
+        upto = min(oldest + COMPACT_CHUNK - 1, floor)
+        removed += db.execute(delete(ChangeEvent).where(ChangeEvent.id <= upto)).rowcount
+        db.commit()
+        oldest = upto + 1
+    return removed
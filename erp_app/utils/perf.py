@@ -0,0 +1,132 @@
+import heapq
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+
+WINDOW = 500 # reruns kept per module
+TOP_STATEMENTS = 10 # slowest statements kept per module
+STATEMENT_CHARS = 400
+
+class PageRun:
+    """SQL cost accumulated while one module renders."""
+
+    def __init__(self, module):
+        self.module = module
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_ms = 0.0
+        self.rows = 0
+        self.slowest = (0.0, "")
+        self.wall_ms = 0.0
+        self.lock = threading.Lock() # parallel loaders share the run across threads
+
+_active = ContextVar("perf_page_run", default=None)
+_history = {}
+_slowest = {}
+_lock = threading.Lock()
+
+def active_module():
+    run = _active.get()
+    return run.module if run else None
+
+# --- Engine / ORM hooks ---
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("perf_start", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    run = _active.get()
+    if run is None or not conn.info.get("perf_start"):
+        return
+    ms = (time.perf_counter() - conn.info["perf_start"].pop()) * 1000
+    with run.lock:
+        run.statements += 1
+        run.sql_ms += ms
+        if statement.lstrip()[:6].upper() != "SELECT" and cursor.rowcount > 0:
+            run.rows += cursor.rowcount
+        if ms > run.slowest[0]:
+            run.slowest = (ms, statement)
+
+def _on_load(target, context):
+    run = _active.get()
+    if run is not None:
+        with run.lock:
+            run.rows += 1
+
+def install_sql_hooks(engine, base=None):
+    """Time every cursor execute on `engine`; count ORM rows loaded from `base`.
+
+    Outside a page_run() scope the hooks return immediately, so background
+    workers and the sidebar cost one contextvar lookup per statement.
+    """
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    if base is not None and not event.contains(base, "load", _on_load):
+        event.listen(base, "load", _on_load, propagate=True)
+
+# --- Attribution ---
+@contextmanager
+def page_run(module):
+    """Attribute SQL issued inside the block to `module` and record the rerun."""
+    run = PageRun(module)
+    token = _active.set(run)
+    try:
+        yield run
+    finally:
+        _active.reset(token)
+        run.wall_ms = (time.perf_counter() - run.started) * 1000
+        _record(run)
+
+def _record(run):
+    with _lock:
+        _history.setdefault(run.module, deque(maxlen=WINDOW)).append(
+            (time.time(), run.statements, run.sql_ms, run.rows, run.wall_ms))
+        if run.slowest[1]:
+            heap = _slowest.setdefault(run.module, [])
+            entry = (run.slowest[0], time.time(), " ".join(run.slowest[1].split())[:STATEMENT_CHARS])
+            if len(heap) < TOP_STATEMENTS:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+
+def reset():
+    with _lock:
+        _history.clear()
+        _slowest.clear()
+
+# --- Reporting ---
+def history(window_minutes=60):
+    """Recorded reruns inside the rolling window as a DataFrame."""
+    cutoff = time.time() - window_minutes * 60
+    with _lock:
+        rows = [(m,) + r for m, runs in _history.items() for r in runs if r[0] >= cutoff]
+    return pd.DataFrame(rows, columns=["module", "at", "statements", "sql_ms", "rows", "wall_ms"])
+
+def module_summary(window_minutes=60):
+    """Per-module rerun count and p50/p95/max of SQL time, statements and rows."""
+    df = history(window_minutes)
+    if df.empty:
+        return df
+    out = []
+    for module, g in df.groupby("module"):
+        sql, wall = g["sql_ms"].to_numpy(), g["wall_ms"].to_numpy()
+        out.append({
+            "module": module, "reruns": len(g),
+            "sql_p50_ms": np.percentile(sql, 50), "sql_p95_ms": np.percentile(sql, 95), "sql_max_ms": sql.max(),
+            "wall_p50_ms": np.percentile(wall, 50), "wall_p95_ms": np.percentile(wall, 95),
+            "statements_p50": np.percentile(g["statements"], 50), "statements_max": int(g["statements"].max()),
+            "rows_p50": np.percentile(g["rows"], 50), "rows_max": int(g["rows"].max()),
+            "sql_share": sql.sum() / wall.sum() if wall.sum() else 0.0,
+        })
+    return pd.DataFrame(out).sort_values("sql_p95_ms", ascending=False)
+
+def slowest_statements(module=None):
+    with _lock:
+        items = [(m, e) for m, heap in _slowest.items() for e in heap if module in (None, m)]
+    return pd.DataFrame([{"module": m, "ms": ms, "at": pd.Timestamp(at, unit="s"), "statement": sql}
+                         for m, (ms, at, sql) in items]).sort_values("ms", ascending=False) if items else pd.DataFrame()
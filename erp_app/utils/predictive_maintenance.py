@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from sqlalchemy import select, insert, update, func
+from database.models import Asset, AssetLog, MaintenanceSchedule
+from utils.time_utils import get_ist_date
+
+AUTO_TASK = "Predictive Service (Auto)"
+
+def forecast_service(db, usage_window=14, today=None):
+    """Hours since last service and projected due date for every asset.
+
+    One query for assets, one for completed services and one for usage
+    logs; everything else is grouped and projected with pandas. The daily
+    usage rate is the average over the last `usage_window` days, falling
+    back to the lifetime rate for assets that were idle in that window.
+    """
+    today = today or get_ist_date()
+    conn = db.connection()
+
+    assets = pd.read_sql(select(
+        Asset.id.label("asset_id"), Asset.name, Asset.purchase_date,
+        Asset.last_service_date, Asset.service_interval_hours
+    ).where(Asset.status != "Retired"), conn)
+    if assets.empty:
+        return assets
+
+    serviced = pd.read_sql(select(
+        MaintenanceSchedule.asset_id, func.max(MaintenanceSchedule.performed_date).label("performed")
+    ).where(MaintenanceSchedule.status == "Completed").group_by(MaintenanceSchedule.asset_id), conn)
+    logs = pd.read_sql(select(AssetLog.asset_id, AssetLog.date, AssetLog.hours_used)
+                       .where(AssetLog.hours_used > 0), conn)
+
+    assets = assets.merge(serviced, on="asset_id", how="left")
+    for col in ["purchase_date", "last_service_date", "performed"]:
+        assets[col] = pd.to_datetime(assets[col])
+    assets["since"] = assets[["last_service_date", "performed"]].max(axis=1).fillna(assets["purchase_date"])
+    assets["service_interval_hours"] = assets["service_interval_hours"].fillna(250.0)
+
+    now = pd.Timestamp(today)
+    logs["date"] = pd.to_datetime(logs["date"])
+    logs = logs.merge(assets[["asset_id", "since"]], on="asset_id")
+    after_service = logs["since"].isna() | (logs["date"] > logs["since"])
+    recent = logs["date"] > now - pd.Timedelta(days=usage_window)
+
+    g = logs.assign(
+        since_hours=logs["hours_used"].where(after_service, 0.0),
+        recent_hours=logs["hours_used"].where(recent, 0.0)
+    ).groupby("asset_id").agg(
+        hours_since_service=("since_hours", "sum"),
+        recent_hours=("recent_hours", "sum"),
+        total_hours=("hours_used", "sum"),
+        first_log=("date", "min")
+    )
+    out = assets.merge(g, left_on="asset_id", right_index=True, how="left")
+    out[["hours_since_service", "recent_hours", "total_hours"]] = out[["hours_since_service", "recent_hours", "total_hours"]].fillna(0.0)
+
+    lifetime_days = ((now - out["first_log"]).dt.days + 1).clip(lower=1)
+    lifetime_rate = (out["total_hours"] / lifetime_days).fillna(0.0)
+    out["daily_rate"] = np.where(out["recent_hours"] > 0, out["recent_hours"] / usage_window, lifetime_rate)
+    out["remaining_hours"] = out["service_interval_hours"] - out["hours_since_service"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.ceil(out["remaining_hours"].clip(lower=0) / out["daily_rate"])
+    days_left = days_left.where(np.isfinite(days_left))
+    out["projected_due"] = (now + pd.to_timedelta(days_left, unit="D")).dt.date
+    return out[["asset_id", "name", "hours_since_service", "daily_rate", "remaining_hours", "projected_due"]]
+
+def run_predictive_maintenance(db, horizon_days=14, usage_window=14):
+    """Refresh next_service_due for the fleet and auto-schedule due services.
+
+    Assets due within `horizon_days` get a MaintenanceSchedule row unless
+    they already have an open one. All writes are issued in bulk.
+    """
+    today = get_ist_date()
+    forecast = forecast_service(db, usage_window=usage_window, today=today)
+    if forecast.empty:
+        return {"assets": 0, "updated": 0, "scheduled": 0, "forecast": forecast}
+
+    due = forecast.dropna(subset=["projected_due"])
+    db.execute(update(Asset), [
+        {"id": int(a), "next_service_due": d} for a, d in zip(due["asset_id"], due["projected_due"])
+    ])
+
+    open_ids = {r[0] for r in db.query(MaintenanceSchedule.asset_id)
+                .filter(MaintenanceSchedule.status != "Completed").distinct()}
+    horizon = today + timedelta(days=horizon_days)
+    upcoming = due[(due["projected_due"] <= horizon) & ~due["asset_id"].isin(open_ids)]
+    if not upcoming.empty:
+        db.execute(insert(MaintenanceSchedule), [{
+            "asset_id": int(a), "task_name": AUTO_TASK,
+            "scheduled_date": max(d, today), "status": "Scheduled"
+        } for a, d in zip(upcoming["asset_id"], upcoming["projected_due"])])
+    db.commit()
+    return {"assets": len(forecast), "updated": len(due), "scheduled": len(upcoming), "forecast": forecast}
@@ -0,0 +1,131 @@
+import pandas as pd
+from sqlalchemy import select, insert, update, delete
+from database.models import ProductionLog, QualityCheck, ProductionRollup, SyncWatermark, Project
+from utils.watermarks import get_watermark, claim_watermark
+from utils.tenancy import tenant_predicates
+from utils.outbox import unsettled_floor
+
+LOG_WATERMARK = "production_rollup:logs"
+QC_WATERMARK = "production_rollup:qc"
+MEASURES = ["output", "waste", "efficiency_sum", "log_count", "qc_total", "qc_pass"]
+
+def _by_period(df, measures):
+    """Aggregate a delta frame to daily and weekly (Monday) buckets."""
+    df["date"] = pd.to_datetime(df["date"])
+    daily = df.assign(grain="D", period_start=df["date"].dt.date)
+    weekly = df.assign(grain="W", period_start=(df["date"] - pd.to_timedelta(df["date"].dt.weekday, unit="D")).dt.date)
+    both = pd.concat([daily, weekly], ignore_index=True)
+    return both.groupby(["project_id", "grain", "period_start"], as_index=False)[measures].sum()
+
+def refresh_rollups(db):
+    """Fold production logs and QC checks added since the last run into the rollups.
+
+    Deltas are aggregated in pandas and merged additively into existing
+    buckets. Both watermarks are advanced with compare-and-set in the same
+    transaction, so a concurrent refresh cannot double count. Rows above the
+    first insert that has not settled in the change feed wait for the next
+    run, so an id committed late by a long transaction is not skipped.
+    """
+    conn = db.connection()
+    log_mark = get_watermark(db, LOG_WATERMARK).last_id or 0
+    qc_mark = get_watermark(db, QC_WATERMARK).last_id or 0
+
+    log_stmt = select(
+        ProductionLog.id, ProductionLog.project_id, ProductionLog.date,
+        ProductionLog.quantity_produced, ProductionLog.waste_generated, ProductionLog.efficiency
+    ).where(ProductionLog.id > log_mark)
+    # QC results are attributed to the production day of the batch they inspect
+    qc_stmt = select(
+        QualityCheck.id, QualityCheck.result, ProductionLog.project_id, ProductionLog.date
+    ).join(ProductionLog, ProductionLog.id == QualityCheck.production_id).where(QualityCheck.id > qc_mark)
+    log_floor = unsettled_floor(db, ProductionLog.__tablename__)
+    if log_floor is not None:
+        log_stmt = log_stmt.where(ProductionLog.id < log_floor)
+    qc_floor = unsettled_floor(db, QualityCheck.__tablename__)
+    if qc_floor is not None:
+        qc_stmt = qc_stmt.where(QualityCheck.id < qc_floor)
+    logs = pd.read_sql(log_stmt, conn)
+    checks = pd.read_sql(qc_stmt, conn)
+
+    if logs.empty and checks.empty:
+        return {"logs": 0, "checks": 0, "buckets": 0}
+
+    frames = []
+    if not logs.empty:
+        frames.append(_by_period(logs.assign(
+            output=logs["quantity_produced"].fillna(0.0),
+            waste=logs["waste_generated"].fillna(0.0),
+            efficiency_sum=logs["efficiency"].fillna(0.0),
+            log_count=1
+        ), ["output", "waste", "efficiency_sum", "log_count"]))
+    if not checks.empty:
+        frames.append(_by_period(checks.assign(
+            qc_total=1, qc_pass=(checks["result"] == "Pass").astype(int)
+        ), ["qc_total", "qc_pass"]))
+    keys = ["project_id", "grain", "period_start"]
+    delta = pd.concat(frames, ignore_index=True).reindex(columns=keys + MEASURES).fillna(0)
+    delta = delta.groupby(keys, as_index=False)[MEASURES].sum()
+
+    existing = pd.read_sql(select(ProductionRollup).where(
+        ProductionRollup.project_id.in_(delta["project_id"].unique().tolist()),
+        ProductionRollup.period_start >= delta["period_start"].min(),
+        ProductionRollup.period_start <= delta["period_start"].max()
+    ), conn)
+    merged = delta.merge(existing, on=keys, how="left", suffixes=("", "_old"))
+    old = [f"{m}_old" for m in MEASURES]
+    merged[old] = merged[old].fillna(0)
+    merged[MEASURES[3:]] = merged[MEASURES[3:]].astype(int)
+
+    updates = merged[merged["id"].notna()]
+    if not updates.empty:
+        db.execute(update(ProductionRollup), [
+            dict(id=int(r["id"]), **{m: r[m] + r[f"{m}_old"] for m in MEASURES})
+            for r in updates.to_dict("records")
+        ])
+    inserts = merged[merged["id"].isna()]
+    if not inserts.empty:
+        db.execute(insert(ProductionRollup), inserts[keys + MEASURES].to_dict("records"))
+
+    ok = claim_watermark(db, LOG_WATERMARK, log_mark, logs["id"].max() if not logs.empty else log_mark, len(logs))
+    ok = ok and claim_watermark(db, QC_WATERMARK, qc_mark, checks["id"].max() if not checks.empty else qc_mark, len(checks))
+    if not ok:
+        db.rollback()
+        return {"logs": 0, "checks": 0, "buckets": 0}
+    db.commit()
+    return {"logs": len(logs), "checks": len(checks), "buckets": len(delta)}
+
+def rebuild_rollups(db):
+    """Drop all rollups and fold the full history again (after edits/deletes)."""
+    db.execute(delete(ProductionRollup))
+    db.query(SyncWatermark).filter(SyncWatermark.name.in_([LOG_WATERMARK, QC_WATERMARK]))\
+        .update({SyncWatermark.last_id: 0, SyncWatermark.rows_processed: 0}, synchronize_session=False)
+    db.commit()
+    return refresh_rollups(db)
+
+def read_rollups(db, grain="D", project_ids=None, start=None, end=None):
+    """Rollup rows for a grain with derived ratios, ready for charts.
+
+    Rollups are shared across tenants, so they are limited to the active
+    tenant's projects here; pd.read_sql bypasses the session's tenant hook.
+    """
+    stmt = select(ProductionRollup).where(ProductionRollup.grain == grain)
+    scope = tenant_predicates(Project)
+    if scope:
+        stmt = stmt.where(ProductionRollup.project_id.in_(select(Project.id).where(*scope)))
+    if project_ids:
+        stmt = stmt.where(ProductionRollup.project_id.in_(project_ids))
+    if start:
+        stmt = stmt.where(ProductionRollup.period_start >= start)
+    if end:
+        stmt = stmt.where(ProductionRollup.period_start <= end)
+    df = pd.read_sql(stmt.order_by(ProductionRollup.period_start), db.connection())
+    if df.empty:
+        return df
+
+    produced = df["output"] + df["waste"]
+    df["waste_ratio"] = (df["waste"] / produced.where(produced > 0)).fillna(0.0)
+    df["efficiency"] = (df["efficiency_sum"] / df["log_count"].where(df["log_count"] > 0)).fillna(0.0)
+    df["qc_pass_rate"] = df["qc_pass"] / df["qc_total"].where(df["qc_total"] > 0)
+    # Availability is not logged, so OEE is estimated as performance x quality
+    df["oee"] = df["efficiency"] / 100 * df["qc_pass_rate"].fillna(1.0)
+    return df
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_LOG = os.getenv("PROFILE_LOG_PATH", os.path.join(BASE_DIR, "logs", "rerun_profiles.jsonl"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+MAX_DEPTH = 60
+PHASES = ["query", "frame build", "chart build", "widget emit", "app code"]
+
+# Top-level package -> phase. Anything not listed counts as app code.
+PACKAGE_PHASES = {
+    "sqlalchemy": "query", "sqlite3": "query", "psycopg2": "query", "asyncpg": "query",
+    "pandas": "frame build", "numpy": "frame build", "pyarrow": "frame build",
+    "plotly": "chart build", "_plotly_utils": "chart build",
+    "streamlit": "widget emit",
+}
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def _profile_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                os.makedirs(os.path.dirname(PROFILE_LOG), exist_ok=True)
+                logger = logging.getLogger("erp.profiler")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(PROFILE_LOG, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+def _package(frame):
+    return (frame.f_globals.get("__name__") or "?").split(".")[0]
+
+def classify(packages):
+    """Phase for one sample, given the stack's packages from root to leaf.
+
+    Any database frame makes it a query; otherwise the outermost library
+    call decides, so st.dataframe() converting with pandas is widget emit
+    while px.bar() building with pandas is chart build.
+    """
+    phases = [PACKAGE_PHASES.get(p) for p in packages]
+    if "query" in phases:
+        return "query"
+    return next((p for p in phases if p), "app code")
+
+class RerunSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval until stopped."""
+
+    def __init__(self, thread_id, entry_code, interval=INTERVAL):
+        super().__init__(name="rerun-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.entry_code = entry_code
+        self.interval = interval
+        self.stacks = Counter()
+        self.phases = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        chain = []
+        while frame is not None:
+            chain.append(frame)
+            if frame.f_code is self.entry_code:
+                break
+            frame = frame.f_back
+        if frame is None: # entry function not on the stack (yet / any more)
+            return
+        chain.reverse()
+        packages = [_package(f) for f in chain]
+        labels = tuple(f"{f.f_globals.get('__name__')}:{f.f_code.co_name}" for f in chain[:MAX_DEPTH])
+        self.stacks[labels] += 1
+        self.phases[classify(packages)] += 1
+        self.samples += 1
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def profiled_call(module, func, *args, **kwargs):
+    """Run `func` under the sampler and append its profile to the rotating log.
+
+    Streamlit's st.rerun()/st.stop() exceptions pass through untouched;
+    the profile is still written for the partial render.
+    """
+    sampler = RerunSampler(threading.get_ident(), func.__code__)
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        sampler.stop()
+        wall_ms = (time.perf_counter() - started) * 1000
+        try:
+            _profile_logger().info(json.dumps({
+                "at": time.time(), "module": module, "wall_ms": round(wall_ms, 2),
+                "interval_ms": INTERVAL * 1000, "samples": sampler.samples,
+                "phases": {p: sampler.phases.get(p, 0) for p in PHASES},
+                "stacks": [[";".join(s), n] for s, n in sampler.stacks.most_common()],
+            }))
+        except Exception as e:
+            print(f"Profile write failed: {e}")
+
+def load_profiles(limit=2000):
+    """Newest `limit` profiles from the current and rotated log files."""
+    profiles = []
+    for path in [PROFILE_LOG] + [f"{PROFILE_LOG}.{i}" for i in range(1, 4)]:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    profiles.append(json.loads(line))
+                except ValueError:
+                    continue # torn line from a concurrent write
+        if len(profiles) >= limit:
+            break
+    profiles.sort(key=lambda p: p["at"], reverse=True)
+    return profiles[:limit]
+
+def flame_frame(stacks):
+    """Collapsed stacks -> ids/labels/parents/values columns for a plotly icicle."""
+    totals = Counter()
+    for stack, count in stacks:
+        parts = stack.split(";")
+        for depth in range(1, len(parts) + 1):
+            totals[";".join(parts[:depth])] += count
+    ids = list(totals)
+    return {
+        "ids": ids,
+        "labels": [i.rsplit(";", 1)[-1] for i in ids],
+        "parents": [i.rsplit(";", 1)[0] if ";" in i else "" for i in ids],
+        "values": [totals[i] for i in ids],
+    }
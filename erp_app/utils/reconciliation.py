@@ -0,0 +1,273 @@
+import time
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, update, func
+from database.models import (
+    BankStatement, BankStatementLine, FinanceRecord, TransactionType, Invoice, Bill
+)
+from utils.importer import read_chunks, parse_dates
+from utils.tenancy import current_tenant
+from utils.time_utils import get_ist
+
+AUTO_MATCH = 0.9 # confidence at or above which a match is confirmed automatically
+HEADER_ALIASES = {
+    "date": ["date", "txn_date", "transaction_date", "value_date", "posting_date", "tran_date"],
+    "description": ["description", "narration", "particulars", "details", "remarks"],
+    "reference": ["reference", "ref", "ref_no", "reference_no", "cheque_no", "chq/ref_no", "utr"],
+    "amount": ["amount", "net_amount"],
+    "credit": ["credit", "deposit", "deposits", "credit_amount"],
+    "debit": ["debit", "withdrawal", "withdrawals", "debit_amount"],
+    "balance": ["balance", "closing_balance", "running_balance"],
+}
+REF_PATTERN = r"[A-Z0-9][A-Z0-9/\-]{3,}"
+
+def _pick(df, name):
+    for alias in HEADER_ALIASES[name]:
+        if alias in df:
+            return df[alias]
+    return None
+
+def _money(values):
+    if values is None:
+        return None
+    cleaned = values.astype(str).str.replace(r"[,₹\s]", "", regex=True).str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce")
+
+def parse_statement(data, filename):
+    """Normalise a bank export into date / description / reference / signed amount.
+
+    Accepts either a signed amount column or separate credit and debit
+    columns. Returns (lines, skipped) where skipped counts rows without a
+    readable date or amount (headers, totals, blank rows).
+    """
+    raw = pd.concat(list(read_chunks(data, filename)), ignore_index=True)
+    dates = _pick(raw, "date")
+    if dates is None:
+        raise ValueError("Statement has no date column")
+    amount = _money(_pick(raw, "amount"))
+    if amount is None:
+        credit, debit = _money(_pick(raw, "credit")), _money(_pick(raw, "debit"))
+        if credit is None and debit is None:
+            raise ValueError("Statement needs an amount column or credit/debit columns")
+        amount = (credit.fillna(0) if credit is not None else 0) - (debit.fillna(0) if debit is not None else 0)
+
+    def text(name, length):
+        col = _pick(raw, name)
+        return col.fillna("").astype(str).str.strip().str[:length] if col is not None else ""
+
+    lines = pd.DataFrame({
+        "date": parse_dates(dates),
+        "description": text("description", 255), "reference": text("reference", 100),
+        "amount": amount, "balance": _money(_pick(raw, "balance")),
+    })
+    valid = lines["date"].notna() & lines["amount"].notna() & (lines["amount"] != 0)
+    lines = lines[valid].reset_index(drop=True)
+    lines["date"] = lines["date"].dt.date
+    return lines, int((~valid).sum())
+
+def ingest_statement(db, data, filename, account_name):
+    """Store a statement and its lines (one bulk insert)."""
+    lines, skipped = parse_statement(data, filename)
+    if lines.empty:
+        raise ValueError("No transactions found in the statement")
+    tenant = current_tenant() or (None, None)
+    statement = BankStatement(
+        account_name=account_name, filename=filename, line_count=len(lines),
+        period_start=min(lines["date"]), period_end=max(lines["date"]),
+        company_id=tenant[0], branch_id=tenant[1]
+    )
+    db.add(statement)
+    db.flush()
+    records = lines.assign(statement_id=statement.id, status="Unmatched")
+    records["balance"] = records["balance"].astype(object).where(records["balance"].notna(), None)
+    db.execute(insert(BankStatementLine), records.to_dict("records"))
+    db.commit()
+    return statement, skipped
+
+def _ref_key(values):
+    return values.fillna("").astype(str).str.upper().str.replace(r"[^A-Z0-9]", "", regex=True)
+
+def load_targets(db, start, end, window_days, doc_window_days):
+    """Ledger entries, invoices and bills that a statement period could contain.
+
+    Entries already claimed by a matched or suggested line are excluded.
+    """
+    lo, hi = start - timedelta(days=doc_window_days), end + timedelta(days=doc_window_days)
+    frames = []
+
+    fin = pd.DataFrame(db.execute(select(
+        FinanceRecord.id, FinanceRecord.date, FinanceRecord.amount, FinanceRecord.type,
+        FinanceRecord.description, FinanceRecord.payment_method
+    ).where(FinanceRecord.date.between(start - timedelta(days=window_days), end + timedelta(days=window_days)))).all(),
+        columns=["target_id", "date", "amount", "type", "label", "method"])
+    if not fin.empty:
+        sign = np.where(fin["type"] == TransactionType.INCOME, 1.0, -1.0)
+        frames.append(fin.assign(kind="finance", amount=fin["amount"] * sign, ref=None).drop(columns=["type"]))
+
+    inv = pd.DataFrame(db.execute(select(
+        Invoice.id, func.coalesce(Invoice.due_date, Invoice.date_issued), Invoice.amount, Invoice.invoice_number
+    ).where(func.coalesce(Invoice.due_date, Invoice.date_issued).between(lo, hi))).all(),
+        columns=["target_id", "date", "amount", "ref"])
+    if not inv.empty:
+        frames.append(inv.assign(kind="invoice", label="Invoice " + inv["ref"].fillna(""), method=None))
+
+    bills = pd.DataFrame(db.execute(select(
+        Bill.id, func.coalesce(Bill.due_date, Bill.date_received), Bill.amount, Bill.bill_number
+    ).where(func.coalesce(Bill.due_date, Bill.date_received).between(lo, hi))).all(),
+        columns=["target_id", "date", "amount", "ref"])
+    if not bills.empty:
+        frames.append(bills.assign(kind="bill", amount=-bills["amount"], label="Bill " + bills["ref"].fillna(""), method=None))
+
+    cols = ["kind", "target_id", "date", "amount", "ref", "label", "method"]
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    targets = pd.concat(frames, ignore_index=True)[cols]
+
+    claimed = pd.DataFrame(db.execute(select(BankStatementLine.match_type, BankStatementLine.match_id).where(
+        BankStatementLine.status.in_(["Matched", "Suggested"]))).all(), columns=["kind", "target_id"])
+    if not claimed.empty:
+        targets = targets.merge(claimed.drop_duplicates(), on=["kind", "target_id"], how="left", indicator=True)
+        targets = targets[targets["_merge"] == "left_only"].drop(columns="_merge")
+    return targets.reset_index(drop=True)
+
+def _candidates(lines, targets, window_days, doc_window_days):
+    """Reference hash join plus amount-keyed sort-merge on date."""
+    found = []
+
+    # 1. Document numbers quoted in the narration/reference: explode tokens, hash join
+    refs = targets[targets["ref"].notna()].assign(token=lambda t: _ref_key(t["ref"]))
+    refs = refs[refs["token"].str.len() >= 4]
+    if not refs.empty:
+        tokens = lines[["line_id", "cents", "text"]].assign(token=lines["text"].str.upper().str.findall(REF_PATTERN))
+        tokens = tokens.explode("token").dropna(subset=["token"])
+        tokens["token"] = _ref_key(tokens["token"])
+        hits = tokens.merge(refs, on="token", suffixes=("", "_t"))
+        if not hits.empty:
+            same = hits["cents"] == hits["cents_t"]
+            hits["confidence"] = np.where(same, 0.99, 0.6)
+            hits["rule"] = np.where(same, "reference + amount", "reference only")
+            found.append(hits[["line_id", "kind", "target_id", "confidence", "rule"]])
+
+    # 2. Same amount, nearest date within the window (merge_asof = sort-merge join)
+    left = lines.sort_values("ts")
+    for kind, tolerance in (("finance", window_days), ("invoice", doc_window_days), ("bill", doc_window_days)):
+        right = targets[targets["kind"] == kind]
+        if right.empty:
+            continue
+        right = right.assign(t_ts=right["ts"]).sort_values("ts")
+        m = pd.merge_asof(left[["line_id", "ts", "cents"]], right[["ts", "t_ts", "cents", "kind", "target_id", "method"]],
+                          on="ts", by="cents", tolerance=pd.Timedelta(days=tolerance), direction="nearest")
+        m = m.dropna(subset=["target_id"])
+        if m.empty:
+            continue
+        days = (m["ts"] - m["t_ts"]).abs().dt.days
+        if kind == "finance":
+            conf = 0.96 - 0.03 * days
+            conf = conf - np.where(m["method"].fillna("").str.lower() == "cash", 0.3, 0.0)
+        else:
+            conf = 0.85 - 0.005 * days
+        found.append(pd.DataFrame({
+            "line_id": m["line_id"], "kind": kind, "target_id": m["target_id"].astype(int),
+            "confidence": conf.round(3), "rule": f"amount + date ({kind})"
+        }))
+    return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=["line_id", "kind", "target_id", "confidence", "rule"])
+
+def match_lines(lines, targets, window_days=3, doc_window_days=45, rounds=3):
+    """One-to-one assignment of statement lines to ledger entries/documents.
+
+    Candidates come from a reference hash join and an amount-keyed
+    merge_asof on date; conflicts are resolved greedily by confidence.
+    Lines and targets left over are retried for a few rounds so a line
+    that lost its nearest target can take the next one.
+    """
+    lines = lines.assign(
+        ts=pd.to_datetime(lines["date"]), cents=(lines["amount"] * 100).round().astype("int64"),
+        text=lines["description"].fillna("") + " " + lines["reference"].fillna("")
+    )
+    targets = targets.assign(
+        ts=pd.to_datetime(targets["date"]), cents=(targets["amount"].astype(float) * 100).round().astype("int64")
+    )
+    accepted = []
+    for _ in range(rounds):
+        if lines.empty or targets.empty:
+            break
+        cands = _candidates(lines, targets, window_days, doc_window_days)
+        if cands.empty:
+            break
+        best = cands.sort_values("confidence", ascending=False)\
+            .drop_duplicates("line_id").drop_duplicates(["kind", "target_id"])
+        accepted.append(best)
+        lines = lines[~lines["line_id"].isin(best["line_id"])]
+        taken = best[["kind", "target_id"]].assign(_taken=True)
+        targets = targets.merge(taken, on=["kind", "target_id"], how="left")
+        targets = targets[targets["_taken"].isna()].drop(columns="_taken")
+    if not accepted:
+        return pd.DataFrame(columns=["line_id", "kind", "target_id", "confidence", "rule"])
+    return pd.concat(accepted, ignore_index=True)
+
+def reconcile_statement(db, statement_id, window_days=3, doc_window_days=45, rematch=False):
+    """Auto-match the open lines of a statement and persist the results."""
+    started = time.perf_counter()
+    statuses = ["Unmatched", "Suggested"] if rematch else ["Unmatched"]
+    if rematch:
+        db.query(BankStatementLine).filter(
+            BankStatementLine.statement_id == statement_id, BankStatementLine.status == "Suggested"
+        ).update({BankStatementLine.status: "Unmatched", BankStatementLine.match_type: None,
+                  BankStatementLine.match_id: None, BankStatementLine.confidence: None}, synchronize_session=False)
+    lines = pd.DataFrame(db.execute(select(
+        BankStatementLine.id, BankStatementLine.date, BankStatementLine.amount,
+        BankStatementLine.description, BankStatementLine.reference
+    ).where(BankStatementLine.statement_id == statement_id, BankStatementLine.status.in_(statuses))).all(),
+        columns=["line_id", "date", "amount", "description", "reference"])
+    if lines.empty:
+        db.commit()
+        return {"lines": 0, "matched": 0, "suggested": 0, "seconds": time.perf_counter() - started}
+
+    targets = load_targets(db, min(lines["date"]), max(lines["date"]), window_days, doc_window_days)
+    matches = match_lines(lines, targets, window_days, doc_window_days) if not targets.empty else pd.DataFrame()
+    now = get_ist()
+    if not matches.empty:
+        db.execute(update(BankStatementLine), [{
+            "id": int(m.line_id), "match_type": m.kind, "match_id": int(m.target_id),
+            "confidence": float(m.confidence), "matched_at": now,
+            "status": "Matched" if m.confidence >= AUTO_MATCH else "Suggested"
+        } for m in matches.itertuples()])
+    db.commit()
+    auto = int((matches["confidence"] >= AUTO_MATCH).sum()) if not matches.empty else 0
+    return {"lines": len(lines), "matched": auto, "suggested": len(matches) - auto,
+            "seconds": time.perf_counter() - started}
+
+def set_line_status(db, line_ids, status):
+    """Confirm (Matched), reject (Unmatched) or ignore lines in bulk."""
+    values = {BankStatementLine.status: status}
+    if status == "Matched":
+        values[BankStatementLine.matched_at] = get_ist()
+    if status in ("Unmatched", "Ignored"):
+        values.update({BankStatementLine.match_type: None, BankStatementLine.match_id: None,
+                       BankStatementLine.confidence: None})
+    db.query(BankStatementLine).filter(BankStatementLine.id.in_(line_ids))\
+        .update(values, synchronize_session=False)
+    db.commit()
+
+def manual_match(db, line_id, kind, target_id):
+    line = db.get(BankStatementLine, line_id)
+    line.match_type, line.match_id = kind, target_id
+    line.confidence, line.status, line.matched_at = 1.0, "Matched", get_ist()
+    db.commit()
+
+def target_labels(db, lines):
+    """Human-readable description of each line's matched entry."""
+    labels = {}
+    kinds = {
+        "finance": select(FinanceRecord.id, FinanceRecord.date, FinanceRecord.category, FinanceRecord.description),
+        "invoice": select(Invoice.id, Invoice.due_date, Invoice.invoice_number, Invoice.status),
+        "bill": select(Bill.id, Bill.due_date, Bill.bill_number, Bill.status),
+    }
+    for kind, stmt in kinds.items():
+        ids = [int(i) for i in lines.loc[lines["match_type"] == kind, "match_id"].dropna().unique()]
+        if ids:
+            model = stmt.selected_columns[0].table
+            for row in db.execute(stmt.where(model.c.id.in_(ids))).all():
+                labels[(kind, row[0])] = f"{kind.title()} #{row[0]} · {row[1]} · {row[2] or ''} {row[3] or ''}".strip()
+    return [labels.get((k, int(i))) if pd.notna(i) else None for k, i in zip(lines["match_type"], lines["match_id"])]
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import update
+from database.models import Project, ProjectTask, TaskDependency, Employee, Asset
+from utils.time_utils import get_ist_date
+
+RESOURCES = ["labour_units", "machinery_units"]
+
+def resource_capacity(db):
+    """Daily capacity from the active workforce and serviceable fleet."""
+    labour = db.query(Employee).filter(Employee.is_active == True).count()
+    machinery = db.query(Asset).filter(Asset.status == "Active").count()
+    return {"labour_units": labour, "machinery_units": machinery}
+
+def load_portfolio(db, project_ids):
+    """Tasks of the given projects on one shared day calendar.
+
+    `start` and `latest` are absolute day numbers counted from `origin`,
+    the earliest project start in the portfolio. `start` is the applied
+    leveled start where one was saved, else the CPM early start.
+    """
+    rows = db.query(
+        ProjectTask.id, ProjectTask.project_id, ProjectTask.name, ProjectTask.duration,
+        ProjectTask.early_start, ProjectTask.late_start, ProjectTask.leveled_start, ProjectTask.is_critical,
+        ProjectTask.labour_units, ProjectTask.machinery_units, Project.name.label("project"),
+        Project.start_date
+    ).join(Project, Project.id == ProjectTask.project_id).filter(ProjectTask.project_id.in_(project_ids)).all()
+    deps = db.query(TaskDependency.predecessor_id, TaskDependency.successor_id, TaskDependency.lag)\
+        .join(ProjectTask, ProjectTask.id == TaskDependency.successor_id)\
+        .filter(ProjectTask.project_id.in_(project_ids)).all()
+
+    df = pd.DataFrame([r._asdict() for r in rows])
+    if df.empty:
+        return df, deps, get_ist_date()
+
+    df["start_date"] = pd.to_datetime(df["start_date"].fillna(get_ist_date()))
+    origin = df["start_date"].min()
+    offset = (df["start_date"] - origin).dt.days.to_numpy()
+    df = df.fillna({"duration": 0, "early_start": 0, "late_start": 0, "labour_units": 0, "machinery_units": 0})
+    df["leveled"] = df["leveled_start"].notna()
+    df["base"] = offset
+    df["start"] = offset + df["leveled_start"].fillna(df["early_start"]).astype(int).to_numpy()
+    df["latest"] = offset + df["late_start"].astype(int).to_numpy()
+    df["duration"] = df["duration"].astype(int)
+    return df, deps, origin.date()
+
+def demand_curve(starts, durations, units, horizon):
+    """Daily demand of many tasks at once via a difference array."""
+    diff = np.zeros(horizon + 1)
+    np.add.at(diff, starts, units)
+    np.add.at(diff, starts + durations, -units)
+    return np.cumsum(diff)[:horizon]
+
+def level_resources(df, deps, capacity, passes=3):
+    """Shift non-critical tasks inside their float to flatten daily peaks.
+
+    Burgess-style heuristic: each task is moved to the window that minimises
+    the capacity-weighted sum of squared demand, without breaking a
+    predecessor or successor link or moving the task past its late start.
+    Candidate windows are scored together with prefix sums.
+    """
+    starts = df["start"].to_numpy().copy()
+    durations = df["duration"].to_numpy()
+    units = df[RESOURCES].to_numpy(dtype=float)
+    weights = np.array([1.0 / max(capacity.get(r, 0), 1) for r in RESOURCES])
+    horizon = int((np.maximum(starts, df["latest"].to_numpy()) + durations).max()) + 1
+
+    index = {tid: i for i, tid in enumerate(df["id"])}
+    preds = [[] for _ in index]
+    succs = [[] for _ in index]
+    for p, s, lag in deps:
+        if p in index and s in index:
+            preds[index[s]].append((index[p], lag or 0))
+            succs[index[p]].append((index[s], lag or 0))
+
+    demand = np.stack([demand_curve(starts, durations, units[:, r], horizon) for r in range(len(RESOURCES))])
+    movable = np.flatnonzero(~df["is_critical"].fillna(False).to_numpy().astype(bool) & (units.sum(axis=1) > 0))
+    latest = df["latest"].to_numpy()
+
+    for _ in range(passes):
+        moved = False
+        for i in movable[np.argsort(-starts[movable], kind="stable")]:
+            d, s = durations[i], starts[i]
+            lo = max([starts[p] + durations[p] + lag for p, lag in preds[i]], default=df["base"].iat[i])
+            hi = min([starts[c] - lag - d for c, lag in succs[i]] + [latest[i]])
+            if hi <= lo or d == 0:
+                continue
+
+            demand[:, s:s + d] -= units[i][:, None]
+            combined = (weights * units[i]) @ demand[:, lo:hi + d]
+            cs = np.concatenate(([0.0], np.cumsum(combined)))
+            window = cs[d:] - cs[:-d]
+            best = lo + int(np.argmin(window))
+            demand[:, best:best + d] += units[i][:, None]
+
+            if best != s:
+                starts[i] = best
+                moved = True
+        if not moved:
+            break
+
+    return starts
+
+def loading_profile(df, starts, origin, capacity):
+    """Daily demand before and after leveling, with capacity, as a frame."""
+    horizon = int(max(df["start"].max(), starts.max()) + df["duration"].max()) + 1
+    durations = df["duration"].to_numpy()
+    profile = pd.DataFrame({"Date": pd.date_range(origin, periods=horizon, freq="D")})
+    for r, label in zip(RESOURCES, ["Labour", "Machinery"]):
+        u = df[r].to_numpy(dtype=float)
+        profile[f"{label} (Planned)"] = demand_curve(df["start"].to_numpy(), durations, u, horizon)
+        profile[f"{label} (Leveled)"] = demand_curve(starts, durations, u, horizon)
+        profile[f"{label} Capacity"] = capacity[r]
+    return profile
+
+def apply_leveling(db, df, starts):
+    """Persist leveled starts as offsets from each task's project start.
+
+    Schedules and loading profiles read them back; a CPM recompute of the
+    project clears them (see utils.scheduler).
+    """
+    db.execute(update(ProjectTask), [
+        {"id": int(tid), "leveled_start": int(s - base)}
+        for tid, s, base in zip(df["id"], starts, df["base"])
+    ])
+    db.commit()
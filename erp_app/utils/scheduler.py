@@ -0,0 +1,180 @@
+import heapq
+from collections import deque
+from sqlalchemy import update
+from database.models import ProjectTask, TaskDependency
+
+class CPMSchedule:
+    """Critical-path schedule over a finish-to-start task network.
+
+    Dates are integer day offsets from the project start. A full pass is
+    O(V + E); `update_duration` only revisits the tasks the change reaches.
+    Passing previously saved `dates` ({task: (es, ef, ls, lf)}) seeds the
+    schedule without a full pass, for incremental updates.
+    """
+
+    def __init__(self, durations, dependencies, dates=None):
+        self.duration = {t: max(int(d or 0), 0) for t, d in durations.items()}
+        self.succ = {t: [] for t in self.duration}
+        self.pred = {t: [] for t in self.duration}
+        for p, s, lag in dependencies:
+            if p in self.duration and s in self.duration:
+                self.succ[p].append((s, lag or 0))
+                self.pred[s].append((p, lag or 0))
+
+        self.order = self._topological_order()
+        self.position = {t: i for i, t in enumerate(self.order)}
+        self.es, self.ef, self.ls, self.lf = {}, {}, {}, {}
+        if dates is not None and all(t in dates and None not in dates[t] for t in self.duration):
+            for t in self.duration:
+                self.es[t], self.ef[t], self.ls[t], self.lf[t] = dates[t]
+        else:
+            self.compute()
+
+    def _topological_order(self):
+        """Kahn's algorithm; raises ValueError if the network has a cycle."""
+        indegree = {t: len(p) for t, p in self.pred.items()}
+        queue = deque(t for t, n in indegree.items() if n == 0)
+        order = []
+        while queue:
+            t = queue.popleft()
+            order.append(t)
+            for s, _ in self.succ[t]:
+                indegree[s] -= 1
+                if indegree[s] == 0:
+                    queue.append(s)
+        if len(order) != len(self.duration):
+            raise ValueError("Task dependencies contain a cycle.")
+        return order
+
+    # --- Full passes ---
+    def compute(self):
+        for t in self.order:
+            self._forward(t)
+        self._backward_all()
+
+    def _forward(self, t):
+        self.es[t] = max((self.ef[p] + lag for p, lag in self.pred[t]), default=0)
+        self.ef[t] = self.es[t] + self.duration[t]
+
+    def _backward(self, t, finish):
+        self.lf[t] = min((self.ls[s] - lag for s, lag in self.succ[t]), default=finish)
+        self.ls[t] = self.lf[t] - self.duration[t]
+
+    def _backward_all(self):
+        finish = self.project_finish
+        for t in reversed(self.order):
+            self._backward(t, finish)
+
+    # --- Results ---
+    @property
+    def project_finish(self):
+        return max(self.ef.values(), default=0)
+
+    def total_float(self, t):
+        return self.ls[t] - self.es[t]
+
+    def is_critical(self, t):
+        return self.total_float(t) == 0
+
+    def critical_path(self):
+        """Zero-float tasks in topological order."""
+        return [t for t in self.order if self.is_critical(t)]
+
+    # --- Incremental rescheduling ---
+    def update_duration(self, task_id, duration):
+        """Change one duration and return the set of tasks whose dates moved.
+
+        The forward pass walks successors in topological order and stops
+        where early finish is unchanged. Late dates only move for the task
+        and its predecessors, unless the project finish itself moved, in
+        which case every late date shifts and one backward pass is run.
+        """
+        old_finish = self.project_finish
+        self.duration[task_id] = max(int(duration or 0), 0)
+
+        touched = set()
+        heap = [self.position[task_id]]
+        queued = {task_id}
+        while heap:
+            t = self.order[heapq.heappop(heap)]
+            old_ef = self.ef[t]
+            self._forward(t)
+            touched.add(t)
+            if self.ef[t] != old_ef:
+                for s, _ in self.succ[t]:
+                    if s not in queued:
+                        queued.add(s)
+                        heapq.heappush(heap, self.position[s])
+
+        if self.project_finish != old_finish:
+            self._backward_all()
+            return set(self.order)
+
+        heap = [-self.position[task_id]]
+        queued = {task_id}
+        while heap:
+            t = self.order[-heapq.heappop(heap)]
+            old_ls = self.ls[t]
+            self._backward(t, old_finish)
+            touched.add(t)
+            if self.ls[t] != old_ls:
+                for p, _ in self.pred[t]:
+                    if p not in queued:
+                        queued.add(p)
+                        heapq.heappush(heap, -self.position[p])
+        return touched
+
+def load_schedule(db, project_id, saved=False):
+    """Build a CPMSchedule for a project from its tasks and dependencies.
+
+    With `saved=True` the stored CPM dates seed the schedule instead of a
+    full pass; any task without saved dates falls back to computing.
+    """
+    tasks = db.query(ProjectTask.id, ProjectTask.duration, ProjectTask.early_start, ProjectTask.early_finish,
+                     ProjectTask.late_start, ProjectTask.late_finish).filter(ProjectTask.project_id == project_id).all()
+    deps = db.query(TaskDependency.predecessor_id, TaskDependency.successor_id, TaskDependency.lag)\
+        .join(ProjectTask, ProjectTask.id == TaskDependency.successor_id)\
+        .filter(ProjectTask.project_id == project_id).all()
+    dates = {t.id: (t.early_start, t.early_finish, t.late_start, t.late_finish) for t in tasks} if saved else None
+    return CPMSchedule({t.id: t.duration for t in tasks}, deps, dates)
+
+def save_schedule(db, schedule, task_ids=None):
+    """Write CPM results back for the given tasks (all tasks by default)."""
+    ids = schedule.order if task_ids is None else task_ids
+    db.execute(update(ProjectTask), [{
+        "id": t,
+        "duration": schedule.duration[t],
+        "early_start": schedule.es[t], "early_finish": schedule.ef[t],
+        "late_start": schedule.ls[t], "late_finish": schedule.lf[t],
+        "total_float": schedule.total_float(t),
+        "is_critical": schedule.is_critical(t)
+    } for t in ids])
+    db.commit()
+
+def clear_leveling(db, project_id):
+    """Drop applied leveled starts; they may no longer fit a recomputed network."""
+    db.query(ProjectTask).filter(ProjectTask.project_id == project_id, ProjectTask.leveled_start.isnot(None))\
+        .update({ProjectTask.leveled_start: None}, synchronize_session=False)
+
+def start_offset(task):
+    """Day offset a task is planned to start at: leveled if applied, else early start."""
+    return task.leveled_start if task.leveled_start is not None else (task.early_start or 0)
+
+def schedule_project(db, project_id):
+    """Full CPM pass for a project; use after adding tasks or links."""
+    schedule = load_schedule(db, project_id)
+    clear_leveling(db, project_id)
+    save_schedule(db, schedule)
+    return schedule
+
+def reschedule_task(db, task, duration):
+    """Change a task's duration; recompute and persist only the tasks it affects.
+
+    The schedule is seeded from the saved dates, so only the changed task's
+    downstream (and, for late dates, upstream) tasks are revisited.
+    """
+    schedule = load_schedule(db, task.project_id, saved=True)
+    changed = schedule.update_duration(task.id, duration)
+    clear_leveling(db, task.project_id)
+    save_schedule(db, schedule, changed)
+    return changed
@@ -0,0 +1,108 @@
+"""Multi-threaded SQLite contention benchmark: default vs tuned profile.
+
+Run from the erp_app directory:  python -m utils.sqlite_bench [threads] [seconds]
+
+Each worker thread mimics a Streamlit session: mostly dashboard-style
+aggregate reads with a share of form-style writes (usage log inserts and
+stock updates), each in its own short transaction. The same workload runs
+against a fresh database file with the stock engine and with the
+WAL/busy_timeout profile from db_manager, and throughput and lock errors
+are reported side by side.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+workdir = tempfile.mkdtemp(prefix="erp_sqlite_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'app.db')}")
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from database.db_manager import make_engine
+from database.models import Base, Asset, AssetLog, InventoryItem
+
+WRITE_SHARE = 0.3
+
+def prepare(eng, assets=50, items=200, logs=20000):
+    Base.metadata.create_all(bind=eng)
+    db = sessionmaker(bind=eng)()
+    db.add_all([Asset(name=f"Asset {i}", type="Excavator") for i in range(assets)])
+    db.add_all([InventoryItem(name=f"Item {i}", current_stock=1000, min_stock_alert=10) for i in range(items)])
+    db.commit()
+    start = date(2024, 1, 1)
+    db.execute(insert(AssetLog), [{
+        "asset_id": random.randint(1, assets), "date": start + timedelta(days=random.randint(0, 365)),
+        "hours_used": random.uniform(1, 10), "fuel_consumed": random.uniform(5, 80)
+    } for _ in range(logs)])
+    db.commit()
+    db.close()
+
+def worker(Session, stop, counters, lock, seed):
+    rng = random.Random(seed)
+    reads = writes = errors = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            if rng.random() < WRITE_SHARE:
+                db.add(AssetLog(asset_id=rng.randint(1, 50), date=date(2025, 1, 1),
+                                hours_used=rng.uniform(1, 10), fuel_consumed=rng.uniform(5, 80)))
+                item = db.get(InventoryItem, rng.randint(1, 200))
+                item.current_stock -= 1
+                db.commit()
+                writes += 1
+            else:
+                db.query(AssetLog.asset_id, func.sum(AssetLog.hours_used))\
+                    .filter(AssetLog.asset_id == rng.randint(1, 50)).group_by(AssetLog.asset_id).all()
+                db.query(func.count(InventoryItem.id)).filter(InventoryItem.current_stock < 900).scalar()
+                db.commit()
+                reads += 1
+        except OperationalError:
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    with lock:
+        counters["reads"] += reads
+        counters["writes"] += writes
+        counters["errors"] += errors
+
+def run(label, tuned, threads, seconds):
+    path = os.path.join(workdir, f"{label}.db")
+    eng = make_engine(f"sqlite:///{path}", tuned=tuned)
+    prepare(eng)
+    Session = sessionmaker(bind=eng)
+    counters, lock, stop = {"reads": 0, "writes": 0, "errors": 0}, threading.Lock(), threading.Event()
+    pool = [threading.Thread(target=worker, args=(Session, stop, counters, lock, i)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    with eng.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    eng.dispose()
+    ops = counters["reads"] + counters["writes"]
+    return {"profile": label, "journal": mode, "ops/s": ops / elapsed,
+            "reads/s": counters["reads"] / elapsed, "writes/s": counters["writes"] / elapsed,
+            "lock errors": counters["errors"]}
+
+def main(threads=8, seconds=10):
+    print(f"{threads} threads x {seconds}s, {int(WRITE_SHARE * 100)}% writes  (files in {workdir})")
+    rows = [run("default", False, threads, seconds), run("tuned", True, threads, seconds)]
+    print(f"{'profile':<9}{'journal':<9}{'ops/s':>10}{'reads/s':>10}{'writes/s':>10}{'lock errors':>13}")
+    for r in rows:
+        print(f"{r['profile']:<9}{r['journal']:<9}{r['ops/s']:>10.0f}{r['reads/s']:>10.0f}{r['writes/s']:>10.0f}{r['lock errors']:>13}")
+    base = rows[0]["ops/s"] or 1
+    print(f"\nTuned throughput: {rows[1]['ops/s'] / base:.2f}x default")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,120 @@
+"""Company/branch scoping for ORM queries.
+
+Only statements run through a Session (`db.query`, `db.execute`) pass the
+`do_orm_execute` hook that adds the tenant criteria. Reads issued on a
+Connection, such as `pd.read_sql(stmt, db.connection())` or
+`conn.execute(stmt)`, bypass it and are unscoped; such reads of tenant
+data must add `tenant_predicates()` themselves. Tables outside
+TENANT_MODELS (the asset fleet, production logs) are shared by all tenants.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+from database.models import Project, FinanceRecord, User
+
+TENANT_MODELS = (Project, FinanceRecord, User)
+_tenant = ContextVar("erp_tenant", default=None)
+
+def set_tenant(company_id=None, branch_id=None):
+    """Scope ORM queries in this context to a company (and optionally branch)."""
+    tenant = (company_id, branch_id) if company_id or branch_id else None
+    return _tenant.set(tenant)
+
+def current_tenant():
+    return _tenant.get()
+
+@contextmanager
+def tenant_scope(company_id=None, branch_id=None):
+    """Temporarily switch tenant; `tenant_scope()` runs unscoped."""
+    token = set_tenant(company_id, branch_id)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+def _criteria(company_id, branch_id):
+    # Separate lambdas per shape: SQLAlchemy caches each by code location
+    if company_id and branch_id:
+        return lambda cls: (cls.company_id == company_id) & (cls.branch_id == branch_id)
+    if company_id:
+        return lambda cls: cls.company_id == company_id
+    return lambda cls: cls.branch_id == branch_id
+
+def tenant_predicates(model):
+    """Explicit WHERE clauses scoping `model` to the active tenant (empty when unscoped).
+
+    For Core statements executed on a Connection, which the session hook
+    never sees.
+    """
+    tenant = _tenant.get()
+    if not tenant:
+        return []
+    company_id, branch_id = tenant
+    clauses = []
+    if company_id:
+        clauses.append(model.company_id == company_id)
+    if branch_id:
+        clauses.append(model.branch_id == branch_id)
+    return clauses
+
+# --- Per-tenant query timings (process-wide) ---
+class TenantStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, tenant, elapsed_ms):
+        with self._lock:
+            s = self._stats.setdefault(tenant, {"queries": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["queries"] += 1
+            s["total_ms"] += elapsed_ms
+            s["max_ms"] = max(s["max_ms"], elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {t: dict(s) for t, s in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+tenant_stats = TenantStats()
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_tenant(state):
+    """Add tenant criteria to every ORM statement and time its execution.
+
+    Registered on the Session class, so every session (pages, jobs,
+    scripts) is covered. Column and relationship loads inherit the
+    criteria from their parent query. `execution_options(all_tenants=True)`
+    opts a statement out, e.g. for cross-tenant admin reports.
+    """
+    tenant = _tenant.get()
+    if tenant and not state.is_column_load and not state.is_relationship_load \
+            and not state.execution_options.get("all_tenants", False):
+        company_id, branch_id = tenant
+        state.statement = state.statement.options(*[
+            with_loader_criteria(model, _criteria(company_id, branch_id), include_aliases=True)
+            for model in TENANT_MODELS
+        ])
+    started = time.perf_counter()
+    result = state.invoke_statement()
+    tenant_stats.record(tenant, (time.perf_counter() - started) * 1000)
+    return result
+
+@event.listens_for(Session, "before_flush")
+def _stamp_tenant(session, flush_context, instances):
+    """New tenant-owned rows default to the active company/branch."""
+    tenant = _tenant.get()
+    if not tenant:
+        return
+    company_id, branch_id = tenant
+    for obj in session.new:
+        if isinstance(obj, TENANT_MODELS):
+            if obj.company_id is None:
+                obj.company_id = company_id
+            if obj.branch_id is None and branch_id:
+                obj.branch_id = branch_id
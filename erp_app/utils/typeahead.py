@@ -0,0 +1,27 @@
+from sqlalchemy import select, func
+
+DEFAULT_LIMIT = 20
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def prefix_matches(db, model, search_column, term, columns=(), where=(), order_by=None, limit=DEFAULT_LIMIT):
+    """Top (id, *columns) rows whose search column starts with `term` (case-insensitive).
+
+    The prefix is a range on lower(column), so it is answered from the
+    `lower(...)` expression index instead of a LIKE scan. "#123" looks a
+    row up by id. An empty term returns the first rows in `order_by`
+    (default: the search column). Runs through the session, so tenant
+    scoping applies.
+    """
+    stmt = select(model.id, *columns).where(*where)
+    term = (term or "").strip()
+    if term.startswith("#") and term[1:].isdigit():
+        stmt = stmt.where(model.id == int(term[1:]))
+    elif term and search_column is not None:
+        lowered = func.lower(search_column)
+        stmt = stmt.where(lowered >= term.lower(), lowered < prefix_upper_bound(term.lower()))
+    if order_by is None:
+        order_by = func.lower(search_column) if search_column is not None else model.id.desc()
+    return db.execute(stmt.order_by(order_by).limit(limit)).all()
@@ -0,0 +1,36 @@
+from sqlalchemy import func
+from database.models import SyncWatermark
+from utils.time_utils import get_ist
+
+def get_watermark(db, name):
+    """Fetch a named watermark, creating it at zero on first use."""
+    mark = db.query(SyncWatermark).filter(SyncWatermark.name == name).first()
+    if not mark:
+        mark = SyncWatermark(name=name, last_id=0, rows_processed=0)
+        db.add(mark)
+        db.flush()
+    return mark
+
+def advance_watermark(db, name, last_id, rows):
+    """Move a watermark forward after a successful batch (caller commits)."""
+    mark = get_watermark(db, name)
+    mark.last_id = max(mark.last_id or 0, int(last_id or 0))
+    mark.last_run = get_ist()
+    mark.rows_processed = (mark.rows_processed or 0) + rows
+    return mark
+
+def claim_watermark(db, name, expected_id, last_id, rows):
+    """Compare-and-set a watermark; False if another run moved it first.
+
+    Lets additive batches run in the same transaction as their writes
+    without double counting when two runs race.
+    """
+    get_watermark(db, name)
+    updated = db.query(SyncWatermark).filter(
+        SyncWatermark.name == name, SyncWatermark.last_id == expected_id
+    ).update({
+        SyncWatermark.last_id: int(last_id),
+        SyncWatermark.last_run: get_ist(),
+        SyncWatermark.rows_processed: func.coalesce(SyncWatermark.rows_processed, 0) + rows
+    }, synchronize_session="fetch")
+    return updated == 1